@@ -0,0 +1,29 @@
+"""add cache_hit flag to requests
+
+Revision ID: 0006_cache_hit
+Revises: 0005_agent
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006_cache_hit"
+down_revision = "0005_agent"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "requests",
+        sa.Column("cache_hit", sa.Boolean(), nullable=False, server_default=sa.false()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("requests", "cache_hit")
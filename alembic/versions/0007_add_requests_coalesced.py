@@ -0,0 +1,29 @@
+"""add coalesced flag to requests (single-flight followers)
+
+Revision ID: 0007_coalesced
+Revises: 0006_cache_hit
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007_coalesced"
+down_revision = "0006_cache_hit"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "requests",
+        sa.Column("coalesced", sa.Boolean(), nullable=False, server_default=sa.false()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("requests", "coalesced")
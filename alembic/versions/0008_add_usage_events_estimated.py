@@ -0,0 +1,29 @@
+"""add estimated flag to usage_events (locally counted stream usage)
+
+Revision ID: 0008_usage_estimated
+Revises: 0007_coalesced
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008_usage_estimated"
+down_revision = "0007_coalesced"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "usage_events",
+        sa.Column("estimated", sa.Boolean(), nullable=False, server_default=sa.false()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("usage_events", "estimated")
@@ -0,0 +1,46 @@
+"""add spend_budgets and requests.api_key_id (per-key spend)
+
+Revision ID: 0009_spend_budgets
+Revises: 0008_usage_estimated
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0009_spend_budgets"
+down_revision = "0008_usage_estimated"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "requests",
+        sa.Column("api_key_id", sa.dialects.postgresql.UUID(as_uuid=False), sa.ForeignKey("api_keys.id"), nullable=True),
+    )
+    op.create_index("ix_requests_api_key_id", "requests", ["api_key_id"])
+
+    op.create_table(
+        "spend_budgets",
+        sa.Column("id", sa.dialects.postgresql.UUID(as_uuid=False), primary_key=True),
+        sa.Column("org_id", sa.dialects.postgresql.UUID(as_uuid=False), sa.ForeignKey("organizations.id"), nullable=False),
+        sa.Column("api_key_id", sa.dialects.postgresql.UUID(as_uuid=False), sa.ForeignKey("api_keys.id"), nullable=True),
+        sa.Column("period", sa.String(length=8), nullable=False),
+        sa.Column("limit_amount", sa.Numeric(18, 8), nullable=False),
+        sa.Column("currency", sa.String(length=8), nullable=False, server_default="USD"),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.UniqueConstraint("org_id", "api_key_id", "period", name="uq_spend_budgets_scope"),
+    )
+    op.create_index("ix_spend_budgets_org_id", "spend_budgets", ["org_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_spend_budgets_org_id", table_name="spend_budgets")
+    op.drop_table("spend_budgets")
+    op.drop_index("ix_requests_api_key_id", table_name="requests")
+    op.drop_column("requests", "api_key_id")
@@ -0,0 +1,29 @@
+"""add tier to organizations (fair-queuing weight class)
+
+Revision ID: 0010_org_tier
+Revises: 0009_spend_budgets
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0010_org_tier"
+down_revision = "0009_spend_budgets"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "organizations",
+        sa.Column("tier", sa.String(length=16), nullable=False, server_default="standard"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("organizations", "tier")
@@ -0,0 +1,43 @@
+"""unique org-wide spend budget per period (api_key_id NULL escapes uq_spend_budgets_scope)
+
+Revision ID: 0011_spend_budgets_org_unique
+Revises: 0010_org_tier
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0011_spend_budgets_org_unique"
+down_revision = "0010_org_tier"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # NULLs are distinct in a unique constraint, so org-wide rows could be duplicated. All of them
+    # were enforced, so keep the strictest one per (org, period).
+    op.execute(
+        """
+        DELETE FROM spend_budgets a
+        USING spend_budgets b
+        WHERE a.api_key_id IS NULL AND b.api_key_id IS NULL
+          AND a.org_id = b.org_id AND a.period = b.period
+          AND (a.limit_amount, a.id) > (b.limit_amount, b.id)
+        """
+    )
+    op.create_index(
+        "uq_spend_budgets_org_scope",
+        "spend_budgets",
+        ["org_id", "period"],
+        unique=True,
+        postgresql_where=sa.text("api_key_id IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_spend_budgets_org_scope", table_name="spend_budgets")
@@ -0,0 +1,105 @@
+"""CPU per chat request spent in JSON: stdlib json (before) vs the shared codec (after).
+
+Covers what one non-streaming request with an Idempotency-Key encodes or decodes: the upstream
+response, the ChatResponse body sent to the client, the idempotency record (write, then the read
+of a duplicate) and a handful of log lines. No network or Redis I/O: the numbers are pure codec work.
+
+    python scripts/bench_json_codec.py --completion-chars 2000 --repeat 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from collections.abc import Callable
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from aigate.core import jsoncodec
+from aigate.domain.chat import ChatResponse, Choice, Message, Usage
+
+LOG_LINES = 4
+
+
+def build(completion_chars: int) -> tuple[bytes, ChatResponse]:
+    text = ("Ответ модели с примерами кода и пояснениями. " * (completion_chars // 44 + 1))[:completion_chars]
+    upstream = {
+        "id": "chatcmpl-123",
+        "object": "chat.completion",
+        "created": 1_760_000_000,
+        "model": "qwen-plus",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 512, "completion_tokens": 700, "total_tokens": 1212},
+    }
+    resp = ChatResponse(
+        model="qwen:qwen-plus",
+        choices=[Choice(message=Message(role="assistant", content=text), finish_reason="stop")],
+        usage=Usage(prompt_tokens=512, completion_tokens=700, total_tokens=1212, billed_cost=Decimal("0.00184")),
+    )
+    return json.dumps(upstream, ensure_ascii=False).encode("utf-8"), resp
+
+
+def _log_record(i: int) -> dict:
+    return {
+        "ts": datetime.now(tz=timezone.utc).isoformat(),
+        "level": "INFO",
+        "logger": "aigate.api.chat_completions",
+        "msg": f"chat.completions.step{i}",
+        "request_id": "4f1c2e0a9b7d4e4c8f0a1b2c3d4e5f60",
+        "org_id": "org-1",
+        "provider": "qwen",
+        "model": "qwen-plus",
+    }
+
+
+def request_before(upstream: bytes, resp: ChatResponse) -> None:
+    json.loads(upstream)
+    # Starlette JSONResponse.render of FastAPI's serialized response model.
+    json.dumps(resp.model_dump(mode="json"), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+    stored = json.dumps({"state": "done", "request_hash": "ab" * 32, "response": resp.model_dump(mode="json")})
+    ChatResponse.model_validate(json.loads(stored)["response"])
+    for i in range(LOG_LINES):
+        json.dumps(_log_record(i), ensure_ascii=False)
+
+
+def request_after(upstream: bytes, resp: ChatResponse) -> None:
+    jsoncodec.loads(upstream)
+    jsoncodec.dumps_model(resp)
+    stored = jsoncodec.dumps({"state": "done", "request_hash": "ab" * 32, "response": resp.model_dump(mode="json")})
+    ChatResponse.model_validate(jsoncodec.loads(stored)["response"])
+    for i in range(LOG_LINES):
+        jsoncodec.dumps_str(_log_record(i))
+
+
+def measure(fn: Callable[[bytes, ChatResponse], None], upstream: bytes, resp: ChatResponse, repeat: int) -> float:
+    """Best of 5 runs: CPU seconds per request."""
+    best = float("inf")
+    for _ in range(5):
+        started = time.process_time()
+        for _ in range(repeat):
+            fn(upstream, resp)
+        best = min(best, (time.process_time() - started) / repeat)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the JSON codec on a chat request's JSON work")
+    parser.add_argument("--completion-chars", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    upstream, resp = build(args.completion_chars)
+    before_body = json.dumps(resp.model_dump(mode="json"), ensure_ascii=False, separators=(",", ":")).encode()
+    assert json.loads(jsoncodec.dumps_model(resp)) == json.loads(before_body), "response bodies differ"
+
+    before = measure(request_before, upstream, resp, args.repeat)
+    after = measure(request_after, upstream, resp, args.repeat)
+    print(f"backend={jsoncodec.BACKEND} completion={args.completion_chars} chars log_lines={LOG_LINES}")
+    print(f"before (stdlib json): {before * 1e6:8.1f} us CPU per request")
+    print(f"after  (codec):       {after * 1e6:8.1f} us CPU per request")
+    print(f"{before / after:.1f}x less CPU, {(before - after) * 1e6:.1f} us saved per request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""CPU and peak memory per multi-MB vision request: parse + hash + upstream body, before vs after.
+
+Before: FastAPI-style json.loads + model_validate, request hash over one json.dumps of the whole
+payload, upstream body serialized from the model (httpx json=). After: model_validate_json on the
+raw bytes, request hash encoded piece by piece, upstream body rebuilt from the original bytes.
+No network I/O: the numbers are pure gateway work.
+
+    python scripts/bench_raw_body.py --images 4 --image-kb 1500 --repeat 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import time
+import tracemalloc
+from collections.abc import Callable
+
+from aigate.api.chat_completions import _hash_request
+from aigate.domain.chat import ChatRequest
+from aigate.providers.qwen_adapter import QwenAdapter
+
+
+def build_body(images: int, image_kb: int) -> bytes:
+    content: list[dict] = [{"type": "text", "text": "Compare these images and describe the differences."}]
+    for _ in range(images):
+        data = base64.b64encode(os.urandom(image_kb * 1024)).decode("ascii")
+        content.append({"type": "image_url", "image_url": {"url": f"data:image/png;base64,{data}"}})
+    body = {"model": "qwen:qwen-vl-max", "messages": [{"role": "user", "content": content}], "max_tokens": 512}
+    return json.dumps(body).encode("utf-8")
+
+
+def _hash_before(req: ChatRequest) -> str:
+    exclude = {name for name in ("max_tokens", "stream_options") if getattr(req, name) is None}
+    payload = req.model_dump(mode="json", exclude=exclude or None)
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+def path_before(raw: bytes) -> tuple[str, bytes]:
+    req = ChatRequest.model_validate(json.loads(raw))
+    request_hash = _hash_before(req)
+    routed = req.model_copy(update={"model": "qwen-vl-max"})
+    payload = QwenAdapter._payload(QwenAdapter.__new__(QwenAdapter), routed, stream=False)
+    # What httpx did with json=: compact dumps, then encode.
+    return request_hash, json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def path_after(raw: bytes) -> tuple[str, bytes]:
+    req = ChatRequest.from_raw(raw)
+    request_hash = _hash_request(req)
+    routed = req.model_copy(update={"model": "qwen-vl-max"})
+    return request_hash, QwenAdapter._request_body(QwenAdapter.__new__(QwenAdapter), routed, stream=False)["content"]
+
+
+def measure(fn: Callable[[bytes], tuple[str, bytes]], raw: bytes, repeat: int) -> tuple[float, int]:
+    """Best CPU seconds and peak bytes allocated (tracemalloc) on top of the raw body."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.process_time()
+        fn(raw)
+        best = min(best, time.process_time() - started)
+    tracemalloc.start()
+    fn(raw)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark raw-body fast path for large requests")
+    parser.add_argument("--images", type=int, default=4)
+    parser.add_argument("--image-kb", type=int, default=1500, help="Decoded size of each image")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    raw = build_body(args.images, args.image_kb)
+    before_hash, before_body = path_before(raw)
+    after_hash, after_body = path_after(raw)
+    assert before_hash == after_hash, "request hashes differ"
+    assert json.loads(before_body) == json.loads(after_body), "upstream bodies differ"
+
+    before_cpu, before_peak = measure(path_before, raw, args.repeat)
+    after_cpu, after_peak = measure(path_after, raw, args.repeat)
+    mb = 1024 * 1024
+    print(f"body={len(raw) / mb:.1f} MB images={args.images} (best of {args.repeat})")
+    print(f"before: {before_cpu * 1000:8.1f} ms CPU  {before_peak / mb:7.1f} MB peak")
+    print(f"after:  {after_cpu * 1000:8.1f} ms CPU  {after_peak / mb:7.1f} MB peak")
+    print(f"CPU {before_cpu / after_cpu:.1f}x less, peak memory {before_peak / after_peak:.1f}x less")
+
+
+if __name__ == "__main__":
+    main()
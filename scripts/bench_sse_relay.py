@@ -0,0 +1,133 @@
+"""CPU per streamed token: JSON round-trip relay (before) vs byte-level SSE relay (after).
+
+Replays a synthetic DashScope-style stream through both relay paths (adapter + chat_completions
+usage scan) without any network I/O, so the numbers are pure gateway CPU.
+
+    python scripts/bench_sse_relay.py --tokens 2000 --repeat 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from collections.abc import Callable, Iterator
+
+from aigate.providers.qwen_adapter import QwenAdapter
+from aigate.providers.sse import SSEParser, find_usage
+
+
+def build_stream(tokens: int, *, read_size: int) -> list[bytes]:
+    """Upstream body split into network-sized reads, one content delta per token."""
+    events = []
+    for i in range(tokens):
+        chunk = {
+            "choices": [{"delta": {"content": f" token{i}"}, "finish_reason": None, "index": 0, "logprobs": None}],
+            "object": "chat.completion.chunk",
+            "usage": None,
+            "created": 1735120033,
+            "system_fingerprint": None,
+            "model": "qwen-plus",
+            "id": "chatcmpl-6ef2c4b1-54b8-9f0d-a1d1-3f5a1c0e2b77",
+        }
+        events.append("data: " + json.dumps(chunk, ensure_ascii=False, separators=(",", ":")))
+    final = {
+        "choices": [],
+        "object": "chat.completion.chunk",
+        "usage": {"prompt_tokens": 12, "completion_tokens": tokens, "total_tokens": tokens + 12},
+        "created": 1735120033,
+        "model": "qwen-plus",
+        "id": "chatcmpl-6ef2c4b1-54b8-9f0d-a1d1-3f5a1c0e2b77",
+    }
+    events.append("data: " + json.dumps(final, separators=(",", ":")))
+    events.append("data: [DONE]")
+    body = ("\n\n".join(events) + "\n\n").encode("utf-8")
+    return [body[i : i + read_size] for i in range(0, len(body), read_size)]
+
+
+def _lines(reads: list[bytes]) -> Iterator[str]:
+    # What httpx aiter_lines does: decode, then split on line breaks.
+    pending = ""
+    for raw in reads:
+        pending += raw.decode("utf-8")
+        *lines, pending = pending.split("\n")
+        yield from lines
+    if pending:
+        yield pending
+
+
+def relay_before(reads: list[bytes]) -> dict | None:
+    """Previous path: json.loads + json.dumps per line in the adapter, json.loads per chunk for usage."""
+    usage = None
+    for line in _lines(reads):
+        if not line.startswith("data: "):
+            continue
+        data_part = line[6:]
+        if data_part.strip() == "[DONE]":
+            chunk = b"data: [DONE]\n"
+        else:
+            try:
+                obj = json.loads(data_part)
+            except json.JSONDecodeError:
+                chunk = (line + "\n").encode("utf-8")
+            else:
+                if obj.get("model"):
+                    obj["model"] = f"qwen:{obj['model']}"
+                chunk = ("data: " + json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+        if chunk.startswith(b"data: ") and chunk != b"data: [DONE]\n":
+            raw = chunk[6:].decode("utf-8").strip()
+            if raw and raw != "[DONE]":
+                obj = json.loads(raw)
+                if isinstance(obj, dict) and "usage" in obj:
+                    usage = obj["usage"]
+    return usage
+
+
+def relay_after(reads: list[bytes]) -> dict | None:
+    """Current path: incremental SSE parser, in-place model rewrite, only the usage event is parsed."""
+    parser = SSEParser()
+    prefix = b"qwen:"
+    usage = None
+
+    def relay(events: list[list[bytes]]) -> None:
+        nonlocal usage
+        for event in events:
+            chunk = QwenAdapter._relay_event(event, prefix)
+            if usage is None:
+                usage, _ = find_usage(chunk)
+
+    for raw in reads:
+        relay(parser.feed(raw))
+    relay(parser.close())
+    return usage
+
+
+def measure(fn: Callable[[list[bytes]], dict | None], reads: list[bytes], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.process_time()
+        fn(reads)
+        best = min(best, time.process_time() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark SSE relay CPU per streamed token")
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--read-size", type=int, default=4096, help="Bytes per upstream network read")
+    args = parser.parse_args()
+
+    reads = build_stream(args.tokens, read_size=args.read_size)
+    assert relay_before(reads) == relay_after(reads), "relay paths disagree on usage"
+
+    before = measure(relay_before, reads, args.repeat)
+    after = measure(relay_after, reads, args.repeat)
+    print(f"tokens={args.tokens} read_size={args.read_size} (best of {args.repeat})")
+    print(f"before: {before / args.tokens * 1e6:8.2f} us CPU/token")
+    print(f"after:  {after / args.tokens * 1e6:8.2f} us CPU/token")
+    print(f"speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,21 @@
 from __future__ import annotations
 
+import asyncio
 import hashlib
 import json
 import logging
+import math
 import time
+from collections.abc import Awaitable, Iterator, Sequence
+from decimal import Decimal
+from json.encoder import encode_basestring as _encode_json_str
+from typing import TYPE_CHECKING, Any
+from uuid import uuid4
 
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Request, Response
+from fastapi.exceptions import RequestValidationError
 from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from aigate.core.auth import AuthContext, get_auth_context
@@ -19,17 +28,41 @@ from aigate.core.metrics import (
     aigate_requests_total,
 )
 from aigate.core.errors import bad_request, conflict, not_implemented
-from aigate.limits.rate_limit import check_rate_limit
+from aigate.core.jsoncodec import dumps_model
 from aigate.core.logging import LogContext, with_context
 from aigate.domain.chat import ChatRequest, ChatResponse, Choice, Message, TextPart
-from aigate.limits.idempotency import get_cached_response, set_cached_response
+from aigate.domain.tokens import count_tokens, estimate_prompt_tokens
+from aigate.limits.body_guard import BodyGuard
+from aigate.limits.budget import BudgetCounter, plan_budgets, record_spend
+from aigate.limits.idempotency import (
+    IdempotencyLock,
+    begin_idempotent_request,
+    release_idempotency_lock,
+    set_cached_response,
+)
+from aigate.limits.lease import LeaseRateLimiter
+from aigate.limits.rate_limit import RateLimitResult, TokenReservation, check_rate_limit, reconcile_tokens
+from aigate.limits.response_cache import ResponseCache, is_cacheable, parse_cache_control
+from aigate.limits.stream_resume import StreamBuffer, parse_last_event_id
 from aigate.providers.registry import ProviderRegistry
+from aigate.providers.sse import delta_text, find_usage
+from aigate.routing.circuit_breaker import CircuitBreakers
+from aigate.routing.fair_queue import admission_for, parse_priority, set_admission
+from aigate.routing.hedging import Hedger
 from aigate.routing.router import parse_explicit_model, route_and_call, route_and_stream
-from aigate.storage.repos import compute_billed_cost, create_request_log, create_usage_event
+from aigate.routing.singleflight import SingleFlight
+from aigate.storage.ledger import LedgerRecord, LedgerUsage, new_ledger_record, write_ledger_records
+from aigate.storage.repos import compute_billed_cost
+
+if TYPE_CHECKING:
+    from redis.asyncio import Redis
 
 router = APIRouter()
 log = logging.getLogger(__name__)
 
+_HASH_SLICE_CHARS = 64 * 1024
+_JSON_ESCAPED = bytes(range(0x20)) + b'"\\'  # bytes json.dumps escapes with ensure_ascii=False
+
 
 def _status_label(code: int) -> str:
     """Group status codes for metrics: 2xx, 4xx, 5xx."""
@@ -40,10 +73,138 @@ def _status_label(code: int) -> str:
     return "5xx"
 
 
+def _canonical_json(value: Any) -> Iterator[bytes]:
+    """
+    json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False), UTF-8 encoded,
+    in pieces: long strings (base64 images) are escaped slice by slice, never copied whole.
+    """
+    if isinstance(value, str):
+        if len(value) <= _HASH_SLICE_CHARS:
+            yield _encode_json_str(value).encode("utf-8")
+            return
+        yield b'"'
+        for i in range(0, len(value), _HASH_SLICE_CHARS):
+            piece = value[i : i + _HASH_SLICE_CHARS]
+            encoded = piece.encode("utf-8")
+            if len(encoded.translate(None, _JSON_ESCAPED)) != len(encoded):
+                encoded = _encode_json_str(piece)[1:-1].encode("utf-8")
+            yield encoded
+        yield b'"'
+    elif isinstance(value, dict):
+        yield b"{"
+        for i, key in enumerate(sorted(value)):
+            if i:
+                yield b","
+            yield _encode_json_str(key).encode("utf-8") + b":"
+            yield from _canonical_json(value[key])
+        yield b"}"
+    elif isinstance(value, list):
+        yield b"["
+        for i, item in enumerate(value):
+            if i:
+                yield b","
+            yield from _canonical_json(item)
+        yield b"]"
+    else:
+        yield json.dumps(value).encode("utf-8")
+
+
 def _hash_request(body: ChatRequest) -> str:
-    payload = body.model_dump(mode="json")
-    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
-    return hashlib.sha256(raw).hexdigest()
+    # Leave newer optional fields out when unset so hashes of existing requests stay the same.
+    exclude = {name for name in ("max_tokens", "stream_options") if getattr(body, name) is None}
+    payload = body.model_dump(mode="json", exclude=exclude or None)
+    digest = hashlib.sha256()
+    for chunk in _canonical_json(payload):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def _read_chat_request(
+    request: Request, auth: AuthContext = Depends(get_auth_context)
+) -> ChatRequest:
+    """
+    Validate the body straight from its bytes (no intermediate dict), keeping the bytes so the
+    adapter can forward them upstream. Errors match FastAPI's own body validation (422).
+
+    Read only after auth, with the body guard narrowed to the org's limits (413 past them).
+    """
+    guard: BodyGuard | None = getattr(request.state, "body_guard", None)
+    if guard is not None:
+        guard.apply(auth.org_id, auth.tier)
+    try:
+        body = ChatRequest.from_raw(await request.body())
+    except ValidationError as e:
+        errors = []
+        for err in e.errors(include_url=False):
+            err = {**err, "loc": ("body", *err["loc"])}
+            if err["type"] == "json_invalid":
+                err["input"] = {}  # not the whole (possibly multi-MB) body
+            errors.append(err)
+        raise RequestValidationError(errors) from e
+    if guard is not None:
+        guard.check_request(body)
+    return body
+
+
+def _estimate_stream_usage(body: ChatRequest, completion: str) -> dict[str, int]:
+    return {"prompt_tokens": estimate_prompt_tokens(body.messages), "completion_tokens": count_tokens(completion)}
+
+
+def _usage_tokens(prompt_tokens: int | None, completion_tokens: int | None) -> int:
+    return (prompt_tokens or 0) + (completion_tokens or 0)
+
+
+async def _check_rate_limit(
+    request: Request,
+    redis: Redis,
+    settings: Settings,
+    org_id: str,
+    body: ChatRequest,
+    budgets: Sequence[BudgetCounter],
+) -> RateLimitResult:
+    """
+    RPM check and spend budgets; with TPM limits, also reserve estimated prompt tokens + max
+    completion tokens.
+    """
+    tpm_limit = settings.rate_limit_tpm_default
+    model_tpm_limit = getattr(request.app.state, "tpm_model_limits", {}).get(body.model)
+    tokens = 0
+    if tpm_limit is not None or model_tpm_limit is not None:
+        prompt_tokens = await asyncio.to_thread(estimate_prompt_tokens, body.messages)
+        tokens = prompt_tokens + (body.max_tokens or settings.rate_limit_tpm_default_max_tokens)
+    limits = {
+        "model": body.model,
+        "tokens": tokens,
+        "tpm_limit": tpm_limit,
+        "model_tpm_limit": model_tpm_limit,
+        "budgets": budgets,
+    }
+    lease_limiter: LeaseRateLimiter | None = getattr(request.app.state, "rate_limiter", None)
+    if lease_limiter is not None:
+        return await lease_limiter.check(org_id, settings.rate_limit_rpm_default, **limits)
+    return await check_rate_limit(redis, org_id, settings.rate_limit_rpm_default, **limits)
+
+
+async def _reconcile_tokens(
+    request: Request, redis: Redis | None, reservation: TokenReservation | None, actual_tokens: int
+) -> None:
+    if redis is None or reservation is None:
+        return
+    lease_limiter: LeaseRateLimiter | None = getattr(request.app.state, "rate_limiter", None)
+    try:
+        if lease_limiter is not None:
+            await lease_limiter.reconcile(reservation, actual_tokens)
+        else:
+            await reconcile_tokens(redis, reservation, actual_tokens)
+    except Exception:
+        log.exception("chat.completions token reconcile failed")
+
+
+async def _release_idempotency_lock(redis: Redis, lock: IdempotencyLock) -> None:
+    try:
+        await release_idempotency_lock(redis, lock)
+    except Exception:
+        log.exception("chat.completions idempotency release failed")
 
 
 def _effective_timeout(request: Request, settings: Settings) -> float:
@@ -60,14 +221,126 @@ def _effective_timeout(request: Request, settings: Settings) -> float:
     return min(value, settings.qwen_timeout_max_seconds)
 
 
-@router.post("/chat/completions")
+async def _billed_cost(
+    request: Request,
+    session: AsyncSession | None,
+    *,
+    org_id: str,
+    provider: str,
+    model: str,
+    prompt_tokens: int | None,
+    completion_tokens: int | None,
+    raw_cost_from_provider: Decimal | None,
+) -> tuple[Decimal | None, Decimal | None]:
+    """Price from the in-memory index once loaded; fall back to per-request DB lookup."""
+    price_index = getattr(request.app.state, "price_index", None)
+    if price_index is not None and price_index.loaded:
+        return price_index.compute_billed_cost(
+            org_id=org_id,
+            provider=provider,
+            model=model,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            raw_cost_from_provider=raw_cost_from_provider,
+        )
+    if session is None:
+        return (None, None)
+    return await compute_billed_cost(
+        session,
+        org_id=org_id,
+        provider=provider,
+        model=model,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        raw_cost_from_provider=raw_cost_from_provider,
+    )
+
+
+async def _record_spend(request: Request, budgets: Sequence[BudgetCounter], record: LedgerRecord) -> None:
+    redis = getattr(request.app.state, "redis", None)
+    cost = record.usage.billed_cost if record.usage is not None else None
+    if redis is None or not budgets or cost is None:
+        return
+    try:
+        totals = await record_spend(redis, budgets, cost)
+    except Exception:
+        # Reconciliation against usage_events catches the counters up later.
+        log.exception("chat.completions spend record failed")
+        return
+    lease_limiter: LeaseRateLimiter | None = getattr(request.app.state, "rate_limiter", None)
+    if lease_limiter is not None:
+        lease_limiter.note_spend(budgets, totals)
+
+
+async def _record_ledger(
+    request: Request,
+    session: AsyncSession | None,
+    record: LedgerRecord,
+    budgets: Sequence[BudgetCounter] = (),
+) -> None:
+    """
+    Add the billed cost to the spend budget counters, then hand the record to the background
+    writer; write inline only when no writer is running.
+    """
+    await _record_spend(request, budgets, record)
+    writer = getattr(request.app.state, "ledger_writer", None)
+    if writer is not None:
+        await writer.enqueue(record)
+        return
+    if session is None:
+        return
+    try:
+        await write_ledger_records(session, [record])
+        await session.commit()
+    except Exception:
+        await session.rollback()
+
+
+def _inline_schema(model: type[BaseModel]) -> dict[str, Any]:
+    """JSON schema with $defs inlined, for a request body declared through openapi_extra."""
+    schema = model.model_json_schema()
+    defs = schema.pop("$defs", {})
+
+    def inline(node: Any) -> Any:
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return inline(defs[node["$ref"].rsplit("/", 1)[-1]])
+            return {k: inline(v) for k, v in node.items() if k != "discriminator"}
+        if isinstance(node, list):
+            return [inline(v) for v in node]
+        return node
+
+    return inline(schema)
+
+
+def _json_response(resp: ChatResponse, response: Response) -> Response:
+    """
+    The body straight from pydantic-core (no intermediate dict, no re-validation against the
+    response model), plus the headers set on the injected response.
+    """
+    out = Response(dumps_model(resp), media_type="application/json")
+    out.headers.raw.extend(response.headers.raw)
+    return out
+
+
+@router.post(
+    "/chat/completions",
+    response_model=ChatResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": _inline_schema(ChatRequest)}},
+        }
+    },
+)
 async def chat_completions(
     request: Request,
-    body: ChatRequest,
+    response: Response,
     auth: AuthContext = Depends(get_auth_context),
+    body: ChatRequest = Depends(_read_chat_request),
     registry: ProviderRegistry = Depends(get_provider_registry),
     session: AsyncSession | None = Depends(get_db_session),
-) -> ChatResponse:
+) -> Response:
     request_id = getattr(request.state, "request_id", None)
     logger = with_context(
         log,
@@ -83,35 +356,110 @@ async def chat_completions(
     settings = get_settings()
     redis = getattr(request.app.state, "redis", None)
     effective_timeout = _effective_timeout(request, settings)
+    breakers: CircuitBreakers | None = getattr(request.app.state, "circuit_breakers", None)
+    budgets = plan_budgets(auth.org_id, auth.budgets) if redis else []
+    # Who this request's upstream call queues as when upstream capacity is saturated.
+    set_admission(
+        admission_for(
+            auth.org_id,
+            auth.tier,
+            parse_priority(request.headers.get("X-Priority")),
+            tier_weights=getattr(request.app.state, "tier_weights", {}),
+            batch_weight=settings.fair_queue_batch_weight,
+        )
+    )
 
-    # Streaming path: Idempotency not supported
+    # Streaming path: with a stream buffer (Redis), Idempotency-Key / Last-Event-ID replay the
+    # buffered stream instead of generating again; without one, Idempotency is not supported.
     if body.stream:
-        if idem_key:
+        if breakers is not None:
+            # Fail fast before a stream (and its buffer) is set up for an open circuit.
+            breaker = breakers.get(target.provider, target.provider_model)
+            if not breaker.admits():
+                raise breaker.rejection()
+        stream_buffer: StreamBuffer | None = getattr(request.app.state, "stream_buffer", None)
+        if idem_key and stream_buffer is None:
             raise bad_request("Idempotency is not supported with streaming")
-        if redis:
-            await check_rate_limit(redis, auth.org_id, settings.rate_limit_rpm_default)
+        stream_id = None
+        if stream_buffer is not None:
+            resume = parse_last_event_id(request.headers.get("Last-Event-ID"))
+            # Only the Idempotency-Key or a Last-Event-ID names an existing stream; anything else gets
+            # a fresh server id (X-Request-ID is client-chosen and not unique).
+            stream_id = idem_key or (resume[0] if resume else None) or uuid4().hex
+            claim = await stream_buffer.claim(auth.org_id, stream_id, request_hash)
+            if claim == "conflict":
+                raise conflict(
+                    "Idempotency-Key already used with different request body"
+                    if idem_key
+                    else "Last-Event-ID belongs to a different request"
+                )
+            if claim == "replay":
+                after = resume[1] if resume and resume[0] == stream_id else "0"
+                return StreamingResponse(
+                    stream_buffer.replay(
+                        auth.org_id, stream_id, after=after, idle_timeout_seconds=effective_timeout
+                    ),
+                    media_type="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+                )
+        try:
+            rate_limit = (
+                await _check_rate_limit(request, redis, settings, auth.org_id, body, budgets) if redis else None
+            )
+        except BaseException:
+            if stream_id is not None:
+                # Rejected before generating: free the id so a retry generates instead of replaying nothing.
+                await stream_buffer.release(auth.org_id, stream_id)
+            raise
+        reservation = rate_limit.reservation if rate_limit else None
+
+        client_wants_usage = bool(body.stream_options and body.stream_options.include_usage)
 
         async def stream_gen():
             started = time.perf_counter()
             status_code = 200
             usage_data: dict | None = None
+            usage_estimated = False
+            # Relayed delta text (not whole events), kept only to estimate completion tokens if usage
+            # never arrives.
+            completion_parts: list[str] = []
+            relayed = False
             try:
-                async for chunk in route_and_stream(registry, body, timeout_seconds=effective_timeout):
-                    if chunk.startswith(b"data: ") and chunk != b"data: [DONE]\n":
-                        try:
-                            raw = chunk[6:].decode("utf-8").strip()
-                            if raw and raw != "[DONE]":
-                                obj = json.loads(raw)
-                                if isinstance(obj, dict) and "usage" in obj:
-                                    usage_data = obj["usage"]
-                        except (json.JSONDecodeError, UnicodeDecodeError):
-                            pass
+                async for chunk in route_and_stream(
+                    registry, body, timeout_seconds=effective_timeout, breakers=breakers
+                ):
+                    if usage_data is None:
+                        usage_data, usage_only = find_usage(chunk)
+                        if usage_only and not client_wants_usage:
+                            # Requested by the gateway (include_usage), not by this client.
+                            continue
+                    if chunk != b"data: [DONE]\n":
+                        relayed = True
+                        if usage_data is None:
+                            text = delta_text(chunk)
+                            if text:
+                                completion_parts.append(text)
                     yield chunk
             except Exception as e:
                 status_code = getattr(e, "status_code", 500)
                 log.exception("chat.completions stream failed: %s", e)
                 raise
             finally:
+                if usage_data is None and relayed:
+                    try:
+                        usage_data = await asyncio.to_thread(_estimate_stream_usage, body, "".join(completion_parts))
+                        usage_estimated = True
+                    except Exception:
+                        log.exception("chat.completions stream usage estimate failed")
+                await _reconcile_tokens(
+                    request,
+                    redis,
+                    reservation,
+                    _usage_tokens(
+                        (usage_data or {}).get("prompt_tokens") or (usage_data or {}).get("input_tokens"),
+                        (usage_data or {}).get("completion_tokens") or (usage_data or {}).get("output_tokens"),
+                    ),
+                )
                 latency_ms = int((time.perf_counter() - started) * 1000)
                 latency_sec = latency_ms / 1000.0
                 status_label = _status_label(status_code)
@@ -141,23 +489,14 @@ async def chat_completions(
                         "latency_ms": latency_ms,
                     },
                 )
-                if session is not None and request_id:
+                if request_id:
                     try:
-                        req_row = await create_request_log(
-                            session,
-                            request_id=str(request_id),
-                            org_id=auth.org_id,
-                            provider=target.provider,
-                            model=target.provider_model,
-                            status_code=int(status_code),
-                            latency_ms=latency_ms,
-                            request_hash=request_hash,
-                            idempotency_key=None,
-                        )
+                        usage: LedgerUsage | None = None
                         if usage_data:
                             prompt_tokens = usage_data.get("prompt_tokens") or usage_data.get("input_tokens")
                             completion_tokens = usage_data.get("completion_tokens") or usage_data.get("output_tokens")
-                            billed_raw, billed_cost = await compute_billed_cost(
+                            billed_raw, billed_cost = await _billed_cost(
+                                request,
                                 session,
                                 org_id=auth.org_id,
                                 provider=target.provider,
@@ -166,67 +505,144 @@ async def chat_completions(
                                 completion_tokens=completion_tokens,
                                 raw_cost_from_provider=None,
                             )
-                            await create_usage_event(
-                                session,
-                                org_id=auth.org_id,
-                                request_db_id=req_row.id,
-                                provider=target.provider,
-                                model=target.provider_model,
+                            usage = LedgerUsage(
                                 prompt_tokens=prompt_tokens,
                                 completion_tokens=completion_tokens,
                                 total_tokens=(prompt_tokens or 0) + (completion_tokens or 0),
                                 raw_cost=billed_raw,
                                 billed_cost=billed_cost,
                                 currency="USD",
+                                estimated=usage_estimated,
                             )
                             if billed_cost is not None:
                                 aigate_billed_cost_total.labels(
                                     provider=target.provider,
                                     model=target.provider_model,
                                 ).inc(float(billed_cost))
-                        await session.commit()
+                        await _record_ledger(
+                            request,
+                            session,
+                            new_ledger_record(
+                                request_id=str(request_id),
+                                org_id=auth.org_id,
+                                provider=target.provider,
+                                model=target.provider_model,
+                                status_code=int(status_code),
+                                latency_ms=latency_ms,
+                                request_hash=request_hash,
+                                idempotency_key=idem_key,
+                                usage=usage,
+                                api_key_id=auth.api_key_id,
+                            ),
+                            budgets,
+                        )
                     except Exception:
-                        await session.rollback()
+                        log.exception("chat.completions stream ledger failed")
 
-        return StreamingResponse(
-            stream_gen(),
-            media_type="text/event-stream",
-            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
-        )
+        chunks = stream_gen()
+        if stream_buffer is not None and stream_id is not None:
+            # Generation runs to completion in the buffer's task even if this client disconnects.
+            chunks = stream_buffer.start(auth.org_id, stream_id, chunks)
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        if rate_limit is not None:
+            headers.update(rate_limit.headers())
+        return StreamingResponse(chunks, media_type="text/event-stream", headers=headers)
 
-    # Idempotency: return cached response if same key + same body
+    # Idempotency: return cached response if same key + same body; otherwise claim the key
+    # (pending marker) so concurrent duplicates wait for this request instead of calling upstream.
+    idem_lock: IdempotencyLock | None = None
     if idem_key and redis:
-        cached = await get_cached_response(redis, auth.org_id, idem_key, request_hash)
-        if cached == "conflict":
-            raise conflict()
-        if isinstance(cached, ChatResponse):
+        lease_seconds = math.ceil(effective_timeout) + settings.idempotency_lease_margin_seconds
+        claim = await begin_idempotent_request(
+            redis,
+            auth.org_id,
+            idem_key,
+            request_hash,
+            lease_seconds=lease_seconds,
+            wait_seconds=lease_seconds,
+        )
+        if isinstance(claim, ChatResponse):
             request.state.idempotency_restored = True
-            return cached
+            return _json_response(claim, response)
+        idem_lock = claim
 
+    reservation: TokenReservation | None = None
     if redis:
-        await check_rate_limit(redis, auth.org_id, settings.rate_limit_rpm_default)
+        try:
+            rate_limit = await _check_rate_limit(request, redis, settings, auth.org_id, body, budgets)
+        except BaseException:
+            # Also on cancellation (client disconnect): the key must not stay pending for the lease.
+            if idem_lock is not None:
+                await _release_idempotency_lock(redis, idem_lock)
+            raise
+        reservation = rate_limit.reservation
+        response.headers.update(rate_limit.headers())
+
+    response_cache: ResponseCache | None = getattr(request.app.state, "response_cache", None)
+    cache_read = cache_write = False
+    if response_cache is not None and is_cacheable(body):
+        cache_read, cache_write = parse_cache_control(request.headers.get("Cache-Control"))
 
     started = time.perf_counter()
     status_code = 200
     resp: ChatResponse | None = None
+    cache_hit = False
+    coalesced = False
     billed_raw_cost = None
     billed_cost = None
+    served = target
 
     logger.info("chat.completions.request", extra={"provider": target.provider, "model": target.provider_model})
     try:
-        resp = await route_and_call(registry, body, timeout_seconds=effective_timeout)
-        if session is not None and resp is not None and resp.usage is not None:
-            billed_raw_cost, billed_cost = await compute_billed_cost(
+        if cache_read:
+            resp = await response_cache.get(auth.org_id, body.model, request_hash)
+            cache_hit = resp is not None
+        if resp is None:
+            hedger: Hedger | None = getattr(request.app.state, "hedger", None)
+            fallbacks: dict[str, str] = getattr(request.app.state, "model_fallbacks", {})
+
+            def call_upstream() -> Awaitable[ChatResponse]:
+                return route_and_call(
+                    registry,
+                    body,
+                    timeout_seconds=effective_timeout,
+                    hedger=hedger,
+                    hedge_delay=hedger.delay_for(body.model, request.headers.get("X-Hedge")) if hedger else None,
+                    fallback_model=fallbacks.get(body.model),
+                    breakers=breakers,
+                )
+
+            singleflight: SingleFlight | None = getattr(request.app.state, "singleflight", None)
+            # Sampled requests (temperature != 0) are sent in parallel on purpose to get different
+            # completions: only deterministic ones share a call, as with the response cache.
+            if singleflight is not None and is_cacheable(body):
+                resp, coalesced = await singleflight.do(auth.org_id, request_hash, call_upstream)
+            else:
+                resp = await call_upstream()
+        if resp is not None and resp.model != body.model:
+            # Served by the fallback model (hedge won or circuit open): bill and log what was served.
+            served = parse_explicit_model(resp.model)
+        if resp is not None and resp.usage is not None:
+            billed_raw_cost, billed_cost = await _billed_cost(
+                request,
                 session,
                 org_id=auth.org_id,
-                provider=target.provider,
-                model=target.provider_model,
+                provider=served.provider,
+                model=served.provider_model,
                 prompt_tokens=resp.usage.prompt_tokens,
                 completion_tokens=resp.usage.completion_tokens,
                 raw_cost_from_provider=resp.usage.raw_cost,
             )
             if billed_cost is not None:
                 resp.usage.billed_cost = billed_cost
+            if cache_hit or coalesced:
+                # Served without an upstream call of its own: billed as usual, zero provider cost.
+                billed_raw_cost = Decimal("0")
+
+        if cache_read or cache_write:
+            response.headers["X-Cache"] = "HIT" if cache_hit else "MISS"
+        if cache_write and not cache_hit and resp is not None:
+            await response_cache.set(auth.org_id, body.model, request_hash, resp)
 
         if idem_key and redis and resp is not None:
             await set_cached_response(
@@ -237,13 +653,26 @@ async def chat_completions(
                 resp,
                 settings.idempotency_ttl_seconds,
             )
-        return resp
+            idem_lock = None  # replaced by the stored response
+        return _json_response(resp, response)
     except Exception as e:
         # Best-effort capture of status code for ledger (FastAPI HTTPException has .status_code).
         status_code = getattr(e, "status_code", 500)
         log.exception("chat.completions request failed: %s", e)
         raise
     finally:
+        if idem_lock is not None:
+            # Failed or cancelled (client disconnect) before the response was stored: free the key
+            # now instead of making retries wait out the lease.
+            await _release_idempotency_lock(redis, idem_lock)
+        # Cache hits and coalesced followers used no upstream tokens of their own.
+        upstream_called = resp is not None and resp.usage is not None and not (cache_hit or coalesced)
+        await _reconcile_tokens(
+            request,
+            redis,
+            reservation,
+            _usage_tokens(resp.usage.prompt_tokens, resp.usage.completion_tokens) if upstream_called else 0,
+        )
         latency_ms = int((time.perf_counter() - started) * 1000)
         latency_sec = latency_ms / 1000.0
         status_label = _status_label(status_code)
@@ -277,43 +706,41 @@ async def chat_completions(
         if getattr(request.state, "idempotency_restored", False):
             return
 
-        if session is not None and request_id:
-            try:
-                req_row = await create_request_log(
-                    session,
+        if request_id:
+            usage = None
+            if resp is not None and resp.usage is not None:
+                usage = LedgerUsage(
+                    prompt_tokens=resp.usage.prompt_tokens,
+                    completion_tokens=resp.usage.completion_tokens,
+                    total_tokens=resp.usage.total_tokens,
+                    raw_cost=billed_raw_cost,
+                    billed_cost=billed_cost,
+                    currency=resp.usage.currency,
+                )
+                if billed_cost is not None:
+                    aigate_billed_cost_total.labels(
+                        provider=served.provider,
+                        model=served.provider_model,
+                    ).inc(float(billed_cost))
+            await _record_ledger(
+                request,
+                session,
+                new_ledger_record(
                     request_id=str(request_id),
                     org_id=auth.org_id,
-                    provider=target.provider,
-                    model=target.provider_model,
+                    provider=served.provider,
+                    model=served.provider_model,
                     status_code=int(status_code),
                     latency_ms=latency_ms,
                     request_hash=request_hash,
                     idempotency_key=idem_key,
-                )
-
-                if resp is not None and resp.usage is not None:
-                    await create_usage_event(
-                        session,
-                        org_id=auth.org_id,
-                        request_db_id=req_row.id,
-                        provider=target.provider,
-                        model=target.provider_model,
-                        prompt_tokens=resp.usage.prompt_tokens,
-                        completion_tokens=resp.usage.completion_tokens,
-                        total_tokens=resp.usage.total_tokens,
-                        raw_cost=billed_raw_cost,
-                        billed_cost=billed_cost,
-                        currency=resp.usage.currency,
-                    )
-                    if billed_cost is not None:
-                        aigate_billed_cost_total.labels(
-                            provider=target.provider,
-                            model=target.provider_model,
-                        ).inc(float(billed_cost))
-
-                await session.commit()
-            except Exception:
-                await session.rollback()
+                    usage=usage,
+                    cache_hit=cache_hit,
+                    coalesced=coalesced,
+                    api_key_id=auth.api_key_id,
+                ),
+                budgets,
+            )
 
 
 def _content_as_text(content: str | list) -> str:
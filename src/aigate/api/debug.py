@@ -0,0 +1,23 @@
+"""Operational debug endpoints (API key required: they expose upstream and breaker state)."""
+
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, Request
+
+from aigate.core.auth import get_auth_context
+
+router = APIRouter(dependencies=[Depends(get_auth_context)])
+
+
+@router.get("/debug/circuit-breakers")
+def circuit_breakers(request: Request) -> list[dict[str, object]]:
+    """Current state and rolling-window counts of every circuit breaker seen so far."""
+    breakers = getattr(request.app.state, "circuit_breakers", None)
+    return breakers.snapshot() if breakers is not None else []
+
+
+@router.get("/debug/providers")
+def providers(request: Request) -> dict[str, bool]:
+    """Health of every registered provider adapter (False: no usable upstream endpoint)."""
+    registry = getattr(request.app.state, "provider_registry", None)
+    return registry.health() if registry is not None else {}
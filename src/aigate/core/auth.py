@@ -2,19 +2,24 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 
-from fastapi import Depends, Header
+from fastapi import Depends, Header, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from aigate.core.auth_cache import NEGATIVE, ApiKeyCache, CachedApiKey
 from aigate.core.config import Settings, get_settings
 from aigate.core.deps import get_db_session
 from aigate.core.errors import unauthorized
-from aigate.storage.repos import get_active_api_key_by_hash, hash_api_key
+from aigate.limits.budget import Budget
+from aigate.storage.repos import get_active_api_key_by_hash, get_org_tier, get_spend_budgets, hash_api_key
 
 
 @dataclass(frozen=True)
 class AuthContext:
     org_id: str
     api_key: str
+    api_key_id: str | None = None
+    budgets: tuple[Budget, ...] = ()
+    tier: str = "standard"
 
 
 def _parse_bearer(authorization: str | None) -> str | None:
@@ -29,7 +34,34 @@ def _parse_bearer(authorization: str | None) -> str | None:
     return value
 
 
+async def _lookup_api_key(
+    session: AsyncSession, cache: ApiKeyCache | None, key_hash: str
+) -> CachedApiKey:
+    if cache is not None:
+        entry = cache.get(key_hash)
+        if entry is not None:
+            return entry
+    row = await get_active_api_key_by_hash(session, key_hash=key_hash)
+    if row is None:
+        entry = NEGATIVE
+    else:
+        # Budgets are cached with the key: changes apply after the cache TTL or an invalidation.
+        budgets = await get_spend_budgets(session, org_id=row.org_id, api_key_id=row.id)
+        tier = await get_org_tier(session, org_id=row.org_id)
+        entry = CachedApiKey(
+            org_id=row.org_id,
+            is_active=row.is_active,
+            api_key_id=row.id,
+            budgets=tuple(Budget.from_row(b) for b in budgets),
+            tier=tier or "standard",
+        )
+    if cache is not None:
+        cache.put(key_hash, entry)
+    return entry
+
+
 async def get_auth_context(
+    request: Request,
     authorization: str | None = Header(default=None, alias="Authorization"),
     settings: Settings = Depends(get_settings),
     session: AsyncSession | None = Depends(get_db_session),
@@ -40,10 +72,17 @@ async def get_auth_context(
 
     # Preferred behaviour: validate key via Postgres when configured.
     if session is not None:
-        row = await get_active_api_key_by_hash(session, key_hash=hash_api_key(api_key))
-        if row is None:
+        cache = getattr(request.app.state, "api_key_cache", None)
+        entry = await _lookup_api_key(session, cache, hash_api_key(api_key))
+        if entry.org_id is None or not entry.is_active:
             raise unauthorized("Invalid API key")
-        return AuthContext(org_id=row.org_id, api_key=api_key)
+        return AuthContext(
+            org_id=entry.org_id,
+            api_key=api_key,
+            api_key_id=entry.api_key_id,
+            budgets=entry.budgets,
+            tier=entry.tier,
+        )
 
     # Fallback: local/test without DB configured.
     if settings.aigate_env in ("local", "test"):
@@ -0,0 +1,133 @@
+"""In-process API key cache with Redis pub/sub invalidation across replicas."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from aigate.core.metrics import aigate_api_key_cache_evictions_total, aigate_api_key_cache_requests_total
+from aigate.limits.budget import Budget
+
+if TYPE_CHECKING:
+    from redis.asyncio import Redis
+
+log = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "apikeys:invalidate"
+INVALIDATE_ALL = "*"
+
+
+@dataclass(frozen=True)
+class CachedApiKey:
+    """Cached lookup result. org_id=None is a negative entry (unknown or inactive key)."""
+
+    org_id: str | None
+    is_active: bool
+    api_key_id: str | None = None
+    budgets: tuple[Budget, ...] = ()  # spend budgets of the org and of this key
+    tier: str = "standard"  # the org's tier (fair-queuing weight)
+
+
+NEGATIVE = CachedApiKey(org_id=None, is_active=False)
+
+
+class ApiKeyCache:
+    """Bounded LRU of key_hash -> CachedApiKey with separate TTLs for positive and negative entries."""
+
+    def __init__(
+        self,
+        *,
+        max_size: int,
+        ttl_seconds: float,
+        negative_ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._max_size = max_size
+        self._ttl = ttl_seconds
+        self._negative_ttl = negative_ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[float, CachedApiKey]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key_hash: str) -> CachedApiKey | None:
+        item = self._entries.get(key_hash)
+        if item is None:
+            aigate_api_key_cache_requests_total.labels(result="miss").inc()
+            return None
+        expires_at, entry = item
+        if expires_at <= self._clock():
+            del self._entries[key_hash]
+            aigate_api_key_cache_evictions_total.labels(reason="expired").inc()
+            aigate_api_key_cache_requests_total.labels(result="miss").inc()
+            return None
+        self._entries.move_to_end(key_hash)
+        aigate_api_key_cache_requests_total.labels(result="hit").inc()
+        return entry
+
+    def put(self, key_hash: str, entry: CachedApiKey) -> None:
+        if self._max_size <= 0:
+            return
+        ttl = self._ttl if entry.org_id is not None and entry.is_active else self._negative_ttl
+        self._entries[key_hash] = (self._clock() + ttl, entry)
+        self._entries.move_to_end(key_hash)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+            aigate_api_key_cache_evictions_total.labels(reason="size").inc()
+
+    def invalidate(self, key_hash: str | None = None) -> None:
+        """Drop one key, or everything when key_hash is None."""
+        if key_hash is None:
+            dropped = len(self._entries)
+            self._entries.clear()
+        else:
+            dropped = 1 if self._entries.pop(key_hash, None) is not None else 0
+        if dropped:
+            aigate_api_key_cache_evictions_total.labels(reason="invalidated").inc(dropped)
+
+
+async def publish_api_key_invalidation(redis: Redis, key_hash: str | None = None) -> None:
+    """Tell every gateway replica to drop key_hash (or the whole cache) from its API key cache."""
+    await redis.publish(INVALIDATION_CHANNEL, key_hash or INVALIDATE_ALL)
+
+
+def _apply_invalidation(cache: ApiKeyCache, data: object) -> None:
+    if isinstance(data, bytes):
+        data = data.decode("utf-8", errors="replace")
+    if not isinstance(data, str):
+        return
+    cache.invalidate(None if data == INVALIDATE_ALL else data)
+
+
+async def run_invalidation_listener(
+    redis: Redis, cache: ApiKeyCache, *, reconnect_delay_seconds: float = 1.0
+) -> None:
+    """
+    Subscribe to invalidation messages until cancelled.
+    Messages published while disconnected are lost, so the cache is cleared on every (re)subscribe.
+    """
+    while True:
+        pubsub = redis.pubsub()
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            cache.invalidate()
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    _apply_invalidation(cache, message.get("data"))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.warning("auth_cache.listener_error", extra={"error": str(e)})
+            cache.invalidate()
+            await asyncio.sleep(reconnect_delay_seconds)
+        finally:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
@@ -14,14 +14,40 @@ class Settings(BaseSettings):
     aigate_log_level: str = "INFO"
     aigate_request_id_header: str = "X-Request-ID"
 
+    # Request body limits, enforced while the body streams in (413 as soon as one is crossed).
+    # body_limits overrides per org id or tier: "name=max_bytes[|max_messages[|max_image_bytes]],..."
+    body_max_bytes: int = 32 * 1024 * 1024
+    body_max_messages: int = 1000
+    body_max_image_bytes: int = 20 * 1024 * 1024
+    body_limits: str | None = None
+
     # Providers (optional in skeleton)
     openai_api_key: str | None = None
     openai_base_url: str = "https://api.openai.com/v1"
 
+    # Adapters built once at startup (comma-separated); unconfigured ones are skipped
+    providers: str = "qwen"
+    provider_warmup_timeout_seconds: float = 10.0
+    provider_drain_timeout_seconds: float = 30.0
+
+    # Upstream HTTP connection pools (one per endpoint); HTTP/2 needs the h2 package (httpx[http2])
+    upstream_http2: bool = False
+    upstream_max_connections: int = 100
+    upstream_max_keepalive_connections: int = 20
+    upstream_keepalive_expiry_seconds: float = 30.0
+    upstream_dns_cache_seconds: float = 60.0  # 0: resolve on every new connection
+    upstream_prewarm_connections: int = 1  # opened per endpoint at startup
+
     qwen_api_key: str | None = None
     qwen_base_url: str | None = "https://dashscope-us.aliyuncs.com/compatible-mode/v1"
     qwen_timeout_default_seconds: float = 120.0
     qwen_timeout_max_seconds: float = 300.0
+    # Several upstream endpoints: "url[|weight[|api_key]],..." (overrides qwen_base_url)
+    qwen_endpoints: str | None = None
+    qwen_balancing: str = "p2c_ewma"  # round_robin | least_outstanding | p2c_ewma
+    qwen_endpoint_eject_after_failures: int = 5
+    qwen_endpoint_eject_seconds: float = 30.0
+    qwen_models_ttl_seconds: float = 300.0  # GET /models result is cached this long
     qwen_default_input_price_per_1k: Decimal = Decimal("0.0005")
     qwen_default_output_price_per_1k: Decimal = Decimal("0.001")
 
@@ -32,7 +58,87 @@ class Settings(BaseSettings):
     database_url: str | None = None
     redis_url: str | None = None
     idempotency_ttl_seconds: int = 86400  # 24h
-    rate_limit_rpm_default: int = 60  # requests per minute per org
+    # Pending-marker lease = request timeout + margin; a crashed owner frees the key when it expires
+    idempotency_lease_margin_seconds: int = 30
+    rate_limit_rpm_default: int = 60  # requests per minute per org, sliding 60s window
+    # Tokens per minute: estimated prompt + max_tokens are reserved at admission, then reconciled
+    rate_limit_tpm_default: int | None = None  # per org, all models; None disables
+    rate_limit_tpm_models: str | None = None  # per org and model: "provider:model=limit,..."
+    rate_limit_tpm_default_max_tokens: int = 1024  # reserved for completions when max_tokens is unset
+    # "redis": every check is one Redis script call; "hybrid": per-replica leases of each quota,
+    # refilled from Redis in the background (admits at most lease_fraction x limit less per replica)
+    rate_limit_mode: Literal["redis", "hybrid"] = "redis"
+    rate_limit_lease_fraction: float = 0.1
+    rate_limit_lease_flush_ms: int = 20
+    # Spend budgets (spend_budgets rows) are enforced from Redis counters; this is how often the
+    # counters are caught up with usage_events in Postgres
+    budget_reconcile_interval_seconds: float = 300.0
+
+    # API key cache (per replica; revocations fan out over Redis pub/sub)
+    api_key_cache_max_size: int = 10_000
+    api_key_cache_ttl_seconds: float = 60.0
+    api_key_cache_negative_ttl_seconds: float = 10.0
+
+    # Price index (in-memory price_rules; reloaded on Redis version bump or TTL)
+    price_index_ttl_seconds: float = 30.0
+    price_index_poll_seconds: float = 1.0
+
+    # Ledger writer (RequestLog/UsageEvent are bulk-inserted off the request path)
+    ledger_queue_max: int = 10_000
+    ledger_batch_size: int = 200
+    ledger_flush_interval_ms: int = 200
+    ledger_enqueue_timeout_ms: int = 50
+    # Spool: batches the DB can't take within the budget go to disk and are replayed later.
+    ledger_spool_dir: str | None = None  # disabled when unset
+    ledger_write_budget_ms: int = 500
+    ledger_spool_segment_max_bytes: int = 16 * 1024 * 1024
+    ledger_spool_fsync_interval_ms: int = 100
+    ledger_spool_replay_interval_seconds: float = 5.0
+
+    # Response cache (opt-in; only temperature=0 non-stream requests)
+    response_cache_enabled: bool = False
+    response_cache_ttl_seconds: int = 3600
+    response_cache_local_max_entries: int = 2048
+    response_cache_local_ttl_seconds: float = 60.0
+    response_cache_max_entry_bytes: int = 256 * 1024
+
+    # Single-flight: concurrent identical non-stream requests share one upstream call
+    singleflight_enabled: bool = True
+    singleflight_redis_enabled: bool = False  # also coalesce across replicas
+    singleflight_result_ttl_seconds: int = 30
+
+    # Hedged unary requests: race a second attempt when the first is slower than the delay
+    hedge_models: str | None = None  # comma-separated "provider:model" list, "*" for all; X-Hedge overrides
+    hedge_delay_ms: int | None = None  # None: use the model's observed p95
+    hedge_min_delay_ms: int = 50
+    hedge_budget_ratio: float = 0.05  # at most ~5% extra upstream calls
+    # Fallback models for hedges and open circuits: "provider:model=provider:fallback,..."
+    model_fallbacks: str | None = None
+
+    # Adaptive concurrency limit on Qwen calls (AIMD); excess requests queue until their timeout
+    qwen_concurrency_enabled: bool = True
+    qwen_concurrency_initial: int = 50
+    qwen_concurrency_min: int = 4
+    qwen_concurrency_max: int = 500
+    qwen_concurrency_max_queue: int = 1000
+    # Queued requests are served weighted-fair across orgs: weight by org tier, times
+    # fair_queue_batch_weight for X-Priority: batch
+    fair_queue_tier_weights: str = "free=1,standard=2,enterprise=4"
+    fair_queue_batch_weight: float = 0.25
+
+    # Circuit breaker per provider:model (rolling window of upstream outcomes)
+    circuit_breaker_enabled: bool = True
+    circuit_breaker_window_seconds: int = 60
+    circuit_breaker_min_requests: int = 20
+    circuit_breaker_error_rate: float = 0.5  # 5xx/429 share that opens the circuit
+    circuit_breaker_timeout_rate: float = 0.3  # 504 share that opens the circuit
+    circuit_breaker_open_seconds: int = 30
+    circuit_breaker_half_open_probes: int = 3
+
+    # Resumable streaming (needs Redis): SSE chunks are buffered in a capped Redis Stream
+    stream_resume_enabled: bool = False
+    stream_resume_max_chunks: int = 10_000
+    stream_resume_ttl_seconds: int = 600
 
 
 @lru_cache
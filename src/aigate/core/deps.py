@@ -3,20 +3,15 @@ from __future__ import annotations
 from fastapi import Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from aigate.core.config import get_settings
-from aigate.providers.qwen_adapter import QwenAdapter
 from aigate.providers.registry import ProviderRegistry
 
+_EMPTY_REGISTRY = ProviderRegistry()
 
-def get_provider_registry(request: Request) -> ProviderRegistry:
-    settings = get_settings()
-    registry = ProviderRegistry()
-
-    qwen_client = getattr(request.app.state, "qwen_http_client", None)
-    if qwen_client is not None and settings.qwen_api_key:
-        registry.register(QwenAdapter(client=qwen_client))
 
-    return registry
+def get_provider_registry(request: Request) -> ProviderRegistry:
+    """The registry built once at startup (see providers.factory); empty when lifespan did not run."""
+    registry = getattr(request.app.state, "provider_registry", None)
+    return registry if registry is not None else _EMPTY_REGISTRY
 
 
 async def get_db_session(request: Request):
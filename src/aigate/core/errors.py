@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import math
+
 from fastapi import HTTPException
 
 
@@ -15,12 +17,24 @@ def unauthorized(detail: str = "Unauthorized") -> HTTPException:
     return HTTPException(status_code=401, detail=detail)
 
 
+def payment_required(detail: str = "Spend budget exhausted", retry_after_seconds: int | None = None) -> HTTPException:
+    headers = {"Retry-After": str(retry_after_seconds)} if retry_after_seconds is not None else None
+    return HTTPException(status_code=402, detail=detail, headers=headers)
+
+
+def payload_too_large(detail: str = "Request body too large") -> HTTPException:
+    return HTTPException(status_code=413, detail=detail)
+
+
 def not_implemented(detail: str = "Not implemented") -> HTTPException:
     return HTTPException(status_code=501, detail=detail)
 
 
-def bad_gateway(detail: str = "Bad gateway") -> HTTPException:
-    return HTTPException(status_code=502, detail=detail)
+def bad_gateway(detail: str = "Bad gateway", upstream_status: int | None = None) -> HTTPException:
+    exc = HTTPException(status_code=502, detail=detail)
+    # The provider's own status when it answered with an error (4xx here is the client's fault).
+    exc.upstream_status = upstream_status  # type: ignore[attr-defined]
+    return exc
 
 
 def gateway_timeout(detail: str = "Gateway timeout") -> HTTPException:
@@ -30,8 +44,25 @@ def gateway_timeout(detail: str = "Gateway timeout") -> HTTPException:
 def too_many_requests(
     detail: str = "Rate limit exceeded",
     retry_after_seconds: int | None = None,
+    *,
+    retry_after_ms: int | None = None,
+    headers: dict[str, str] | None = None,
+) -> HTTPException:
+    headers = dict(headers or {})
+    if retry_after_ms is not None:
+        # Retry-After only has second resolution; Retry-After-Ms carries the exact wait.
+        headers["Retry-After"] = str(max(1, math.ceil(retry_after_ms / 1000)))
+        headers["Retry-After-Ms"] = str(retry_after_ms)
+    elif retry_after_seconds is not None:
+        headers["Retry-After"] = str(retry_after_seconds)
+    return HTTPException(status_code=429, detail=detail, headers=headers or None)
+
+
+def service_unavailable(
+    detail: str = "Service unavailable",
+    retry_after_seconds: int | None = None,
 ) -> HTTPException:
     headers = {}
     if retry_after_seconds is not None:
         headers["Retry-After"] = str(retry_after_seconds)
-    return HTTPException(status_code=429, detail=detail, headers=headers or None)
+    return HTTPException(status_code=503, detail=detail, headers=headers or None)
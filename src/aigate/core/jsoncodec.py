@@ -0,0 +1,55 @@
+"""
+The one JSON codec for everything the gateway encodes or decodes itself (logs, Redis payloads,
+upstream bodies, the spool).
+
+orjson when it is installed, pydantic-core (always there with pydantic) otherwise. Both write
+compact UTF-8 without \\u escapes, i.e. json.dumps(..., ensure_ascii=False, separators=(",", ":")),
+and write Decimal as a string, like model_dump(mode="json"). Non-finite floats become null.
+Decode errors are ValueError (json.JSONDecodeError is one too).
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from decimal import Decimal
+from typing import Any
+
+import pydantic_core
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only where orjson is not installed
+    orjson = None  # type: ignore[assignment]
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _orjson_dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _pydantic_dumps(obj: Any) -> bytes:
+    return pydantic_core.to_json(obj, inf_nan_mode="null")
+
+
+def _pydantic_loads(data: bytes | bytearray | memoryview | str) -> Any:
+    return pydantic_core.from_json(bytes(data) if isinstance(data, memoryview) else data)
+
+
+BACKEND = "orjson" if orjson is not None else "pydantic-core"
+dumps: Callable[[Any], bytes] = _orjson_dumps if orjson is not None else _pydantic_dumps
+loads: Callable[[bytes | bytearray | memoryview | str], Any] = orjson.loads if orjson is not None else _pydantic_loads
+
+
+def dumps_str(obj: Any) -> str:
+    return dumps(obj).decode("utf-8")
+
+
+def dumps_model(model: BaseModel) -> bytes:
+    """model_dump_json() as bytes, straight from pydantic-core (no intermediate dict)."""
+    return model.__pydantic_serializer__.to_json(model)
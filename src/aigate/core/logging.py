@@ -1,12 +1,13 @@
 from __future__ import annotations
 
-import json
 import logging
 import sys
 from dataclasses import asdict, dataclass
 from datetime import datetime, timezone
 from typing import Any
 
+from aigate.core.jsoncodec import dumps_str
+
 
 @dataclass(frozen=True)
 class LogContext:
@@ -27,7 +28,7 @@ class JsonFormatter(logging.Formatter):
         extra = getattr(record, "extra", None)
         if isinstance(extra, dict):
             base.update(extra)
-        return json.dumps(base, ensure_ascii=False)
+        return dumps_str(base)
 
 
 def configure_logging(*, level: str) -> None:
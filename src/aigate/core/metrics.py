@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from prometheus_client import Counter, Histogram
+from prometheus_client import Counter, Gauge, Histogram
 
 # Chat completions
 aigate_requests_total = Counter(
@@ -26,3 +26,176 @@ aigate_billed_cost_total = Counter(
     "Total billed cost in USD",
     ["provider", "model"],
 )
+
+# HTTP responses (RequestIdMiddleware), by route template
+aigate_http_time_to_first_byte_seconds = Histogram(
+    "aigate_http_time_to_first_byte_seconds",
+    "Time from request start to the response headers being sent",
+    ["route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+aigate_http_response_duration_seconds = Histogram(
+    "aigate_http_response_duration_seconds",
+    "Time from request start to the last body chunk sent (whole stream for SSE)",
+    ["route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0),
+)
+
+# API key cache
+aigate_api_key_cache_requests_total = Counter(
+    "aigate_api_key_cache_requests_total",
+    "API key cache lookups by result",
+    ["result"],
+)
+aigate_api_key_cache_evictions_total = Counter(
+    "aigate_api_key_cache_evictions_total",
+    "API key cache evictions by reason",
+    ["reason"],
+)
+
+# Ledger writer
+aigate_ledger_queue_depth = Gauge(
+    "aigate_ledger_queue_depth",
+    "Ledger records waiting to be written",
+)
+aigate_ledger_flush_duration_seconds = Histogram(
+    "aigate_ledger_flush_duration_seconds",
+    "Ledger batch insert duration in seconds",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+aigate_ledger_records_total = Counter(
+    "aigate_ledger_records_total",
+    "Ledger records by outcome (written, failed, dropped)",
+    ["outcome"],
+)
+aigate_ledger_spool_records_total = Counter(
+    "aigate_ledger_spool_records_total",
+    "Ledger spool records by outcome (spooled, replayed, corrupt, dead_lettered)",
+    ["outcome"],
+)
+aigate_ledger_spool_errors_total = Counter(
+    "aigate_ledger_spool_errors_total",
+    "Ledger spool failures by operation (sync, seal, replay)",
+    ["operation"],
+)
+aigate_ledger_spool_bytes = Gauge(
+    "aigate_ledger_spool_bytes",
+    "Bytes of ledger records waiting in the on-disk spool",
+)
+
+# Response cache
+aigate_response_cache_requests_total = Counter(
+    "aigate_response_cache_requests_total",
+    "Response cache lookups by result (hit_local, hit_redis, miss)",
+    ["result"],
+)
+
+# Single-flight coalescing
+aigate_singleflight_requests_total = Counter(
+    "aigate_singleflight_requests_total",
+    "Non-stream requests by single-flight role (leader, follower, remote_follower)",
+    ["role"],
+)
+
+# Resumable streaming
+aigate_stream_resume_requests_total = Counter(
+    "aigate_stream_resume_requests_total",
+    "Streaming requests by resumable-buffer role (origin, replay)",
+    ["role"],
+)
+
+# Request body guard
+aigate_body_rejections_total = Counter(
+    "aigate_body_rejections_total",
+    "Requests rejected with 413 while the body was arriving (body_bytes, messages, image_bytes)",
+    ["reason"],
+)
+
+# Upstream endpoint pools
+aigate_upstream_outstanding = Gauge(
+    "aigate_upstream_outstanding",
+    "In-flight requests per upstream endpoint",
+    ["provider", "endpoint"],
+)
+aigate_upstream_ejections_total = Counter(
+    "aigate_upstream_ejections_total",
+    "Upstream endpoints taken out of rotation after consecutive failures",
+    ["provider", "endpoint"],
+)
+aigate_upstream_pool_connections = Gauge(
+    "aigate_upstream_pool_connections",
+    "HTTP connections held by an upstream endpoint's pool (active, idle) and its max_connections (limit)",
+    ["provider", "endpoint", "state"],
+)
+aigate_upstream_connections_opened_total = Counter(
+    "aigate_upstream_connections_opened_total",
+    "New TCP (+TLS) connections opened to an upstream endpoint",
+    ["provider", "endpoint"],
+)
+aigate_upstream_pool_wait_seconds = Histogram(
+    "aigate_upstream_pool_wait_seconds",
+    "Time an upstream request waited for a pooled connection (0 for a free keep-alive one)",
+    ["provider"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+# Hedged requests
+aigate_hedge_requests_total = Counter(
+    "aigate_hedge_requests_total",
+    "Hedging decisions on unary requests (fired, won, budget_exhausted)",
+    ["model", "outcome"],
+)
+
+# Circuit breakers
+aigate_circuit_breaker_state = Gauge(
+    "aigate_circuit_breaker_state",
+    "Circuit breaker state per provider/model (0 closed, 1 half-open, 2 open)",
+    ["provider", "model"],
+)
+aigate_circuit_breaker_rejections_total = Counter(
+    "aigate_circuit_breaker_rejections_total",
+    "Requests failed fast because the circuit was open",
+    ["provider", "model"],
+)
+
+# Adaptive upstream concurrency
+aigate_upstream_concurrency_limit = Gauge(
+    "aigate_upstream_concurrency_limit",
+    "Current adaptive concurrency limit per provider",
+    ["provider"],
+)
+aigate_upstream_in_flight = Gauge(
+    "aigate_upstream_in_flight",
+    "Upstream calls holding a concurrency slot per provider",
+    ["provider"],
+)
+aigate_upstream_queue_depth = Gauge(
+    "aigate_upstream_queue_depth",
+    "Requests waiting for an upstream concurrency slot per provider",
+    ["provider"],
+)
+aigate_upstream_shed_total = Counter(
+    "aigate_upstream_shed_total",
+    "Requests shed because no concurrency slot was available in time (deadline, queue_full, expired)",
+    ["provider", "reason"],
+)
+aigate_upstream_queue_wait_seconds = Histogram(
+    "aigate_upstream_queue_wait_seconds",
+    "Time from asking for an upstream concurrency slot to getting it, by X-Priority",
+    ["provider", "priority"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+# Hybrid rate limiter
+aigate_rate_limit_checks_total = Counter(
+    "aigate_rate_limit_checks_total",
+    "Hybrid rate limit checks by path (local lease, redis top-up, fallback when Redis is down)",
+    ["path"],
+)
+
+# Spend budgets
+aigate_budget_rejections_total = Counter(
+    "aigate_budget_rejections_total",
+    "Requests rejected because a spend budget was exhausted",
+    ["scope", "period"],
+)
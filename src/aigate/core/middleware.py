@@ -2,26 +2,123 @@ from __future__ import annotations
 
 import time
 import uuid
-from typing import Callable
 
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi import FastAPI, HTTPException
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from aigate.core.config import get_settings
+from aigate.core.metrics import aigate_http_response_duration_seconds, aigate_http_time_to_first_byte_seconds
+from aigate.limits.body_guard import BodyGuard, BodyLimitPolicy
 
+# requests.request_id is String(64); longer or non-printable client ids are replaced, not stored.
+MAX_REQUEST_ID_CHARS = 64
 
-class RequestIdMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        settings = get_settings()
-        header_name = settings.aigate_request_id_header
 
-        request_id = request.headers.get(header_name) or uuid.uuid4().hex
-        request.state.request_id = request_id
+def _client_request_id(value: str | None) -> str | None:
+    if value and len(value) <= MAX_REQUEST_ID_CHARS and value.isascii() and value.isprintable():
+        return value
+    return None
+
+
+class RequestIdMiddleware:
+    """
+    Pure ASGI (no extra task or memory stream per request; streamed bodies pass straight
+    through). Sets request.state.request_id from the request id header (up to MAX_REQUEST_ID_CHARS
+    printable ASCII characters) or a new one, and adds it
+    plus X-Response-Time-Ms (time until the response headers) to the response. Time to first
+    byte and total duration, to the last body chunk of a stream, go to metrics.
+    """
+
+    def __init__(self, app: ASGIApp, header_name: str | None = None) -> None:
+        self.app = app
+        self.header_name = header_name or get_settings().aigate_request_id_header
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = _client_request_id(Headers(scope=scope).get(self.header_name)) or uuid.uuid4().hex
+        scope.setdefault("state", {})["request_id"] = request_id
 
         started = time.perf_counter()
-        response = await call_next(request)
-        elapsed_ms = int((time.perf_counter() - started) * 1000)
+        status = "500"  # what the client gets if the app fails before starting a response
+        first_byte: float | None = None
+
+        async def timed_send(message: Message) -> None:
+            nonlocal status, first_byte
+            if message["type"] == "http.response.start":
+                first_byte = time.perf_counter() - started
+                status = str(message["status"])
+                headers = MutableHeaders(scope=message)
+                headers[self.header_name] = request_id
+                headers["X-Response-Time-Ms"] = str(int(first_byte * 1000))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            route = getattr(scope.get("route"), "path_format", None) or "unmatched"
+            if first_byte is not None:
+                aigate_http_time_to_first_byte_seconds.labels(route=route, status=status).observe(first_byte)
+            aigate_http_response_duration_seconds.labels(route=route, status=status).observe(
+                time.perf_counter() - started
+            )
+
+
+class BodyGuardMiddleware:
+    """
+    Pure ASGI: every body chunk passes a BodyGuard before the app receives it, so an oversized
+    request is rejected (413) without buffering the rest. A Content-Length above every configured
+    limit is rejected before the app runs. The guard is on request.state.body_guard for endpoints
+    to narrow to the caller's limits once authenticated.
+    """
+
+    def __init__(self, app: ASGIApp, policy: BodyLimitPolicy | None = None) -> None:
+        self.app = app
+        self._policy = policy
+
+    @property
+    def policy(self) -> BodyLimitPolicy:
+        if self._policy is None:
+            self._policy = BodyLimitPolicy.from_settings(get_settings())
+        return self._policy
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        declared = None
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit():
+                declared = int(value)
+                break
+        guard = BodyGuard(self.policy, declared_bytes=declared)
+        try:
+            guard.check_declared()
+        except HTTPException as e:
+            response = JSONResponse({"detail": e.detail}, status_code=e.status_code)
+            await response(scope, receive, send)
+            return
+        scope.setdefault("state", {})["body_guard"] = guard
+
+        async def guarded_receive() -> Message:
+            message = await receive()
+            if message["type"] == "http.request":
+                guard.feed(message.get("body", b""))
+            return message
+
+        await self.app(scope, guarded_receive, send)
+
 
-        response.headers[header_name] = request_id
-        response.headers["X-Response-Time-Ms"] = str(elapsed_ms)
-        return response
+def install_middleware(app: FastAPI, *, body_guard: bool = True) -> None:
+    """
+    The shared stack, outermost first: request id and timing, then (for AIGate's API) the
+    request body guard, so its 413s carry the request id too.
+    """
+    if body_guard:
+        app.add_middleware(BodyGuardMiddleware)
+    app.add_middleware(RequestIdMiddleware)
@@ -5,7 +5,9 @@ from decimal import Decimal
 from typing import Annotated, Literal, Union
 from uuid import uuid4
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr, ValidationError
+
+from aigate.domain.raw_body import RawBody
 
 
 class TextPart(BaseModel):
@@ -36,11 +38,40 @@ class Message(BaseModel):
     content: str | list[ContentPart]
 
 
+class StreamOptions(BaseModel):
+    include_usage: bool = False
+
+
 class ChatRequest(BaseModel):
     model: str
     messages: list[Message]
     temperature: float | None = None
+    max_tokens: int | None = Field(default=None, ge=1)
     stream: bool = False
+    stream_options: StreamOptions | None = None
+
+    # Original body, when every member at every level is a known field (see from_raw).
+    # Private attributes survive model_copy, so routing's model swaps keep it.
+    _raw: RawBody | None = PrivateAttr(default=None)
+
+    @classmethod
+    def from_raw(cls, data: bytes) -> ChatRequest:
+        """
+        Validate a JSON body straight from bytes. Bodies with no members beyond the known fields,
+        at any level, keep their bytes, so adapters can forward them with only the model (and
+        stream flags) replaced: what upstream sees is exactly what was validated and hashed.
+        """
+        try:
+            req = cls.model_validate_json(data, extra="forbid")
+        except ValidationError:
+            # Unknown members somewhere (dropped, as on the serialized path), or an invalid body.
+            return cls.model_validate_json(data)
+        req._raw = RawBody.scan(data)
+        return req
+
+    @property
+    def raw_body(self) -> RawBody | None:
+        return self._raw
 
 
 class Usage(BaseModel):
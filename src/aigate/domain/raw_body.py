@@ -0,0 +1,137 @@
+"""
+The request body as received, kept so it can be forwarded upstream without re-serializing.
+
+A vision request carries megabytes of base64 in its messages. Instead of dumping the parsed model
+back to JSON, the upstream body is rebuilt from byte slices of the original: top-level values
+the gateway changes (model, stream flags) are replaced and everything else is copied verbatim.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+
+from aigate.core.jsoncodec import dumps, loads
+
+_WS = b" \t\r\n"
+_STRUCTURAL = re.compile(rb'["{}\[\]]')
+_SCALAR_END = re.compile(rb"[,}\]\s]")
+
+
+def _skip_ws(data: bytes, i: int) -> int:
+    while i < len(data) and data[i] in _WS:
+        i += 1
+    return i
+
+
+def _string_end(data: bytes, i: int) -> int:
+    """Index just past the string whose opening quote is at i."""
+    j = i + 1
+    while True:
+        j = data.find(b'"', j)
+        if j < 0:
+            raise ValueError("unterminated string")
+        backslashes = 0
+        while data[j - 1 - backslashes] == 0x5C:  # "\"
+            backslashes += 1
+        if backslashes % 2 == 0:
+            return j + 1
+        j += 1
+
+
+def _value_end(data: bytes, i: int) -> int:
+    """Index just past the JSON value starting at i."""
+    first = data[i : i + 1]
+    if first == b'"':
+        return _string_end(data, i)
+    if first not in (b"{", b"["):
+        m = _SCALAR_END.search(data, i)
+        return m.start() if m else len(data)
+    depth = 0
+    j = i
+    while True:
+        m = _STRUCTURAL.search(data, j)
+        if m is None:
+            raise ValueError("unterminated container")
+        j = m.start()
+        c = data[j]
+        if c == 0x22:  # '"': jump over the whole string (base64 payloads are skipped in one find)
+            j = _string_end(data, j)
+            continue
+        depth += 1 if c in (0x7B, 0x5B) else -1
+        j += 1
+        if depth == 0:
+            return j
+
+
+def scan_object(data: bytes) -> dict[str, tuple[int, int]] | None:
+    """
+    Byte span of every top-level value of the JSON object in data; None when data is not a single
+    object or repeats a key. Expects JSON that already parsed (spans of invalid JSON are undefined).
+    """
+    try:
+        i = _skip_ws(data, 0)
+        if data[i : i + 1] != b"{":
+            return None
+        spans: dict[str, tuple[int, int]] = {}
+        i = _skip_ws(data, i + 1)
+        if data[i : i + 1] == b"}":
+            return spans if _skip_ws(data, i + 1) == len(data) else None
+        while True:
+            if data[i : i + 1] != b'"':
+                return None
+            key_end = _string_end(data, i)
+            key = loads(data[i:key_end])
+            i = _skip_ws(data, key_end)
+            if data[i : i + 1] != b":":
+                return None
+            start = _skip_ws(data, i + 1)
+            end = _value_end(data, start)
+            if key in spans:
+                return None
+            spans[key] = (start, end)
+            i = _skip_ws(data, end)
+            sep = data[i : i + 1]
+            if sep == b"}":
+                return spans if _skip_ws(data, i + 1) == len(data) else None
+            if sep != b",":
+                return None
+            i = _skip_ws(data, i + 1)
+    except (ValueError, IndexError):
+        return None
+
+
+@dataclass(frozen=True)
+class RawBody:
+    data: bytes
+    spans: dict[str, tuple[int, int]]  # top-level key -> value span in data
+
+    @classmethod
+    def scan(cls, data: bytes) -> RawBody | None:
+        spans = scan_object(data)
+        return cls(data, spans) if spans is not None else None
+
+    def keys(self) -> set[str]:
+        return set(self.spans)
+
+    def patched(self, **values: bytes | None) -> bytes:
+        """
+        The object with the given top-level values replaced (JSON-encoded bytes), added when
+        missing, or dropped when None; all other members are copied from the original bytes.
+        """
+        view = memoryview(self.data)
+        parts: list[bytes | memoryview] = [b"{"]
+        for key, (start, end) in self.spans.items():
+            value = values.get(key, view[start:end])
+            if value is None:
+                continue
+            if len(parts) > 1:
+                parts.append(b",")
+            parts += [dumps(key), b":", value]
+        for key, value in values.items():
+            if key not in self.spans and value is not None:
+                if len(parts) > 1:
+                    parts.append(b",")
+                parts += [dumps(key), b":", value]
+        parts.append(b"}")
+        return b"".join(parts)
@@ -0,0 +1,50 @@
+"""Local token estimates, used for billing when a provider does not report usage."""
+
+from __future__ import annotations
+
+import logging
+import math
+from functools import lru_cache
+from typing import Any
+
+from aigate.domain.chat import Message, TextPart
+
+log = logging.getLogger(__name__)
+
+# OpenAI chat format overhead: per message (role + separators) and for priming the reply.
+_TOKENS_PER_MESSAGE = 4
+_TOKENS_REPLY_PRIMING = 3
+
+
+@lru_cache(maxsize=1)
+def _encoding() -> Any:
+    # cl100k_base is not Qwen's tokenizer, but it is close enough for a flagged estimate.
+    # Loading may fetch the BPE file on first use: call the estimators off the event loop.
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        log.warning("tokens.encoding_unavailable", extra={"error": str(e)})
+        return None
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    enc = _encoding()
+    if enc is None:
+        return math.ceil(len(text) / 4)
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def estimate_prompt_tokens(messages: list[Message]) -> int:
+    """Text content only; image parts are not counted."""
+    total = _TOKENS_REPLY_PRIMING
+    for m in messages:
+        total += _TOKENS_PER_MESSAGE + count_tokens(m.role)
+        if isinstance(m.content, str):
+            total += count_tokens(m.content)
+        else:
+            total += sum(count_tokens(p.text) for p in m.content if isinstance(p, TextPart))
+    return total
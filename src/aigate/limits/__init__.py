@@ -2,5 +2,7 @@ from __future__ import annotations
 
 from aigate.limits.idempotency import get_cached_response, set_cached_response
 from aigate.limits.rate_limit import check_rate_limit
+from aigate.limits.response_cache import ResponseCache
+from aigate.limits.stream_resume import StreamBuffer
 
-__all__ = ["get_cached_response", "set_cached_response", "check_rate_limit"]
+__all__ = ["get_cached_response", "set_cached_response", "check_rate_limit", "ResponseCache", "StreamBuffer"]
@@ -0,0 +1,273 @@
+"""
+Request body limits enforced while the body is still arriving.
+
+BodyGuardMiddleware (core.middleware) feeds every chunk of the body to a BodyGuard before the
+app sees it. The guard counts bytes and scans the JSON structure incrementally (strings are
+skipped with one find, so base64 costs almost nothing) to count chat messages and measure image
+URLs. Crossing a limit raises 413 at once; the rest of the body is never read.
+
+Until auth runs the guard allows the largest configured limits; the chat endpoint then narrows
+it to the org's own (apply), before reading the body.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Literal
+
+from aigate.core.errors import payload_too_large
+from aigate.core.jsoncodec import loads
+from aigate.core.metrics import aigate_body_rejections_total
+
+if TYPE_CHECKING:
+    from fastapi import HTTPException
+
+    from aigate.core.config import Settings
+    from aigate.domain.chat import ChatRequest
+
+Reason = Literal["body_bytes", "messages", "image_bytes"]
+
+_TOKEN = re.compile(rb'["{}\[\],]')
+# Enough of a key to recognise the ones the scanner cares about, even written fully as \uXXXX
+# escapes ("image_url" is 54 bytes that way); a longer key cannot be one of them.
+_KEY_PREFIX_BYTES = 64
+
+
+@dataclass(frozen=True)
+class BodyLimits:
+    max_body_bytes: int
+    max_messages: int
+    max_image_bytes: int
+
+
+def parse_body_limits(spec: str | None, default: BodyLimits) -> dict[str, BodyLimits]:
+    """
+    Parse "name=max_body_bytes[|max_messages[|max_image_bytes]],..." (e.g. BODY_LIMITS), where name
+    is an org id or a tier; an empty or missing field keeps the default.
+    """
+    out: dict[str, BodyLimits] = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        name, values = (p.strip() for p in item.split("=", 1))
+        fields = [v.strip() for v in values.split("|")]
+        if not name or len(fields) > 3:
+            raise ValueError(f"Invalid body limit: {item}")
+        fields += [""] * (3 - len(fields))
+        out[name] = BodyLimits(
+            max_body_bytes=int(fields[0]) if fields[0] else default.max_body_bytes,
+            max_messages=int(fields[1]) if fields[1] else default.max_messages,
+            max_image_bytes=int(fields[2]) if fields[2] else default.max_image_bytes,
+        )
+    return out
+
+
+@dataclass(frozen=True)
+class BodyLimitPolicy:
+    default: BodyLimits
+    overrides: dict[str, BodyLimits] = field(default_factory=dict)  # org id or tier -> limits
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> BodyLimitPolicy:
+        default = BodyLimits(
+            max_body_bytes=settings.body_max_bytes,
+            max_messages=settings.body_max_messages,
+            max_image_bytes=settings.body_max_image_bytes,
+        )
+        return cls(default, parse_body_limits(settings.body_limits, default))
+
+    def for_org(self, org_id: str, tier: str) -> BodyLimits:
+        return self.overrides.get(org_id) or self.overrides.get(tier) or self.default
+
+    @property
+    def ceiling(self) -> BodyLimits:
+        """The most any org may send: what applies before the caller is known."""
+        every = [self.default, *self.overrides.values()]
+        return BodyLimits(
+            max_body_bytes=max(x.max_body_bytes for x in every),
+            max_messages=max(x.max_messages for x in every),
+            max_image_bytes=max(x.max_image_bytes for x in every),
+        )
+
+
+def body_rejection(reason: Reason, limits: BodyLimits) -> HTTPException:
+    aigate_body_rejections_total.labels(reason=reason).inc()
+    if reason == "body_bytes":
+        return payload_too_large(f"Request body exceeds {limits.max_body_bytes} bytes")
+    if reason == "messages":
+        return payload_too_large(f"Request has more than {limits.max_messages} messages")
+    return payload_too_large(f"Image exceeds {limits.max_image_bytes} bytes")
+
+
+@dataclass
+class _Container:
+    is_object: bool
+    key: bytes = b""  # last key seen (objects)
+    expect_key: bool = True
+
+
+class BodyGuard:
+    """Incremental size and structure checks for one request body (JSON or not)."""
+
+    def __init__(self, policy: BodyLimitPolicy, *, declared_bytes: int | None = None) -> None:
+        self.policy = policy
+        self.limits = policy.ceiling
+        self.declared_bytes = declared_bytes  # Content-Length, when sent
+        self.received = 0
+        self.messages = 0
+        self._stack: list[_Container] = []
+        self._in_string = False
+        self._escape = False
+        self._string_bytes = 0
+        self._string_head = bytearray()
+        self._string_is_key = False
+        self._string_escaped = False
+        self._string_is_image = False
+        self._largest_image = 0
+
+    def apply(self, org_id: str, tier: str) -> None:
+        """Narrow to the org's limits; raises at once if what is known already exceeds them."""
+        self.limits = self.policy.for_org(org_id, tier)
+        self.check_declared()
+        self._check()
+
+    def check_declared(self) -> None:
+        if self.declared_bytes is not None and self.declared_bytes > self.limits.max_body_bytes:
+            raise body_rejection("body_bytes", self.limits)
+
+    def check_request(self, req: ChatRequest) -> None:
+        """Re-check the parsed request, whatever JSON spelling got it past the byte scanner."""
+        if len(req.messages) > self.limits.max_messages:
+            raise body_rejection("messages", self.limits)
+        for message in req.messages:
+            if isinstance(message.content, str):
+                continue
+            for part in message.content:
+                image_url = getattr(part, "image_url", None)
+                if image_url is not None and len(image_url.url) > self.limits.max_image_bytes:
+                    raise body_rejection("image_bytes", self.limits)
+
+    def feed(self, chunk: bytes) -> None:
+        self.received += len(chunk)
+        if self.received > self.limits.max_body_bytes:
+            raise body_rejection("body_bytes", self.limits)
+        i, n = 0, len(chunk)
+        while i < n:
+            if self._in_string:
+                i = self._scan_string(chunk, i)
+                continue
+            m = _TOKEN.search(chunk, i)
+            if m is None:
+                break
+            i = m.end()
+            c = chunk[m.start()]
+            if c == 0x22:  # '"'
+                self._start_string()
+            elif c in (0x7B, 0x5B):  # '{' '['
+                self._open(c == 0x7B)
+            elif c in (0x7D, 0x5D):  # '}' ']'
+                if self._stack:
+                    self._stack.pop()
+            elif self._stack and self._stack[-1].is_object:  # ','
+                self._stack[-1].expect_key = True
+        self._check()
+
+    def _check(self) -> None:
+        if self.received > self.limits.max_body_bytes:
+            raise body_rejection("body_bytes", self.limits)
+        if self.messages > self.limits.max_messages:
+            raise body_rejection("messages", self.limits)
+        image_bytes = max(self._largest_image, self._string_bytes if self._string_is_image else 0)
+        if image_bytes > self.limits.max_image_bytes:
+            raise body_rejection("image_bytes", self.limits)
+
+    def _open(self, is_object: bool) -> None:
+        stack = self._stack
+        # {"messages": [ {message}, ... ]}: a message is an object directly inside that array.
+        if (
+            is_object
+            and len(stack) == 2
+            and stack[0].key == b"messages"
+            and stack[0].is_object
+            and not stack[1].is_object
+        ):
+            self.messages += 1
+            if self.messages > self.limits.max_messages:
+                raise body_rejection("messages", self.limits)
+        stack.append(_Container(is_object))
+
+    def _start_string(self) -> None:
+        top = self._stack[-1] if self._stack else None
+        self._in_string = True
+        self._escape = False
+        self._string_escaped = False
+        self._string_bytes = 0
+        self._string_head.clear()
+        self._string_is_key = top is not None and top.is_object and top.expect_key
+        # {"image_url": {"url": "<image>"}}
+        self._string_is_image = (
+            not self._string_is_key
+            and top is not None
+            and top.key == b"url"
+            and len(self._stack) >= 2
+            and self._stack[-2].key == b"image_url"
+        )
+
+    def _scan_string(self, chunk: bytes, i: int) -> int:
+        """Consume string bytes from i; return where scanning continues."""
+        n = len(chunk)
+        start = i
+        quote = -1
+        while i < n:
+            if self._escape:
+                self._escape = False
+                i += 1
+                continue
+            if quote < i:
+                quote = chunk.find(b'"', i)
+                if quote < 0:
+                    quote = n  # the string goes on in the next chunk
+            backslash = chunk.find(b"\\", i, quote)
+            if backslash >= 0:
+                self._escape = True
+                self._string_escaped = True
+                i = backslash + 1
+                continue
+            self._grow(chunk, start, quote)
+            if quote == n:
+                return n
+            self._end_string()
+            return quote + 1
+        self._grow(chunk, start, n)
+        return n
+
+    def _grow(self, chunk: bytes, start: int, end: int) -> None:
+        self._string_bytes += end - start
+        room = _KEY_PREFIX_BYTES - len(self._string_head)
+        if room > 0:
+            self._string_head += chunk[start : min(end, start + room)]
+        if self._string_is_image and self._string_bytes > self.limits.max_image_bytes:
+            raise body_rejection("image_bytes", self.limits)
+
+    def _decoded_key(self) -> bytes:
+        """The key as JSON means it: "m\\u0065ssages" is "messages"."""
+        if self._string_bytes > _KEY_PREFIX_BYTES:
+            return b""  # too long to be a key we match
+        if not self._string_escaped:
+            return bytes(self._string_head)
+        try:
+            return loads(b'"' + self._string_head + b'"').encode("utf-8")
+        except ValueError:
+            return b""
+
+    def _end_string(self) -> None:
+        self._in_string = False
+        if self._string_is_key:
+            top = self._stack[-1]
+            top.key = self._decoded_key()
+            top.expect_key = False
+        elif self._string_is_image:
+            self._largest_image = max(self._largest_image, self._string_bytes)
+        self._string_is_image = False
+        self._string_bytes = 0
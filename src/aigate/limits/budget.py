@@ -0,0 +1,182 @@
+"""
+Spend budgets: billed-cost caps per UTC day and month, for an org or one of its API keys.
+
+Spend is kept in Redis counters, incremented with each request's billed cost when its ledger record
+is enqueued. Admission reads the counters inside the rate limit script, so enforcement costs no
+extra round trip. Postgres stays the source of truth: a periodic reconciliation raises counters
+that fell behind usage_events (Redis restart, budget created mid-period).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any, Literal
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from aigate.core.errors import payment_required
+from aigate.core.metrics import aigate_budget_rejections_total
+from aigate.storage.models import RequestLog, SpendBudget, UsageEvent
+
+if TYPE_CHECKING:
+    from fastapi import HTTPException
+    from redis.asyncio import Redis
+
+log = logging.getLogger(__name__)
+
+Period = Literal["day", "month"]
+
+KEY_PREFIX = "budget"
+# Counters outlive their period by a day so late spend and reconciliation never recreate them at 0.
+_TTL_GRACE_SECONDS = 86_400
+
+# Lua: raise each counter KEYS[i] to ARGV[2i - 1] (with TTL ARGV[2i] seconds) if it is lower.
+# Never lowers: spend still in the ledger queue is in Redis but not yet in Postgres.
+_SCRIPT_RAISE = """
+local raised = 0
+for i = 1, #KEYS do
+    local total = tonumber(ARGV[2 * i - 1])
+    if total > tonumber(redis.call('GET', KEYS[i]) or '0') then
+        redis.call('SET', KEYS[i], ARGV[2 * i - 1], 'EX', ARGV[2 * i])
+        raised = raised + 1
+    end
+end
+return raised
+"""
+
+
+@dataclass(frozen=True)
+class Budget:
+    period: Period
+    limit: Decimal
+    api_key_id: str | None = None  # None: the whole org
+
+    @property
+    def scope(self) -> str:
+        return "org" if self.api_key_id is None else "key"
+
+    @classmethod
+    def from_row(cls, row: Any) -> Budget:
+        return cls(period=row.period, limit=Decimal(row.limit_amount), api_key_id=row.api_key_id)
+
+
+@dataclass(frozen=True)
+class BudgetCounter:
+    """The Redis counter one budget is checked against for the current period."""
+
+    key: str
+    budget: Budget
+    reset_seconds: int  # until the period rolls over
+
+    @property
+    def limit(self) -> Decimal:
+        return self.budget.limit
+
+
+def period_bounds(period: Period, now: datetime) -> tuple[datetime, datetime]:
+    """[start, end) of the UTC day or month containing now."""
+    now = now.astimezone(timezone.utc)
+    if period == "day":
+        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        return start, start + timedelta(days=1)
+    start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return start, end
+
+
+def counter_key(org_id: str, budget: Budget, now: datetime) -> str:
+    owner = f"org:{org_id}" if budget.api_key_id is None else f"key:{budget.api_key_id}"
+    start, _ = period_bounds(budget.period, now)
+    stamp = start.strftime("%Y%m%d" if budget.period == "day" else "%Y%m")
+    return f"{KEY_PREFIX}:{owner}:{budget.period}:{stamp}"
+
+
+def plan_budgets(org_id: str, budgets: Iterable[Budget], now: datetime | None = None) -> list[BudgetCounter]:
+    now = now or datetime.now(tz=timezone.utc)
+    out = []
+    for budget in budgets:
+        _, end = period_bounds(budget.period, now)
+        out.append(
+            BudgetCounter(
+                key=counter_key(org_id, budget, now),
+                budget=budget,
+                reset_seconds=max(1, int((end - now).total_seconds())),
+            )
+        )
+    return out
+
+
+def budget_rejection(counter: BudgetCounter) -> HTTPException:
+    budget = counter.budget
+    aigate_budget_rejections_total.labels(scope=budget.scope, period=budget.period).inc()
+    what = "Daily" if budget.period == "day" else "Monthly"
+    owner = "organization" if budget.api_key_id is None else "API key"
+    return payment_required(
+        f"{what} spend budget exhausted for this {owner}", retry_after_seconds=counter.reset_seconds
+    )
+
+
+async def record_spend(redis: Redis, counters: Sequence[BudgetCounter], cost: Decimal) -> list[Decimal]:
+    """Add cost to every counter in one pipeline; return the new totals."""
+    if not counters or cost <= 0:
+        return []
+    pipe = redis.pipeline(transaction=False)
+    for c in counters:
+        pipe.incrbyfloat(c.key, float(cost))
+        pipe.expire(c.key, c.reset_seconds + _TTL_GRACE_SECONDS)
+    out = await pipe.execute()
+    return [Decimal(str(total)) for total in out[::2]]
+
+
+async def _spent_since(session: AsyncSession, org_id: str, api_key_id: str | None, start: datetime) -> Decimal:
+    stmt = select(func.coalesce(func.sum(UsageEvent.billed_cost), 0)).where(
+        UsageEvent.org_id == org_id, UsageEvent.created_at >= start
+    )
+    if api_key_id is not None:
+        stmt = stmt.join(RequestLog, RequestLog.id == UsageEvent.request_db_id).where(
+            RequestLog.api_key_id == api_key_id
+        )
+    return Decimal((await session.execute(stmt)).scalar_one())
+
+
+async def reconcile_budgets(session: AsyncSession, redis: Redis, *, now: datetime | None = None) -> int:
+    """Raise the current period's counters to usage_events totals; return how many were raised."""
+    now = now or datetime.now(tz=timezone.utc)
+    rows = (await session.execute(select(SpendBudget))).scalars().all()
+    keys: list[str] = []
+    args: list[Any] = []
+    for row in rows:
+        counter = plan_budgets(row.org_id, [Budget.from_row(row)], now)[0]
+        start, _ = period_bounds(counter.budget.period, now)
+        spent = await _spent_since(session, row.org_id, row.api_key_id, start)
+        keys.append(counter.key)
+        args += [str(spent), counter.reset_seconds + _TTL_GRACE_SECONDS]
+    if not keys:
+        return 0
+    return int(await redis.eval(_SCRIPT_RAISE, len(keys), *keys, *args))
+
+
+async def run_budget_reconciler(
+    sessionmaker: async_sessionmaker,
+    redis: Redis,
+    *,
+    interval_seconds: float,
+) -> None:
+    """Reconcile budget counters against Postgres every interval_seconds, until cancelled."""
+    while True:
+        try:
+            async with sessionmaker() as session:
+                raised = await reconcile_budgets(session, redis)
+            if raised:
+                log.info("budget.reconciled", extra={"raised": raised})
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.warning("budget.reconcile_failed", extra={"error": str(e)})
+        await asyncio.sleep(interval_seconds)
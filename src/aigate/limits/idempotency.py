@@ -1,16 +1,51 @@
-"""Idempotency: cache ChatResponse by Idempotency-Key to avoid double billing/usage."""
+"""Idempotency: cache ChatResponse by Idempotency-Key to avoid double billing/usage.
+
+The first request for a key writes a pending marker (SET NX with a lease) before calling upstream;
+concurrent duplicates wait for it to finish instead of calling the provider again. If the owner
+crashes, the lease expires and a waiting duplicate takes over. The marker carries an owner token,
+so an owner whose lease expired cannot release the marker of the duplicate that took over.
+"""
 
 from __future__ import annotations
 
-import json
-from typing import TYPE_CHECKING
+import asyncio
+import uuid
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Literal
 
+from aigate.core.errors import conflict
+from aigate.core.jsoncodec import dumps, loads
 from aigate.domain.chat import ChatResponse
+from aigate.limits.rate_limit import run_script
 
 if TYPE_CHECKING:
     from redis.asyncio import Redis
 
 KEY_PREFIX = "idempotency"
+STATE_PENDING = "pending"
+STATE_DONE = "done"
+
+# Delete the pending marker only if it is still ours (byte-for-byte what we wrote).
+_SCRIPT_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+@dataclass(frozen=True)
+class IdempotencyLock:
+    """A pending marker we own: the caller calls upstream, then stores the response or releases."""
+
+    org_id: str
+    idem_key: str
+    request_hash: str
+    token: str
+
+    @property
+    def marker(self) -> bytes:
+        return dumps({"state": STATE_PENDING, "request_hash": self.request_hash, "owner": self.token})
 
 
 def _cache_key(org_id: str, idem_key: str) -> str:
@@ -22,20 +57,23 @@ async def get_cached_response(
     org_id: str,
     idem_key: str,
     request_hash: str,
-) -> ChatResponse | str | None:
+) -> ChatResponse | Literal["conflict", "pending"] | None:
     """
     Return cached ChatResponse if key exists and request_hash matches.
     Return "conflict" if key exists but request_hash differs (caller should 409).
+    Return "pending" if a request with the same body is still in flight.
     Return None if key missing.
     """
     key = _cache_key(org_id, idem_key)
     raw = await redis.get(key)
     if raw is None:
         return None
-    data = json.loads(raw)
+    data = loads(raw)
     stored_hash = data.get("request_hash")
     if stored_hash != request_hash:
         return "conflict"
+    if data.get("state") == STATE_PENDING:
+        return "pending"
     return ChatResponse.model_validate(data["response"])
 
 
@@ -47,10 +85,61 @@ async def set_cached_response(
     response: ChatResponse,
     ttl_seconds: int,
 ) -> None:
-    """Store response in Redis with TTL."""
+    """Store response in Redis with TTL (replaces the pending marker)."""
     key = _cache_key(org_id, idem_key)
     payload = {
+        "state": STATE_DONE,
         "request_hash": request_hash,
         "response": response.model_dump(mode="json"),
     }
-    await redis.set(key, json.dumps(payload), ex=ttl_seconds)
+    await redis.set(key, dumps(payload), ex=ttl_seconds)
+
+
+async def acquire_idempotency_lock(
+    redis: Redis,
+    org_id: str,
+    idem_key: str,
+    request_hash: str,
+    lease_seconds: int,
+) -> IdempotencyLock | None:
+    """Write the pending marker if the key is free; the lock is returned when the caller owns the key."""
+    lock = IdempotencyLock(org_id, idem_key, request_hash, uuid.uuid4().hex)
+    acquired = await redis.set(_cache_key(org_id, idem_key), lock.marker, ex=lease_seconds, nx=True)
+    return lock if acquired else None
+
+
+async def release_idempotency_lock(redis: Redis, lock: IdempotencyLock) -> None:
+    """Drop our pending marker after a failed upstream call so a retry can run immediately."""
+    await run_script(redis, _SCRIPT_RELEASE, 1, _cache_key(lock.org_id, lock.idem_key), lock.marker)
+
+
+async def begin_idempotent_request(
+    redis: Redis,
+    org_id: str,
+    idem_key: str,
+    request_hash: str,
+    *,
+    lease_seconds: int,
+    wait_seconds: float,
+    poll_interval_seconds: float = 0.1,
+) -> ChatResponse | IdempotencyLock:
+    """
+    Return the finished response for a duplicate, or the lock once the caller owns the key and must call upstream.
+    Raises 409 on a body mismatch, or when the owner does not finish within wait_seconds.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait_seconds
+    while True:
+        cached = await get_cached_response(redis, org_id, idem_key, request_hash)
+        if cached == "conflict":
+            raise conflict()
+        if isinstance(cached, ChatResponse):
+            return cached
+        if cached is None:
+            lock = await acquire_idempotency_lock(redis, org_id, idem_key, request_hash, lease_seconds)
+            if lock is not None:
+                return lock
+            continue  # Lost the race to another duplicate: re-read its marker.
+        if loop.time() >= deadline:
+            raise conflict("A request with this Idempotency-Key is still in progress")
+        await asyncio.sleep(poll_interval_seconds)
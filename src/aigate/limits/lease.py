@@ -0,0 +1,331 @@
+"""
+Hybrid rate limiting: each replica admits requests from a local lease of the org's quota and
+tops the lease up from Redis in batched background calls, so most requests skip the Redis hop.
+
+A lease is a number of units this replica has already taken from a GCRA key (the same keys
+check_rate_limit uses). Leases older than one period are dropped, so the global error stays
+within one lease (lease_fraction x limit) per replica. At most _MAX_LEASES leases are kept: leases
+idle for a period, or else the least recently used, are evicted and their unused units go back to Redis.
+
+Spend budgets are checked against the counter totals this replica got back when it last recorded
+spend (note_spend): spend on other replicas shows up with this replica's next recorded request.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from aigate.core.metrics import aigate_rate_limit_checks_total
+from aigate.limits.budget import BudgetCounter, budget_rejection
+from aigate.limits.rate_limit import (
+    _NOW,
+    PERIOD_MS,
+    LimitKey,
+    RateLimitResult,
+    TokenReservation,
+    plan_limits,
+    rejection,
+    reservation_for,
+    run_script,
+)
+
+if TYPE_CHECKING:
+    from decimal import Decimal
+
+    from redis.asyncio import Redis
+
+log = logging.getLogger(__name__)
+
+_MAX_SPEND_ENTRIES = 10_000
+_MAX_LEASES = 10_000
+
+# Lua: take up to ARGV[2i+1] units from GCRA key KEYS[i] (interval ARGV[2i]) that fit in the period.
+# Returns {grant, backlog ms (TAT - now) after the grant} per key.
+_SCRIPT_TOPUP = (
+    _NOW
+    + """
+local period = tonumber(ARGV[1])
+local out = {}
+for i = 1, #KEYS do
+    local interval = tonumber(ARGV[2 * i])
+    local tat = math.max(tonumber(redis.call('GET', KEYS[i]) or '0'), now)
+    local grant = math.min(tonumber(ARGV[2 * i + 1]), math.floor((period - (tat - now)) / interval))
+    if grant > 0 then
+        tat = tat + grant * interval
+        redis.call('SET', KEYS[i], tostring(tat), 'PX', math.ceil(tat - now))
+    else
+        grant = 0
+    end
+    out[2 * i - 1] = grant
+    out[2 * i] = math.ceil(tat - now)
+end
+return out
+"""
+)
+
+# Lua: give ARGV[2i] unused units (interval ARGV[2i-1]) back to GCRA key KEYS[i] by moving its TAT back.
+_SCRIPT_RETURN = (
+    _NOW
+    + """
+for i = 1, #KEYS do
+    local tat = tonumber(redis.call('GET', KEYS[i]) or '0')
+    if tat > now then
+        tat = math.max(now, tat - tonumber(ARGV[2 * i - 1]) * tonumber(ARGV[2 * i]))
+        if tat > now then
+            redis.call('SET', KEYS[i], tostring(tat), 'PX', math.ceil(tat - now))
+        else
+            redis.call('DEL', KEYS[i])
+        end
+    end
+end
+return 0
+"""
+)
+
+
+@dataclass
+class _Lease:
+    limit: int
+    interval_ms: float
+    balance: int = 0
+    taken_at: float = 0.0  # local ms when the oldest unused units were taken
+    backlog_ms: float = 0.0  # global TAT - now at the last sync
+    synced_at: float = 0.0
+    used_at: float = 0.0  # local ms of the last check, for idle eviction
+    refilling: bool = False
+
+    def backlog(self, now: float) -> float:
+        return max(0.0, self.backlog_ms - (now - self.synced_at))
+
+    def available(self, now: float) -> int:
+        """Units Redis would grant right now, judging by the last sync."""
+        return max(0, math.floor((PERIOD_MS - self.backlog(now)) / self.interval_ms))
+
+
+class LeaseRateLimiter:
+    """Same contract as check_rate_limit / reconcile_tokens, served from per-replica leases."""
+
+    def __init__(
+        self,
+        redis: Redis,
+        *,
+        lease_fraction: float = 0.1,
+        low_water: float = 0.5,
+        flush_interval_ms: int = 20,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._redis = redis
+        self._lease_fraction = lease_fraction
+        self._low_water = low_water
+        self._flush_interval = flush_interval_ms / 1000.0
+        self._clock = clock
+        self._leases: dict[str, _Lease] = {}  # least recently used first
+        self._returns: dict[str, tuple[float, int]] = {}  # evicted key -> (interval ms, unused units)
+        self._spent: dict[str, tuple[Decimal, float]] = {}  # budget counter -> (total, expires at ms)
+        self._pending: set[str] = set()
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def check(
+        self,
+        org_id: str,
+        rpm_limit: int,
+        *,
+        model: str | None = None,
+        tokens: int = 0,
+        tpm_limit: int | None = None,
+        model_tpm_limit: int | None = None,
+        budgets: Sequence[BudgetCounter] = (),
+    ) -> RateLimitResult:
+        plan = plan_limits(
+            org_id, rpm_limit, model=model, tokens=tokens, tpm_limit=tpm_limit, model_tpm_limit=model_tpm_limit
+        )
+        now = self._now()
+        for counter in budgets:
+            spent = self._spent.get(counter.key)
+            if spent is not None and spent[0] >= counter.limit:
+                raise budget_rejection(counter)
+        # Leases used by this check; an await below may evict them from self._leases.
+        leases: dict[str, _Lease] = {}
+        for k in plan:
+            lease = self._leases.pop(k.key, None)
+            if lease is None or lease.limit != k.limit:
+                if lease is not None:
+                    self._give_back(k.key, lease, now)
+                self._evict(now)
+                lease = _Lease(limit=k.limit, interval_ms=k.interval_ms)
+            elif lease.balance > 0 and now - lease.taken_at > PERIOD_MS:
+                lease.balance = 0  # units older than a period would let this replica overshoot
+            lease.used_at = now
+            self._leases[k.key] = leases[k.key] = lease  # most recently used last
+        # Only go to Redis when the last sync says it has the missing units.
+        short = [
+            k
+            for k in plan
+            if leases[k.key].balance < k.cost and leases[k.key].available(now) >= k.cost - leases[k.key].balance
+        ]
+        if short:
+            await self._topup_now({k.key: leases[k.key] for k in short}, short)
+            now = self._now()
+        else:
+            aigate_rate_limit_checks_total.labels(path="local").inc()
+
+        first = leases[plan[0].key]
+        result = RateLimitResult(
+            limit=rpm_limit,
+            remaining=min(rpm_limit, first.balance - 1 + first.available(now)),
+            reset_ms=math.ceil(first.backlog(now)),
+        )
+        # All or nothing, with no await in between: a rejected request takes no units.
+        for i, k in enumerate(plan, start=1):
+            lease = leases[k.key]
+            if lease.balance < k.cost:
+                missing = k.cost - lease.balance
+                retry_after_ms = math.ceil(lease.backlog(now) + missing * lease.interval_ms - PERIOD_MS)
+                raise rejection(i, retry_after_ms, result)
+        for k in plan:
+            lease = leases[k.key]
+            lease.balance -= k.cost
+            if self._leases.get(k.key) is not lease:
+                self._give_back(k.key, lease, now)  # evicted while this check waited for Redis
+                continue
+            low = lease.balance < self._lease_size(k.limit) * self._low_water
+            if low and not lease.refilling:
+                lease.refilling = True
+                self._pending.add(k.key)
+                self._wake.set()
+        return RateLimitResult(
+            limit=rpm_limit,
+            remaining=max(0, result.remaining),
+            reset_ms=result.reset_ms,
+            reservation=reservation_for(plan, tokens),
+        )
+
+    async def reconcile(self, reservation: TokenReservation | None, actual_tokens: int) -> None:
+        """Unused reserved tokens go back to the local lease; overuse is taken from it."""
+        if reservation is None:
+            return
+        for key in reservation.keys:
+            lease = self._leases.get(key)
+            if lease is not None:
+                lease.balance += reservation.tokens - actual_tokens
+
+    def note_spend(self, counters: Sequence[BudgetCounter], totals: Sequence[Decimal]) -> None:
+        """Remember budget counter totals returned by record_spend for the next checks."""
+        now = self._now()
+        if len(self._spent) > _MAX_SPEND_ENTRIES:
+            self._spent = {k: v for k, v in self._spent.items() if v[1] > now}
+        for counter, total in zip(counters, totals):
+            self._spent[counter.key] = (total, now + counter.reset_seconds * 1000.0)
+
+    def _now(self) -> float:
+        return self._clock() * 1000.0
+
+    def _evict(self, now: float) -> None:
+        """Make room for one lease: drop leases idle for a period, then the least recently used ones."""
+        while self._leases:
+            key, lease = next(iter(self._leases.items()))
+            if len(self._leases) < _MAX_LEASES and now - lease.used_at <= PERIOD_MS:
+                return
+            del self._leases[key]
+            self._give_back(key, lease, now)
+
+    def _give_back(self, key: str, lease: _Lease, now: float) -> None:
+        """Queue a dropped lease's unused units for Redis (units older than a period have expired there)."""
+        if lease.balance > 0 and now - lease.taken_at <= PERIOD_MS:
+            units = self._returns.get(key, (0.0, 0))[1] + lease.balance
+            self._returns[key] = (lease.interval_ms, units)
+            self._wake.set()
+        lease.balance = 0
+
+    def _lease_size(self, limit: int) -> int:
+        return max(1, math.ceil(limit * self._lease_fraction))
+
+    async def _topup_now(self, leases: dict[str, _Lease], short: list[LimitKey]) -> None:
+        wants = {k.key: max(self._lease_size(k.limit), k.cost - leases[k.key].balance) for k in short}
+        try:
+            await self._topup(leases, wants)
+            aigate_rate_limit_checks_total.labels(path="redis").inc()
+        except Exception as e:
+            # Redis unreachable: keep limiting on this replica alone, as if it were the only one.
+            aigate_rate_limit_checks_total.labels(path="fallback").inc()
+            log.warning("rate_limit.local_fallback", extra={"error": str(e)})
+            now = self._now()
+            for key, want in wants.items():
+                lease = leases[key]
+                grant = min(want, lease.available(now))
+                self._credit(lease, grant, lease.backlog(now) + grant * lease.interval_ms, now)
+
+    async def _topup(self, leases: dict[str, _Lease], wants: dict[str, int]) -> None:
+        keys = list(wants)
+        args: list[float] = [PERIOD_MS]
+        for key in keys:
+            args += [leases[key].interval_ms, wants[key]]
+        out = await run_script(self._redis, _SCRIPT_TOPUP, len(keys), *keys, *args)
+        now = self._now()
+        for i, key in enumerate(keys):
+            lease = leases[key]
+            self._credit(lease, int(out[2 * i]), float(out[2 * i + 1]), now)
+
+    def _credit(self, lease: _Lease, grant: int, backlog_ms: float, now: float) -> None:
+        if lease.balance <= 0:
+            lease.taken_at = now
+        lease.balance += grant
+        lease.backlog_ms = backlog_ms
+        lease.synced_at = now
+        lease.refilling = False
+
+    async def _run(self) -> None:
+        # Background refills: everything below its low-water mark goes to Redis in one script call.
+        while True:
+            await self._wake.wait()
+            await asyncio.sleep(self._flush_interval)  # let more keys join the batch
+            self._wake.clear()
+            pending, self._pending = self._pending, set()
+            if self._returns:
+                await self._return_units()
+            now = self._now()
+            leases = {k: self._leases[k] for k in pending if k in self._leases}
+            wants = {k: self._lease_size(lease.limit) for k, lease in leases.items() if lease.available(now) > 0}
+            for k in leases.keys() - wants.keys():
+                leases[k].refilling = False
+            if not wants:
+                continue
+            try:
+                await self._topup(leases, wants)
+            except Exception as e:
+                log.warning("rate_limit.lease_refill_failed", extra={"error": str(e)})
+                for key in wants:
+                    leases[key].refilling = False
+                continue
+            now = self._now()
+            for key in wants:
+                if self._leases.get(key) is not leases[key]:
+                    self._give_back(key, leases[key], now)  # evicted during the refill
+
+    async def _return_units(self) -> None:
+        returns, self._returns = self._returns, {}
+        args: list[float] = []
+        for interval_ms, units in returns.values():
+            args += [interval_ms, units]
+        try:
+            await run_script(self._redis, _SCRIPT_RETURN, len(returns), *returns, *args)
+        except Exception as e:
+            # The units expire in Redis within a period anyway.
+            log.warning("rate_limit.lease_return_failed", extra={"error": str(e)})
@@ -1,39 +1,251 @@
-"""Rate limiting: RPM (requests per minute) per org via Redis."""
+"""
+Rate limiting via Redis with GCRA (generic cell rate algorithm): RPM per org, TPM per org and model.
+
+Each limit is one key holding a theoretical arrival time (TAT, ms). A request costing n units moves
+the TAT forward by n x (period / limit) and is admitted if the TAT stays within one period of now.
+That is a sliding window without per-minute buckets: no 2x bursts across minute boundaries, and
+Retry-After is the exact time until enough of the backlog has drained.
+"""
 
 from __future__ import annotations
 
-import time
-from typing import TYPE_CHECKING
+import hashlib
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any
 
-from aigate.core.errors import too_many_requests
+from redis.exceptions import NoScriptError
+
+from aigate.core.errors import bad_request, too_many_requests
+from aigate.limits.budget import budget_rejection
 
 if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from fastapi import HTTPException
     from redis.asyncio import Redis
 
+    from aigate.limits.budget import BudgetCounter
+
 KEY_PREFIX = "ratelimit"
-WINDOW_TTL_SECONDS = 120  # expire key after 2 min so keys don't pile up
+PERIOD_MS = 60_000
+
+# Redis TIME in ms: one clock for all replicas.
+_NOW = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + tonumber(t[2]) / 1000
+"""
+
+# Lua: admit a request only if every budget counter (the last ARGV[2] KEYS) is under its limit and
+# every GCRA key (KEYS[1] = RPM, then TPM keys) has room for its cost. ARGV = period, budget count,
+# then (interval, cost) per GCRA key, then the limit per budget counter. Returns {index of the key
+# that rejected or 0, retry after ms, remaining and reset ms of KEYS[1]}. Nothing is written on reject.
+_SCRIPT_ADMIT = (
+    _NOW
+    + """
+local period = tonumber(ARGV[1])
+local n = #KEYS - tonumber(ARGV[2])
+local function result(rejected, retry_ms, tat)
+    local first = tat or math.max(tonumber(redis.call('GET', KEYS[1]) or '0'), now)
+    return {rejected, retry_ms, math.floor((period - (first - now)) / tonumber(ARGV[3])), math.ceil(first - now)}
+end
+for i = n + 1, #KEYS do
+    if tonumber(redis.call('GET', KEYS[i]) or '0') >= tonumber(ARGV[n + 2 + i]) then
+        return result(i, 0)
+    end
+end
+local tats = {}
+for i = 1, n do
+    local tat = math.max(tonumber(redis.call('GET', KEYS[i]) or '0'), now)
+    local new_tat = tat + tonumber(ARGV[2 * i + 2]) * tonumber(ARGV[2 * i + 1])
+    if new_tat - now > period then
+        return result(i, math.ceil(new_tat - now - period))
+    end
+    tats[i] = new_tat
+end
+for i = 1, n do
+    redis.call('SET', KEYS[i], tostring(tats[i]), 'PX', math.ceil(tats[i] - now))
+end
+return result(0, 0, tats[1])
+"""
+)
 
-# Lua: INCR key, set EXPIRE on first incr, return new count
-_SCRIPT_INCR = """
-local c = redis.call('INCR', KEYS[1])
-if c == 1 then
-    redis.call('EXPIRE', KEYS[1], ARGV[1])
+# Lua: move each key's TAT by ARGV[1] (actual - reserved tokens) x its interval (ARGV[i + 1]).
+_SCRIPT_RECONCILE = (
+    _NOW
+    + """
+local delta = tonumber(ARGV[1])
+for i = 1, #KEYS do
+    local tat = math.max(tonumber(redis.call('GET', KEYS[i]) or '0'), now) + delta * tonumber(ARGV[i + 1])
+    if tat > now then
+        redis.call('SET', KEYS[i], tostring(tat), 'PX', math.ceil(tat - now))
+    else
+        redis.call('DEL', KEYS[i])
+    end
 end
-return c
+return 0
 """
+)
+
+
+@dataclass(frozen=True)
+class LimitKey:
+    """One GCRA key a request draws `cost` units from, out of `limit` per period."""
+
+    key: str
+    limit: int
+    cost: int
+
+    @property
+    def interval_ms(self) -> float:
+        return PERIOD_MS / self.limit
+
+
+@dataclass(frozen=True)
+class TokenReservation:
+    """Tokens reserved at admission; reconcile once actual usage is known."""
 
+    keys: tuple[str, ...]
+    intervals_ms: tuple[float, ...]
+    tokens: int
 
-def _retry_after_seconds() -> int:
-    """Seconds until next minute (for Retry-After header)."""
-    return max(1, 60 - (int(time.time()) % 60))
 
+@dataclass(frozen=True)
+class RateLimitResult:
+    """Admission outcome for the org's request limit, plus the token reservation if any."""
 
-async def check_rate_limit(redis: Redis, org_id: str, rpm_limit: int) -> None:
+    limit: int
+    remaining: int
+    reset_ms: int  # until the request quota is fully replenished
+    reservation: TokenReservation | None = None
+
+    def headers(self) -> dict[str, str]:
+        return {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(max(0, self.remaining)),
+            "X-RateLimit-Reset": str(math.ceil(max(0, self.reset_ms) / 1000)),
+        }
+
+
+def parse_model_limits(spec: str | None) -> dict[str, int]:
+    """Parse "provider:model=limit,..." (e.g. RATE_LIMIT_TPM_MODELS)."""
+    out: dict[str, int] = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        model, limit = (p.strip() for p in item.rsplit("=", 1))
+        if model and limit:
+            out[model] = int(limit)
+    return out
+
+
+def plan_limits(
+    org_id: str,
+    rpm_limit: int,
+    *,
+    model: str | None,
+    tokens: int,
+    tpm_limit: int | None,
+    model_tpm_limit: int | None,
+) -> list[LimitKey]:
     """
-    Increment request count for org in current 1-min window. Raise 429 if over limit.
+    RPM key first, then the TPM keys that have a limit (only when tokens are reserved). Raises 400
+    when the reservation alone exceeds a token limit: no amount of waiting would admit it.
     """
-    window = int(time.time()) // 60
-    key = f"{KEY_PREFIX}:{org_id}:{window}"
-    count = await redis.eval(_SCRIPT_INCR, 1, key, WINDOW_TTL_SECONDS)
-    if count > rpm_limit:
-        raise too_many_requests(retry_after_seconds=_retry_after_seconds())
+    keys = [LimitKey(f"{KEY_PREFIX}:{org_id}", rpm_limit, 1)]
+    if tokens > 0:
+        if tpm_limit is not None:
+            keys.append(LimitKey(f"{KEY_PREFIX}:tpm:{org_id}", tpm_limit, tokens))
+        if model_tpm_limit is not None and model is not None:
+            keys.append(LimitKey(f"{KEY_PREFIX}:tpm:{org_id}:{model}", model_tpm_limit, tokens))
+    for k in keys[1:]:
+        if k.cost > k.limit:
+            scope = "org" if k.key == f"{KEY_PREFIX}:tpm:{org_id}" else f"model {model}"
+            raise bad_request(
+                f"Request reserves {k.cost} tokens (prompt + max_tokens), above the {scope} token rate limit"
+                f" of {k.limit} per minute; lower max_tokens or shorten the prompt"
+            )
+    return keys
+
+
+def reservation_for(plan: list[LimitKey], tokens: int) -> TokenReservation | None:
+    if len(plan) == 1:
+        return None
+    return TokenReservation(
+        keys=tuple(k.key for k in plan[1:]),
+        intervals_ms=tuple(k.interval_ms for k in plan[1:]),
+        tokens=tokens,
+    )
+
+
+def rejection(rejected_by: int, retry_after_ms: int, result: RateLimitResult) -> HTTPException:
+    """429 for the key at (1-based) index rejected_by: 1 is the request limit, others are token limits."""
+    return too_many_requests(
+        "Rate limit exceeded" if rejected_by == 1 else "Token rate limit exceeded",
+        retry_after_ms=max(1, retry_after_ms),
+        headers=result.headers(),
+    )
+
+
+@lru_cache(maxsize=None)
+def _sha1(script: str) -> str:
+    return hashlib.sha1(script.encode("utf-8")).hexdigest()
+
+
+async def run_script(redis: Redis, script: str, numkeys: int, *args: Any) -> Any:
+    """EVALSHA, falling back to EVAL (which also caches the script) after a Redis restart or flush."""
+    try:
+        return await redis.evalsha(_sha1(script), numkeys, *args)
+    except NoScriptError:
+        return await redis.eval(script, numkeys, *args)
+
+
+async def check_rate_limit(
+    redis: Redis,
+    org_id: str,
+    rpm_limit: int,
+    *,
+    model: str | None = None,
+    tokens: int = 0,
+    tpm_limit: int | None = None,
+    model_tpm_limit: int | None = None,
+    budgets: Sequence[BudgetCounter] = (),
+) -> RateLimitResult:
+    """
+    Admit one request for the org and, with TPM limits, reserve `tokens` (estimated prompt + max
+    completion) for the org and for org + model, in one round trip. Raise 429 with Retry-After
+    (and Retry-After-Ms) if any limit would be exceeded, or 402 if a spend budget is exhausted;
+    nothing is taken then.
+    """
+    plan = plan_limits(
+        org_id, rpm_limit, model=model, tokens=tokens, tpm_limit=tpm_limit, model_tpm_limit=model_tpm_limit
+    )
+    args: list[Any] = [PERIOD_MS, len(budgets)]
+    for k in plan:
+        args += [k.interval_ms, k.cost]
+    args += [str(b.limit) for b in budgets]
+    keys = [k.key for k in plan] + [b.key for b in budgets]
+    rejected_by, retry_after_ms, remaining, reset_ms = await run_script(redis, _SCRIPT_ADMIT, len(keys), *keys, *args)
+    result = RateLimitResult(limit=rpm_limit, remaining=int(remaining), reset_ms=int(reset_ms))
+    rejected_by = int(rejected_by)
+    if rejected_by > len(plan):
+        raise budget_rejection(budgets[rejected_by - len(plan) - 1])
+    if rejected_by:
+        raise rejection(rejected_by, int(retry_after_ms), result)
+    return RateLimitResult(
+        limit=rpm_limit,
+        remaining=result.remaining,
+        reset_ms=result.reset_ms,
+        reservation=reservation_for(plan, tokens),
+    )
+
+
+async def reconcile_tokens(redis: Redis, reservation: TokenReservation | None, actual_tokens: int) -> None:
+    """Replace the reservation with the tokens actually used (0 when upstream was never called)."""
+    if reservation is None or actual_tokens == reservation.tokens:
+        return
+    delta = actual_tokens - reservation.tokens
+    await run_script(
+        redis, _SCRIPT_RECONCILE, len(reservation.keys), *reservation.keys, delta, *reservation.intervals_ms
+    )
@@ -0,0 +1,123 @@
+"""Exact-match response cache for deterministic chat completions: in-process LRU in front of Redis."""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+from aigate.core.metrics import aigate_response_cache_requests_total
+from aigate.domain.chat import ChatRequest, ChatResponse
+
+if TYPE_CHECKING:
+    from redis.asyncio import Redis
+
+log = logging.getLogger(__name__)
+
+KEY_PREFIX = "respcache"
+
+
+def _cache_key(org_id: str, model: str, request_hash: str) -> str:
+    return f"{KEY_PREFIX}:{org_id}:{model}:{request_hash}"
+
+
+def is_cacheable(body: ChatRequest) -> bool:
+    """Only deterministic unary requests are served from cache."""
+    return not body.stream and body.temperature == 0
+
+
+def parse_cache_control(value: str | None) -> tuple[bool, bool]:
+    """
+    Map request Cache-Control to (read, write):
+    no-store -> bypass the cache entirely; no-cache -> skip the lookup but store the fresh response.
+    """
+    if not value:
+        return (True, True)
+    directives = {d.strip().lower() for d in value.split(",")}
+    if "no-store" in directives:
+        return (False, False)
+    if "no-cache" in directives:
+        return (False, True)
+    return (True, True)
+
+
+class _LocalLRU:
+    def __init__(self, *, max_entries: int, clock: Callable[[], float]) -> None:
+        self._max_entries = max_entries
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+    def get(self, key: str) -> str | None:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        expires_at, raw = item
+        if expires_at <= self._clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return raw
+
+    def set(self, key: str, raw: str, ttl_seconds: float) -> None:
+        if self._max_entries <= 0:
+            return
+        self._entries[key] = (self._clock() + ttl_seconds, raw)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+
+class ResponseCache:
+    """
+    Two tiers keyed by (org_id, model, request_hash). Entries are stored serialized, so every hit
+    returns a fresh ChatResponse the caller may mutate. Redis is optional.
+    """
+
+    def __init__(
+        self,
+        redis: Redis | None,
+        *,
+        ttl_seconds: int,
+        local_max_entries: int,
+        local_ttl_seconds: float,
+        max_entry_bytes: int,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._redis = redis
+        self._ttl = ttl_seconds
+        self._local_ttl = min(local_ttl_seconds, ttl_seconds)
+        self._max_entry_bytes = max_entry_bytes
+        self._local = _LocalLRU(max_entries=local_max_entries, clock=clock)
+
+    async def get(self, org_id: str, model: str, request_hash: str) -> ChatResponse | None:
+        key = _cache_key(org_id, model, request_hash)
+        raw = self._local.get(key)
+        if raw is not None:
+            aigate_response_cache_requests_total.labels(result="hit_local").inc()
+            return ChatResponse.model_validate_json(raw)
+        if self._redis is not None:
+            try:
+                raw = await self._redis.get(key)
+            except Exception as e:
+                log.warning("response_cache.redis_get_failed", extra={"error": str(e)})
+                raw = None
+            if raw is not None:
+                self._local.set(key, raw, self._local_ttl)
+                aigate_response_cache_requests_total.labels(result="hit_redis").inc()
+                return ChatResponse.model_validate_json(raw)
+        aigate_response_cache_requests_total.labels(result="miss").inc()
+        return None
+
+    async def set(self, org_id: str, model: str, request_hash: str, response: ChatResponse) -> None:
+        raw = response.model_dump_json()
+        if len(raw) > self._max_entry_bytes:
+            return
+        key = _cache_key(org_id, model, request_hash)
+        self._local.set(key, raw, self._local_ttl)
+        if self._redis is not None:
+            try:
+                await self._redis.set(key, raw, ex=self._ttl)
+            except Exception as e:
+                log.warning("response_cache.redis_set_failed", extra={"error": str(e)})
@@ -0,0 +1,240 @@
+"""Resumable SSE: provider chunks are tee'd into a capped Redis Stream, so a client that drops can
+reconnect (Last-Event-ID or the same Idempotency-Key) and replay from its offset, then tail live
+chunks, without a second upstream generation.
+
+Event ids are "<stream_id>:<redis entry id>"; stream_id is the Idempotency-Key, the stream a
+Last-Event-ID points at, or a server-generated id.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+from collections.abc import AsyncIterator
+from typing import TYPE_CHECKING, Literal
+
+from aigate.core.metrics import aigate_stream_resume_requests_total
+
+if TYPE_CHECKING:
+    from redis.asyncio import Redis
+
+log = logging.getLogger(__name__)
+
+KEY_PREFIX = "streambuf"
+_FIELD_DATA = "d"
+_FIELD_END = "end"
+_ENTRY_ID = re.compile(r"^\d+-\d+$")
+
+
+def _stream_key(org_id: str, stream_id: str) -> str:
+    return f"{KEY_PREFIX}:{org_id}:{stream_id}"
+
+
+def _owner_key(org_id: str, stream_id: str) -> str:
+    return f"{KEY_PREFIX}:{org_id}:{stream_id}:owner"
+
+
+def parse_last_event_id(value: str | None) -> tuple[str, str] | None:
+    """Split a Last-Event-ID we issued into (stream_id, entry_id); None for anything else."""
+    if not value:
+        return None
+    stream_id, sep, entry_id = value.strip().rpartition(":")
+    if not sep or not stream_id or not _ENTRY_ID.match(entry_id):
+        return None
+    return stream_id, entry_id
+
+
+def _frame(stream_id: str, entry_id: str | None, chunk: bytes) -> bytes:
+    if entry_id is None:
+        return chunk
+    return f"id: {stream_id}:{entry_id}\n".encode("utf-8") + chunk
+
+
+class _LocalTap:
+    """Live hand-off from the pump to the originating connection (skips the Redis round trip)."""
+
+    def __init__(self) -> None:
+        self.queue: asyncio.Queue[tuple[str | None, bytes] | BaseException | None] = asyncio.Queue()
+        self.closed = False
+
+    def put(self, item: tuple[str | None, bytes] | BaseException | None) -> None:
+        if not self.closed:
+            self.queue.put_nowait(item)
+
+
+class StreamBuffer:
+    """
+    The upstream stream is pumped by its own task, so it runs to completion (and is billed once)
+    even when the originating client disconnects. The buffer expires ttl_seconds after the stream ends.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        *,
+        max_chunks: int,
+        ttl_seconds: int,
+        block_ms: int = 1000,
+    ) -> None:
+        self._redis = redis
+        self._max_chunks = max_chunks
+        self._ttl = ttl_seconds
+        self._block_ms = block_ms
+        self._tasks: set[asyncio.Task] = set()
+
+    async def release(self, org_id: str, stream_id: str) -> None:
+        """Give up a claim whose stream never started (rejected before generation)."""
+        await self._redis.delete(_owner_key(org_id, stream_id))
+
+    async def claim(self, org_id: str, stream_id: str, request_hash: str) -> Literal["owner", "replay", "conflict"]:
+        """owner: caller generates; replay: same request already generating/generated; conflict: different body."""
+        key = _owner_key(org_id, stream_id)
+        while True:
+            if await self._redis.set(key, request_hash, ex=self._ttl, nx=True):
+                return "owner"
+            stored = await self._redis.get(key)
+            if stored is None:
+                continue  # Expired between SET NX and GET: claim again.
+            return "replay" if stored == request_hash else "conflict"
+
+    def start(self, org_id: str, stream_id: str, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """Pump `chunks` into the buffer in the background; return the live view for the caller."""
+        tap = _LocalTap()
+        task = asyncio.create_task(self._pump(org_id, stream_id, chunks, tap))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        aigate_stream_resume_requests_total.labels(role="origin").inc()
+        return self._read_local(stream_id, tap)
+
+    async def replay(
+        self, org_id: str, stream_id: str, *, after: str = "0", idle_timeout_seconds: float
+    ) -> AsyncIterator[bytes]:
+        """Yield buffered chunks after `after`, then tail until the end marker or idle_timeout_seconds of silence."""
+        aigate_stream_resume_requests_total.labels(role="replay").inc()
+        key = _stream_key(org_id, stream_id)
+        loop = asyncio.get_running_loop()
+        idle_deadline = loop.time() + idle_timeout_seconds
+        last = after
+        while True:
+            resp = await self._redis.xread({key: last}, count=256, block=self._block_ms)
+            if not resp:
+                if loop.time() >= idle_deadline:
+                    # Owner replica died mid-stream: nothing more will arrive.
+                    log.warning("stream_resume.idle_timeout", extra={"stream_id": stream_id})
+                    return
+                continue
+            idle_deadline = loop.time() + idle_timeout_seconds
+            for _key, entries in resp:
+                for entry_id, fields in entries:
+                    last = entry_id
+                    if _FIELD_END in fields:
+                        return
+                    yield _frame(stream_id, entry_id, fields[_FIELD_DATA].encode("utf-8"))
+
+    async def close(self) -> None:
+        """Cancel pumps still running at shutdown; replaying clients see the stream end."""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _read_local(self, stream_id: str, tap: _LocalTap) -> AsyncIterator[bytes]:
+        try:
+            while True:
+                item = await tap.queue.get()
+                if item is None:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                entry_id, chunk = item
+                yield _frame(stream_id, entry_id, chunk)
+        finally:
+            tap.closed = True
+
+    async def _pump(self, org_id: str, stream_id: str, chunks: AsyncIterator[bytes], tap: _LocalTap) -> None:
+        writer = _BufferWriter(self._redis, _stream_key(org_id, stream_id), max_chunks=self._max_chunks, ttl=self._ttl)
+        status = "done"
+        seq = 0
+        try:
+            async for chunk in chunks:
+                seq += 1
+                # The live client gets the chunk first; its XADD is batched off the hot path.
+                entry_id = None if writer.failed else f"0-{seq}"
+                tap.put((entry_id, chunk))
+                if entry_id is not None:
+                    writer.add(entry_id, {_FIELD_DATA: chunk.decode("utf-8")})
+        except asyncio.CancelledError:
+            status = "error"
+            tap.put(None)
+            raise
+        except Exception as e:
+            status = "error"
+            tap.put(e)
+        finally:
+            # The end marker goes out either way, so clients already replaying stop.
+            buffered = await writer.finish(f"0-{seq + 1}", status)
+            try:
+                if buffered and status == "done":
+                    # Retries keep replaying this stream for as long as it is buffered.
+                    await self._redis.expire(_owner_key(org_id, stream_id), self._ttl)
+                else:
+                    # Failed or not replayable: free the id so a retry generates again instead of
+                    # replaying nothing (its first write replaces what is left of this stream).
+                    keys = [_owner_key(org_id, stream_id)] + ([] if buffered else [_stream_key(org_id, stream_id)])
+                    await self._redis.delete(*keys)
+            except Exception as e:
+                log.warning("stream_resume.finish_failed", extra={"stream_id": stream_id, "error": str(e)})
+            tap.put(None)
+
+
+class _BufferWriter:
+    """
+    Appends one stream's chunks to its Redis Stream. Entry ids are assigned locally ("0-<seq>"; only
+    this writer appends to the key), so chunks never wait for Redis: whatever piled up since the
+    last write goes out in one pipeline.
+    """
+
+    def __init__(self, redis: Redis, key: str, *, max_chunks: int, ttl: int) -> None:
+        self._redis = redis
+        self._key = key
+        self._max_chunks = max_chunks
+        self._ttl = ttl
+        self._pending: list[tuple[str, dict[str, str]]] = []
+        self._flushing: asyncio.Task | None = None
+        self._first = True
+        self.failed = False
+
+    def add(self, entry_id: str, fields: dict[str, str]) -> None:
+        self._pending.append((entry_id, fields))
+        if self._flushing is None or self._flushing.done():
+            self._flushing = asyncio.create_task(self._flush())
+
+    async def finish(self, entry_id: str, status: str) -> bool:
+        """Write what is left plus the end marker; False when this stream could not be buffered."""
+        if not self.failed:
+            self._pending.append((entry_id, {_FIELD_END: status}))
+        if self._flushing is not None and not self._flushing.done():
+            await asyncio.shield(self._flushing)
+        await self._flush(final=True)
+        return not self.failed
+
+    async def _flush(self, *, final: bool = False) -> None:
+        while (self._pending or final) and not self.failed:
+            batch, self._pending = self._pending, []
+            try:
+                pipe = self._redis.pipeline(transaction=False)
+                if self._first:
+                    pipe.delete(self._key)  # a stale stream left under this id would reject our entry ids
+                for entry_id, fields in batch:
+                    pipe.xadd(self._key, fields, id=entry_id, maxlen=self._max_chunks, approximate=True)
+                if self._first or final:
+                    # TTL on the first write and refreshed at the end, not per chunk.
+                    pipe.expire(self._key, self._ttl)
+                await pipe.execute()
+                self._first = False
+            except Exception as e:
+                # Keep serving the live client; this stream just can't be resumed.
+                self.failed = True
+                log.warning("stream_resume.append_failed", extra={"key": self._key, "error": str(e)})
+            final = False
@@ -1,19 +1,34 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from typing import TYPE_CHECKING
 
-import httpx
 from fastapi import FastAPI
 from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
 
 from aigate import __version__
 from aigate.api import api_router
+from aigate.core.auth_cache import ApiKeyCache, run_invalidation_listener
 from aigate.core.config import get_settings
 from aigate.core.logging import configure_logging
-from aigate.core.middleware import RequestIdMiddleware
+from aigate.core.middleware import install_middleware
+from aigate.limits.budget import run_budget_reconciler
+from aigate.limits.lease import LeaseRateLimiter
+from aigate.limits.rate_limit import parse_model_limits
+from aigate.limits.response_cache import ResponseCache
+from aigate.limits.stream_resume import StreamBuffer
+from aigate.providers.factory import build_registry
+from aigate.routing.circuit_breaker import CircuitBreakers
+from aigate.routing.fair_queue import parse_weights
+from aigate.routing.hedging import Hedger
+from aigate.routing.router import parse_model_fallbacks
+from aigate.routing.singleflight import SingleFlight
 from aigate.storage.db import create_engine, create_sessionmaker
+from aigate.storage.ledger import LedgerWriter
+from aigate.storage.pricing import PriceIndex, run_price_index_refresher
+from aigate.storage.spool import LedgerSpool, run_spool_replayer
 
 if TYPE_CHECKING:
     from redis.asyncio import Redis
@@ -26,25 +41,50 @@ async def lifespan(app: FastAPI):
     settings = get_settings()
     configure_logging(level=settings.aigate_log_level)
     log.info("app.start", extra={"env": settings.aigate_env})
-    qwen_client: httpx.AsyncClient | None = None
     db_engine: AsyncEngine | None = None
     db_sessionmaker: async_sessionmaker | None = None
     redis_client: Redis | None = None
-    if settings.qwen_api_key and settings.qwen_base_url:
-        qwen_client = httpx.AsyncClient(
-            base_url=settings.qwen_base_url,
-            headers={"Authorization": f"Bearer {settings.qwen_api_key}"},
-            timeout=httpx.Timeout(
-                settings.qwen_timeout_default_seconds, connect=10.0
-            ),
-        )
-        app.state.qwen_http_client = qwen_client
+    ledger_writer: LedgerWriter | None = None
+    ledger_spool: LedgerSpool | None = None
+    stream_buffer: StreamBuffer | None = None
+    rate_limiter: LeaseRateLimiter | None = None
+    background_tasks: list[asyncio.Task] = []
+    provider_registry = build_registry(settings)
+    app.state.provider_registry = provider_registry
+    await provider_registry.warmup(settings.provider_warmup_timeout_seconds)
 
     if settings.database_url:
         db_engine = create_engine(database_url=settings.database_url)
         db_sessionmaker = create_sessionmaker(db_engine)
         app.state.db_engine = db_engine
         app.state.db_sessionmaker = db_sessionmaker
+        if settings.ledger_spool_dir:
+            ledger_spool = LedgerSpool(
+                settings.ledger_spool_dir,
+                segment_max_bytes=settings.ledger_spool_segment_max_bytes,
+            )
+            background_tasks.append(
+                asyncio.create_task(
+                    run_spool_replayer(
+                        ledger_spool,
+                        db_sessionmaker,
+                        fsync_interval_ms=settings.ledger_spool_fsync_interval_ms,
+                        replay_interval_seconds=settings.ledger_spool_replay_interval_seconds,
+                        batch_size=settings.ledger_batch_size,
+                    )
+                )
+            )
+        ledger_writer = LedgerWriter(
+            db_sessionmaker,
+            max_queue=settings.ledger_queue_max,
+            batch_size=settings.ledger_batch_size,
+            flush_interval_ms=settings.ledger_flush_interval_ms,
+            enqueue_timeout_ms=settings.ledger_enqueue_timeout_ms,
+            spool=ledger_spool,
+            write_budget_ms=settings.ledger_write_budget_ms if ledger_spool is not None else None,
+        )
+        ledger_writer.start()
+        app.state.ledger_writer = ledger_writer
 
     if settings.redis_url:
         from redis.asyncio import Redis as RedisClient
@@ -56,9 +96,108 @@ async def lifespan(app: FastAPI):
         )
         app.state.redis = redis_client
 
+    if redis_client is not None and db_sessionmaker is not None:
+        background_tasks.append(
+            asyncio.create_task(
+                run_budget_reconciler(
+                    db_sessionmaker,
+                    redis_client,
+                    interval_seconds=settings.budget_reconcile_interval_seconds,
+                )
+            )
+        )
+
+    if redis_client is not None and settings.rate_limit_mode == "hybrid":
+        rate_limiter = LeaseRateLimiter(
+            redis_client,
+            lease_fraction=settings.rate_limit_lease_fraction,
+            flush_interval_ms=settings.rate_limit_lease_flush_ms,
+        )
+        rate_limiter.start()
+        app.state.rate_limiter = rate_limiter
+
+    if settings.response_cache_enabled:
+        app.state.response_cache = ResponseCache(
+            redis_client,
+            ttl_seconds=settings.response_cache_ttl_seconds,
+            local_max_entries=settings.response_cache_local_max_entries,
+            local_ttl_seconds=settings.response_cache_local_ttl_seconds,
+            max_entry_bytes=settings.response_cache_max_entry_bytes,
+        )
+
+    if settings.singleflight_enabled:
+        app.state.singleflight = SingleFlight(
+            redis_client if settings.singleflight_redis_enabled else None,
+            lease_seconds=settings.qwen_timeout_max_seconds,
+            result_ttl_seconds=settings.singleflight_result_ttl_seconds,
+        )
+
+    if redis_client is not None and settings.stream_resume_enabled:
+        stream_buffer = StreamBuffer(
+            redis_client,
+            max_chunks=settings.stream_resume_max_chunks,
+            ttl_seconds=settings.stream_resume_ttl_seconds,
+        )
+        app.state.stream_buffer = stream_buffer
+
+    app.state.hedger = Hedger(
+        models={m.strip() for m in (settings.hedge_models or "").split(",") if m.strip()},
+        delay_seconds=settings.hedge_delay_ms / 1000.0 if settings.hedge_delay_ms is not None else None,
+        min_delay_seconds=settings.hedge_min_delay_ms / 1000.0,
+        budget_ratio=settings.hedge_budget_ratio,
+    )
+    app.state.model_fallbacks = parse_model_fallbacks(settings.model_fallbacks)
+    app.state.tpm_model_limits = parse_model_limits(settings.rate_limit_tpm_models)
+    app.state.tier_weights = parse_weights(settings.fair_queue_tier_weights)
+    if settings.circuit_breaker_enabled:
+        app.state.circuit_breakers = CircuitBreakers(
+            window_seconds=settings.circuit_breaker_window_seconds,
+            min_requests=settings.circuit_breaker_min_requests,
+            error_rate=settings.circuit_breaker_error_rate,
+            timeout_rate=settings.circuit_breaker_timeout_rate,
+            open_seconds=settings.circuit_breaker_open_seconds,
+            half_open_probes=settings.circuit_breaker_half_open_probes,
+        )
+
+    api_key_cache = ApiKeyCache(
+        max_size=settings.api_key_cache_max_size,
+        ttl_seconds=settings.api_key_cache_ttl_seconds,
+        negative_ttl_seconds=settings.api_key_cache_negative_ttl_seconds,
+    )
+    app.state.api_key_cache = api_key_cache
+    if redis_client is not None:
+        background_tasks.append(asyncio.create_task(run_invalidation_listener(redis_client, api_key_cache)))
+
+    if db_sessionmaker is not None:
+        price_index = PriceIndex(ttl_seconds=settings.price_index_ttl_seconds)
+        app.state.price_index = price_index
+        background_tasks.append(
+            asyncio.create_task(
+                run_price_index_refresher(
+                    price_index,
+                    db_sessionmaker,
+                    redis_client,
+                    poll_interval_seconds=settings.price_index_poll_seconds,
+                )
+            )
+        )
+
     yield
-    if qwen_client is not None:
-        await qwen_client.aclose()
+    # In-flight upstream calls finish first, so their streams and ledger rows complete normally.
+    await provider_registry.drain(settings.provider_drain_timeout_seconds)
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    if stream_buffer is not None:
+        # Before the ledger writer: cancelled streams still record their ledger rows.
+        await stream_buffer.close()
+    if rate_limiter is not None:
+        await rate_limiter.close()
+    if ledger_writer is not None:
+        await ledger_writer.close()
+    if ledger_spool is not None:
+        ledger_spool.close()
+    await provider_registry.aclose()
     if db_engine is not None:
         await db_engine.dispose()
     if redis_client is not None:
@@ -68,7 +207,7 @@ async def lifespan(app: FastAPI):
 
 def create_app() -> FastAPI:
     app = FastAPI(title="AIGate", version=__version__, lifespan=lifespan)
-    app.add_middleware(RequestIdMiddleware)
+    install_middleware(app)
     app.include_router(api_router)
     return app
 
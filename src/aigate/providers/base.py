@@ -8,8 +8,27 @@ from aigate.domain.models import ModelInfo
 
 
 class ProviderAdapter(ABC):
+    """
+    One upstream provider, built once at startup and shared by all requests.
+
+    Lifecycle: warmup() once before serving, healthy() while serving, drain() then aclose() on
+    shutdown. The defaults suit adapters that hold no connections.
+    """
+
     name: str
 
+    async def warmup(self) -> None:
+        """Open connections and prefetch what the first requests need; failures must not raise."""
+
+    def healthy(self) -> bool:
+        return True
+
+    async def drain(self, timeout_seconds: float) -> None:
+        """Wait up to timeout_seconds for in-flight upstream calls to finish."""
+
+    async def aclose(self) -> None:
+        """Release connections; called after drain()."""
+
     @abstractmethod
     async def list_models(self) -> list[ModelInfo]:
         raise NotImplementedError
@@ -0,0 +1,234 @@
+"""
+Upstream HTTP clients: tuned connection pools with optional HTTP/2, cached DNS and telemetry.
+
+One PooledTransport per upstream endpoint. Connections are kept alive for keepalive_expiry and can
+be opened ahead of traffic (prewarm), so bursts reuse warm TLS connections instead of paying a
+handshake each. Pool utilization is read from the live pool at scrape time; the wait for a
+connection is measured from handing the request to the pool until httpcore's first trace event
+(connect for a new connection, send headers for a reused one).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import socket
+import time
+import typing
+from collections.abc import Callable
+from dataclasses import dataclass
+from ipaddress import ip_address
+
+import httpcore
+import httpx
+
+from aigate.core.metrics import (
+    aigate_upstream_connections_opened_total,
+    aigate_upstream_pool_connections,
+    aigate_upstream_pool_wait_seconds,
+)
+
+if typing.TYPE_CHECKING:
+    from aigate.core.config import Settings
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    http2: bool = False
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry_seconds: float = 30.0
+    dns_cache_seconds: float = 60.0  # 0 disables the cache
+    prewarm_connections: int = 1  # per endpoint, opened at startup
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> PoolConfig:
+        return cls(
+            http2=settings.upstream_http2,
+            max_connections=settings.upstream_max_connections,
+            max_keepalive_connections=settings.upstream_max_keepalive_connections,
+            keepalive_expiry_seconds=settings.upstream_keepalive_expiry_seconds,
+            dns_cache_seconds=settings.upstream_dns_cache_seconds,
+            prewarm_connections=settings.upstream_prewarm_connections,
+        )
+
+
+class CachingResolverBackend(httpcore.AsyncNetworkBackend):
+    """
+    Network backend that resolves each host once per ttl_seconds.
+
+    Only the TCP target becomes an IP address: httpcore still sends the original host as TLS SNI
+    and in the Host header, so certificates verify as usual.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float,
+        *,
+        backend: httpcore.AsyncNetworkBackend | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._ttl = ttl_seconds
+        self._backend = backend or httpcore.AnyIOBackend()
+        self._clock = clock
+        self._cache: dict[tuple[str, int], tuple[float, list[str]]] = {}  # -> (expires at, addresses)
+
+    async def resolve(self, host: str, port: int) -> list[str]:
+        cached = self._cache.get((host, port))
+        if cached is not None and cached[0] > self._clock():
+            return cached[1]
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        addresses = list(dict.fromkeys(str(info[4][0]) for info in infos))
+        self._cache[(host, port)] = (self._clock() + self._ttl, addresses)
+        return addresses
+
+    async def connect_tcp(
+        self,
+        host: str,
+        port: int,
+        timeout: float | None = None,
+        local_address: str | None = None,
+        socket_options: typing.Iterable[httpcore.SOCKET_OPTION] | None = None,
+    ) -> httpcore.AsyncNetworkStream:
+        if _is_ip(host):
+            return await self._backend.connect_tcp(host, port, timeout, local_address, socket_options)
+        try:
+            addresses = await self.resolve(host, port)
+        except OSError as e:
+            raise httpcore.ConnectError(str(e)) from e
+        last: Exception | None = None
+        for address in addresses:
+            try:
+                return await self._backend.connect_tcp(address, port, timeout, local_address, socket_options)
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                last = e
+        self._cache.pop((host, port), None)  # every cached address failed: resolve afresh next time
+        raise last or httpcore.ConnectError(f"No addresses for {host}")
+
+    async def connect_unix_socket(
+        self,
+        path: str,
+        timeout: float | None = None,
+        socket_options: typing.Iterable[httpcore.SOCKET_OPTION] | None = None,
+    ) -> httpcore.AsyncNetworkStream:
+        return await self._backend.connect_unix_socket(path, timeout, socket_options)
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+class PooledTransport(httpx.AsyncHTTPTransport):
+    """httpx transport for one upstream endpoint, exporting pool size and connection wait time."""
+
+    def __init__(
+        self,
+        provider: str,
+        endpoint: str,
+        config: PoolConfig,
+        *,
+        network_backend: httpcore.AsyncNetworkBackend | None = None,
+    ) -> None:
+        if config.http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                raise ImportError("UPSTREAM_HTTP2 needs the h2 package: pip install 'httpx[http2]'") from None
+        super().__init__()
+        # httpx does not take a network backend, so the pool is built here with the same arguments
+        # AsyncHTTPTransport would use.
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive_connections,
+            keepalive_expiry=config.keepalive_expiry_seconds,
+            http1=True,
+            http2=config.http2,
+            network_backend=network_backend,
+        )
+        self._provider = provider
+        self._endpoint = endpoint
+        self._opened = aigate_upstream_connections_opened_total.labels(provider=provider, endpoint=endpoint)
+        self._wait = aigate_upstream_pool_wait_seconds.labels(provider=provider)
+        gauge = aigate_upstream_pool_connections
+        gauge.labels(provider, endpoint, "active").set_function(lambda: self.connection_counts()[0])
+        gauge.labels(provider, endpoint, "idle").set_function(lambda: self.connection_counts()[1])
+        gauge.labels(provider, endpoint, "limit").set(config.max_connections)
+
+    def connection_counts(self) -> tuple[int, int]:
+        """(active, idle) connections currently in the pool."""
+        active = idle = 0
+        for conn in self._pool.connections:
+            if conn.is_closed():
+                continue
+            if conn.is_idle():
+                idle += 1
+            else:
+                active += 1
+        return active, idle
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        waiting = True
+        inner = request.extensions.get("trace")
+
+        async def trace(event: str, info: dict[str, typing.Any]) -> None:
+            nonlocal waiting
+            if waiting:
+                waiting = False
+                self._wait.observe(time.perf_counter() - started)
+            if event == "connection.connect_tcp.complete":
+                self._opened.inc()
+            if inner is not None:
+                await inner(event, info)
+
+        request.extensions = {**request.extensions, "trace": trace}
+        return await super().handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await super().aclose()
+        for state in ("active", "idle"):
+            aigate_upstream_pool_connections.labels(self._provider, self._endpoint, state).set(0)
+
+
+def build_client(
+    provider: str,
+    *,
+    base_url: str,
+    headers: dict[str, str],
+    timeout: httpx.Timeout,
+    config: PoolConfig,
+    network_backend: httpcore.AsyncNetworkBackend | None = None,
+) -> httpx.AsyncClient:
+    """An AsyncClient for one upstream endpoint; share one network_backend to share its DNS cache."""
+    return httpx.AsyncClient(
+        base_url=base_url,
+        headers=headers,
+        timeout=timeout,
+        transport=PooledTransport(provider, base_url, config, network_backend=network_backend),
+    )
+
+
+def network_backend_for(config: PoolConfig) -> httpcore.AsyncNetworkBackend | None:
+    return CachingResolverBackend(config.dns_cache_seconds) if config.dns_cache_seconds > 0 else None
+
+
+async def prewarm(client: httpx.AsyncClient, path: str, connections: int) -> httpx.Response:
+    """
+    Open up to `connections` keep-alive connections with concurrent GETs of path; return the first
+    response. Over HTTP/2 they share one connection, which is all a multiplexed endpoint needs.
+    """
+    results = await asyncio.gather(*(client.get(path) for _ in range(max(1, connections))), return_exceptions=True)
+    for result in results:
+        if isinstance(result, httpx.Response):
+            return result
+    raise typing.cast(BaseException, results[0])
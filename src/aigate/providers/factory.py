@@ -0,0 +1,102 @@
+"""
+Config-driven provider registration: PROVIDERS names the adapters to build at startup.
+
+Each factory returns a ready adapter (connections, pool, concurrency limiter) or None when the
+provider is not configured, so a listed but unconfigured provider is skipped rather than fatal.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import Callable
+
+import httpx
+
+from aigate.core.config import Settings
+from aigate.providers.base import ProviderAdapter
+from aigate.providers.clients.http import PoolConfig, build_client, network_backend_for
+from aigate.providers.pool import Endpoint, EndpointPool, parse_endpoints
+from aigate.providers.qwen_adapter import QwenAdapter
+from aigate.providers.registry import ProviderRegistry
+from aigate.routing.concurrency import AdaptiveLimiter, ConcurrencyLimitedAdapter
+
+log = logging.getLogger(__name__)
+
+
+def _build_qwen(settings: Settings) -> ProviderAdapter | None:
+    if not settings.qwen_api_key:
+        return None
+    pool_config = PoolConfig.from_settings(settings)
+    backend = network_backend_for(pool_config)
+    timeout = httpx.Timeout(settings.qwen_timeout_default_seconds, connect=10.0)
+    if settings.qwen_endpoints:
+        specs = parse_endpoints(settings.qwen_endpoints)
+        pool = EndpointPool(
+            "qwen",
+            [
+                Endpoint(
+                    name=spec.base_url,
+                    client=build_client(
+                        "qwen",
+                        base_url=spec.base_url,
+                        headers={"Authorization": f"Bearer {spec.api_key or settings.qwen_api_key}"},
+                        timeout=timeout,
+                        config=pool_config,
+                        network_backend=backend,
+                    ),
+                    weight=spec.weight,
+                )
+                for spec in specs
+            ],
+            strategy=settings.qwen_balancing,
+            eject_after_failures=settings.qwen_endpoint_eject_after_failures,
+            eject_seconds=settings.qwen_endpoint_eject_seconds,
+        )
+    elif settings.qwen_base_url:
+        client = build_client(
+            "qwen",
+            base_url=settings.qwen_base_url,
+            headers={"Authorization": f"Bearer {settings.qwen_api_key}"},
+            timeout=timeout,
+            config=pool_config,
+            network_backend=backend,
+        )
+        pool = EndpointPool.single("qwen", client)
+    else:
+        return None
+
+    adapter: ProviderAdapter = QwenAdapter(
+        pool=pool,
+        models_ttl_seconds=settings.qwen_models_ttl_seconds,
+        prewarm_connections=pool_config.prewarm_connections,
+    )
+    if settings.qwen_concurrency_enabled:
+        limiter = AdaptiveLimiter(
+            "qwen",
+            initial_limit=settings.qwen_concurrency_initial,
+            min_limit=settings.qwen_concurrency_min,
+            max_limit=settings.qwen_concurrency_max,
+            max_queue=settings.qwen_concurrency_max_queue,
+        )
+        adapter = ConcurrencyLimitedAdapter(adapter, limiter)
+    return adapter
+
+
+ADAPTER_FACTORIES: dict[str, Callable[[Settings], ProviderAdapter | None]] = {
+    "qwen": _build_qwen,
+}
+
+
+def build_registry(settings: Settings) -> ProviderRegistry:
+    registry = ProviderRegistry()
+    for name in (n.strip() for n in settings.providers.split(",")):
+        if not name:
+            continue
+        factory = ADAPTER_FACTORIES.get(name)
+        if factory is None:
+            log.warning("provider.unknown", extra={"provider": name})
+            continue
+        adapter = factory(settings)
+        if adapter is not None:
+            registry.register(adapter)
+    return registry
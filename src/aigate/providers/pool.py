@@ -0,0 +1,217 @@
+"""Upstream endpoint pool for one provider: balancing plus passive health from live traffic."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Literal
+
+import httpx
+
+from aigate.core.metrics import aigate_upstream_ejections_total, aigate_upstream_outstanding
+
+log = logging.getLogger(__name__)
+
+Strategy = Literal["round_robin", "least_outstanding", "p2c_ewma"]
+STRATEGIES: tuple[str, ...] = ("round_robin", "least_outstanding", "p2c_ewma")
+
+
+@dataclass(frozen=True)
+class EndpointSpec:
+    base_url: str
+    weight: int = 1
+    api_key: str | None = None
+
+
+def parse_endpoints(spec: str) -> list[EndpointSpec]:
+    """Parse "url[|weight[|api_key]],..." (e.g. QWEN_ENDPOINTS); keys default to the provider key."""
+    out: list[EndpointSpec] = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        parts = [p.strip() for p in item.split("|")]
+        weight = int(parts[1]) if len(parts) > 1 and parts[1] else 1
+        if weight < 1:
+            raise ValueError(f"Endpoint weight must be >= 1: {item}")
+        api_key = parts[2] if len(parts) > 2 and parts[2] else None
+        out.append(EndpointSpec(base_url=parts[0], weight=weight, api_key=api_key))
+    return out
+
+
+@dataclass(eq=False)
+class Endpoint:
+    name: str
+    client: httpx.AsyncClient
+    weight: int = 1
+    outstanding: int = 0
+    ewma_seconds: float | None = None  # None until the first observation
+    consecutive_failures: int = 0
+    ejected_until: float = 0.0
+    current_weight: int = field(default=0, repr=False)  # smooth weighted round-robin state
+
+
+class Attempt:
+    """
+    One request on one endpoint. Streams call first_byte() so EWMA tracks time-to-first-byte;
+    adapters set upstream_status so a 4xx answer does not count against the endpoint.
+    """
+
+    def __init__(self, endpoint: Endpoint, clock: Callable[[], float]) -> None:
+        self.endpoint = endpoint
+        self._clock = clock
+        self.started = clock()
+        self.first_byte_at: float | None = None
+        self.upstream_status: int | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self.endpoint.client
+
+    def first_byte(self) -> None:
+        if self.first_byte_at is None:
+            self.first_byte_at = self._clock()
+
+    def is_endpoint_failure(self, exc: BaseException) -> bool:
+        # Adapters map every upstream error to 502; the upstream status tells whose fault it was.
+        if self.upstream_status is not None:
+            return self.upstream_status >= 500 or self.upstream_status == 429
+        return getattr(exc, "status_code", 500) >= 500
+
+
+class EndpointPool:
+    """
+    Picks an endpoint per request:
+      round_robin        smooth weighted round-robin;
+      least_outstanding  fewest in-flight requests per unit of weight;
+      p2c_ewma           two random candidates, lower EWMA latency x (outstanding + 1) wins.
+    An endpoint with eject_after_failures consecutive 5xx/timeouts is skipped for eject_seconds;
+    if every endpoint is ejected the pool fails open and uses all of them.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        endpoints: list[Endpoint],
+        *,
+        strategy: Strategy = "p2c_ewma",
+        ewma_alpha: float = 0.3,
+        failure_penalty_seconds: float = 10.0,
+        eject_after_failures: int = 5,
+        eject_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+        rng: random.Random | None = None,
+    ) -> None:
+        if not endpoints:
+            raise ValueError("EndpointPool needs at least one endpoint")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown balancing strategy: {strategy}")
+        self.provider = provider
+        self.endpoints = endpoints
+        self.strategy = strategy
+        self._alpha = ewma_alpha
+        self._failure_penalty = failure_penalty_seconds
+        self._eject_after = eject_after_failures
+        self._eject_seconds = eject_seconds
+        self._clock = clock
+        self._rng = rng or random.Random()
+
+    @classmethod
+    def single(cls, provider: str, client: httpx.AsyncClient) -> EndpointPool:
+        return cls(provider, [Endpoint(name=str(client.base_url), client=client)], strategy="round_robin")
+
+    def pick(self) -> Endpoint:
+        if len(self.endpoints) == 1:
+            return self.endpoints[0]
+        now = self._clock()
+        healthy = [e for e in self.endpoints if e.ejected_until <= now] or self.endpoints
+        if len(healthy) == 1:
+            return healthy[0]
+        if self.strategy == "round_robin":
+            return self._pick_round_robin(healthy)
+        if self.strategy == "least_outstanding":
+            best = min(e.outstanding / e.weight for e in healthy)
+            return self._rng.choice([e for e in healthy if e.outstanding / e.weight == best])
+        a, b = self._rng.sample(healthy, 2)
+        return a if self._score(a) <= self._score(b) else b
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[Attempt]:
+        endpoint = self.pick()
+        attempt = Attempt(endpoint, self._clock)
+        endpoint.outstanding += 1
+        aigate_upstream_outstanding.labels(provider=self.provider, endpoint=endpoint.name).inc()
+        try:
+            yield attempt
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._observe(attempt, ok=not attempt.is_endpoint_failure(e))
+            raise
+        else:
+            self._observe(attempt, ok=True)
+        finally:
+            endpoint.outstanding -= 1
+            aigate_upstream_outstanding.labels(provider=self.provider, endpoint=endpoint.name).dec()
+
+    def _pick_round_robin(self, healthy: list[Endpoint]) -> Endpoint:
+        # nginx smooth WRR: spreads heavy endpoints instead of sending them bursts.
+        total = 0
+        best: Endpoint | None = None
+        for e in healthy:
+            e.current_weight += e.weight
+            total += e.weight
+            if best is None or e.current_weight > best.current_weight:
+                best = e
+        assert best is not None
+        best.current_weight -= total
+        return best
+
+    def _score(self, e: Endpoint) -> float:
+        # Unobserved endpoints score 0 so they get probed.
+        return (e.ewma_seconds or 0.0) * (e.outstanding + 1)
+
+    def _observe(self, attempt: Attempt, *, ok: bool) -> None:
+        e = attempt.endpoint
+        now = self._clock()
+        latency = (attempt.first_byte_at if ok and attempt.first_byte_at is not None else now) - attempt.started
+        if not ok:
+            # Fast failures must not make an endpoint look attractive to p2c_ewma.
+            latency = max(latency, self._failure_penalty)
+        e.ewma_seconds = latency if e.ewma_seconds is None else (1 - self._alpha) * e.ewma_seconds + self._alpha * latency
+        if ok:
+            e.consecutive_failures = 0
+            return
+        e.consecutive_failures += 1
+        if e.consecutive_failures >= self._eject_after and e.ejected_until <= now:
+            e.ejected_until = now + self._eject_seconds
+            aigate_upstream_ejections_total.labels(provider=self.provider, endpoint=e.name).inc()
+            log.warning(
+                "upstream.endpoint_ejected",
+                extra={"provider": self.provider, "endpoint": e.name, "failures": e.consecutive_failures},
+            )
+
+    @property
+    def outstanding(self) -> int:
+        return sum(e.outstanding for e in self.endpoints)
+
+    def healthy(self) -> bool:
+        """At least one endpoint is not ejected."""
+        now = self._clock()
+        return any(e.ejected_until <= now for e in self.endpoints)
+
+    async def drain(self, timeout_seconds: float, *, poll_seconds: float = 0.05) -> bool:
+        """Wait until no request is outstanding; False if timeout_seconds ran out first."""
+        deadline = self._clock() + timeout_seconds
+        while self.outstanding and self._clock() < deadline:
+            await asyncio.sleep(poll_seconds)
+        return not self.outstanding
+
+    async def aclose(self) -> None:
+        for e in self.endpoints:
+            await e.client.aclose()
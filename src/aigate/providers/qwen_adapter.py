@@ -1,8 +1,9 @@
 from __future__ import annotations
 
-import json
+import asyncio
 import logging
-from collections.abc import AsyncIterator
+import time
+from collections.abc import AsyncIterator, Callable
 from datetime import datetime, timezone
 from uuid import uuid4
 from typing import Any, Literal
@@ -10,12 +11,21 @@ from typing import Any, Literal
 import httpx
 
 from aigate.core.errors import bad_gateway, gateway_timeout
+from aigate.core.jsoncodec import dumps, dumps_str, loads
 from aigate.domain.chat import ChatRequest, ChatResponse, Choice, Message, Usage
 from aigate.domain.models import Capabilities, ModelInfo
 from aigate.providers.base import ProviderAdapter
+from aigate.providers.clients.http import prewarm
+from aigate.providers.pool import EndpointPool
+from aigate.providers.sse import DONE, SSEParser, encode_event, rewrite_model
 
 log = logging.getLogger(__name__)
 
+_JSON_HEADERS = {"Content-Type": "application/json"}
+# Top-level members replaced in a forwarded raw body (None drops the member).
+_STREAM_FLAGS: dict[str, bytes | None] = {"stream": b"true", "stream_options": b'{"include_usage":true}'}
+_UNARY_FLAGS: dict[str, bytes | None] = {"stream": None, "stream_options": None}
+
 
 def _safe_text(value: Any) -> str:
     if value is None:
@@ -44,12 +54,51 @@ def _format_http_error(e: Exception) -> str:
 class QwenAdapter(ProviderAdapter):
     name = "qwen"
 
-    def __init__(self, *, client: httpx.AsyncClient):
-        self._client = client
+    def __init__(
+        self,
+        *,
+        client: httpx.AsyncClient | None = None,
+        pool: EndpointPool | None = None,
+        models_ttl_seconds: float = 300.0,
+        prewarm_connections: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if (client is None) == (pool is None):
+            raise ValueError("QwenAdapter needs exactly one of client or pool")
+        self._pool = pool if pool is not None else EndpointPool.single(self.name, client)
+        self._models_ttl = models_ttl_seconds
+        self._prewarm_connections = prewarm_connections
+        self._clock = clock
+        self._models: tuple[float, list[ModelInfo]] | None = None  # (fetched at, models)
+
+    async def warmup(self) -> None:
+        # Concurrent GET /models open warm connections to every endpoint and fill the models cache.
+        results = await asyncio.gather(
+            *(prewarm(e.client, "/models", self._prewarm_connections) for e in self._pool.endpoints),
+            return_exceptions=True,
+        )
+        for endpoint, resp in zip(self._pool.endpoints, results):
+            if isinstance(resp, BaseException):
+                log.warning("qwen.warmup_failed", extra={"endpoint": endpoint.name, "error": _format_http_error(resp)})
+            elif self._models is None and resp.status_code < 400:
+                self._models = (self._clock(), self._parse_models(resp))
+
+    def healthy(self) -> bool:
+        return self._pool.healthy()
+
+    async def drain(self, timeout_seconds: float) -> None:
+        if not await self._pool.drain(timeout_seconds):
+            log.warning("qwen.drain_timeout", extra={"outstanding": self._pool.outstanding})
+
+    async def aclose(self) -> None:
+        await self._pool.aclose()
 
     async def list_models(self) -> list[ModelInfo]:
+        if self._models is not None and self._clock() - self._models[0] < self._models_ttl:
+            return self._models[1]
         try:
-            resp = await self._client.get("/models")
+            async with self._pool.acquire() as attempt:
+                resp = await attempt.client.get("/models")
         except httpx.TimeoutException as e:
             log.exception("Qwen models request timed out: %s", _format_http_error(e))
             raise gateway_timeout("Qwen models request timed out") from e
@@ -57,13 +106,17 @@ class QwenAdapter(ProviderAdapter):
             log.exception("Qwen models request failed: %s", _format_http_error(e))
             raise bad_gateway("Qwen models request failed") from e
 
+        if resp.status_code >= 400 and resp.status_code != 404:
+            raise bad_gateway(f"Qwen models request failed ({resp.status_code})")
+        models = self._parse_models(resp)
+        self._models = (self._clock(), models)
+        return models
+
+    def _parse_models(self, resp: httpx.Response) -> list[ModelInfo]:
         if resp.status_code == 404:
             return []
 
-        if resp.status_code >= 400:
-            raise bad_gateway(f"Qwen models request failed ({resp.status_code})")
-
-        data = resp.json()
+        data = loads(resp.content)
         items = data.get("data") or []
 
         caps = Capabilities(
@@ -86,42 +139,60 @@ class QwenAdapter(ProviderAdapter):
             return content
         return [p.model_dump(mode="json") for p in content]
 
-    async def chat_completions(
-        self, req: ChatRequest, timeout_seconds: float | None = None
-    ) -> ChatResponse:
-        def _serialize_content(content: str | list) -> str | list[dict[str, Any]]:
-            return self._serialize_content(content)
-
+    def _request_body(self, req: ChatRequest, *, stream: bool) -> dict[str, Any]:
+        """
+        httpx arguments for the upstream body. A request parsed from raw bytes is forwarded as
+        those bytes with only model and the stream flags replaced; otherwise it is serialized.
+        """
+        if req.raw_body is not None:
+            flags = _STREAM_FLAGS if stream else _UNARY_FLAGS
+            return {"content": req.raw_body.patched(model=dumps(req.model), **flags), "headers": _JSON_HEADERS}
+        return {"content": dumps(self._payload(req, stream=stream)), "headers": _JSON_HEADERS}
+
+    def _payload(self, req: ChatRequest, *, stream: bool) -> dict[str, Any]:
         payload: dict[str, Any] = {
             "model": req.model,
             "messages": [
-                {"role": m.role, "content": _serialize_content(m.content)} for m in req.messages
+                {"role": m.role, "content": self._serialize_content(m.content)} for m in req.messages
             ],
         }
+        if stream:
+            payload["stream"] = True
+            # Always ask for the trailing usage chunk so streams are billed from real counts.
+            payload["stream_options"] = {"include_usage": True}
         if req.temperature is not None:
             payload["temperature"] = req.temperature
+        if req.max_tokens is not None:
+            payload["max_tokens"] = req.max_tokens
+        return payload
 
+    async def chat_completions(
+        self, req: ChatRequest, timeout_seconds: float | None = None
+    ) -> ChatResponse:
+        request_body = self._request_body(req, stream=False)
         timeout = (
             httpx.Timeout(timeout_seconds, connect=10.0) if timeout_seconds is not None else None
         )
-        try:
-            resp = await self._client.post(
-                "/chat/completions", json=payload, timeout=timeout
-            )
-        except httpx.TimeoutException as e:
-            log.exception("Qwen chat completion timed out: %s", _format_http_error(e))
-            raise gateway_timeout("Qwen chat completion timed out") from e
-        except httpx.HTTPError as e:
-            log.exception("Qwen chat completion failed: %s", _format_http_error(e))
-            raise bad_gateway("Qwen chat completion request failed") from e
-
-        if resp.status_code >= 400:
-            detail = _safe_text(resp.text)
-            if len(detail) > 500:
-                detail = detail[:500] + "…"
-            raise bad_gateway(f"Qwen returned {resp.status_code}: {detail}")
-
-        data = resp.json()
+        async with self._pool.acquire() as attempt:
+            try:
+                resp = await attempt.client.post(
+                    "/chat/completions", **request_body, timeout=timeout
+                )
+            except httpx.TimeoutException as e:
+                log.exception("Qwen chat completion timed out: %s", _format_http_error(e))
+                raise gateway_timeout("Qwen chat completion timed out") from e
+            except httpx.HTTPError as e:
+                log.exception("Qwen chat completion failed: %s", _format_http_error(e))
+                raise bad_gateway("Qwen chat completion request failed") from e
+
+            attempt.upstream_status = resp.status_code
+            if resp.status_code >= 400:
+                detail = _safe_text(resp.text)
+                if len(detail) > 500:
+                    detail = detail[:500] + "…"
+                raise bad_gateway(f"Qwen returned {resp.status_code}: {detail}", upstream_status=resp.status_code)
+
+        data = loads(resp.content)
         usage = data.get("usage") or {}
         out_usage = Usage(
             prompt_tokens=usage.get("prompt_tokens"),
@@ -141,7 +212,7 @@ class QwenAdapter(ProviderAdapter):
             )
 
         if not choices:
-            raise bad_gateway(f"Qwen returned no choices: {json.dumps(data)[:500]}")
+            raise bad_gateway(f"Qwen returned no choices: {dumps_str(data)[:500]}")
 
         response_id = _safe_text(data.get("id")) or f"chatcmpl_{uuid4().hex}"
         created = int(data.get("created") or int(datetime.now(tz=timezone.utc).timestamp()))
@@ -154,46 +225,41 @@ class QwenAdapter(ProviderAdapter):
             usage=out_usage,
         )
 
+    @staticmethod
+    def _relay_event(event: list[bytes], prefix: bytes) -> bytes:
+        if len(event) == 1 and event[0].strip() == DONE:
+            return b"data: [DONE]\n"
+        if len(event) == 1:
+            return encode_event([rewrite_model(event[0], prefix)])
+        # Multi-line data: JSON allows the line breaks as whitespace, so rewrite the joined payload.
+        return encode_event(rewrite_model(b"\n".join(event), prefix).split(b"\n"))
+
     async def stream_chat_completions(
         self, req: ChatRequest, timeout_seconds: float | None = None
     ) -> AsyncIterator[bytes]:
-        payload: dict[str, Any] = {
-            "model": req.model,
-            "messages": [
-                {"role": m.role, "content": self._serialize_content(m.content)} for m in req.messages
-            ],
-            "stream": True,
-        }
-        if req.temperature is not None:
-            payload["temperature"] = req.temperature
-
+        request_body = self._request_body(req, stream=True)
         timeout = (
             httpx.Timeout(timeout_seconds, connect=10.0) if timeout_seconds is not None else None
         )
         try:
-            async with self._client.stream(
-                "POST", "/chat/completions", json=payload, timeout=timeout
+            async with self._pool.acquire() as attempt, attempt.client.stream(
+                "POST", "/chat/completions", **request_body, timeout=timeout
             ) as resp:
+                attempt.first_byte()
+                attempt.upstream_status = resp.status_code
                 if resp.status_code >= 400:
                     body = await resp.aread()
                     detail = body.decode("utf-8", errors="replace")[:500]
-                    raise bad_gateway(f"Qwen returned {resp.status_code}: {detail}")
-
-                async for line in resp.aiter_lines():
-                    if not line.startswith("data: "):
-                        continue
-                    data_part = line[6:]
-                    if data_part.strip() == "[DONE]":
-                        yield b"data: [DONE]\n"
-                        continue
-                    try:
-                        obj = json.loads(data_part)
-                    except json.JSONDecodeError:
-                        yield (line + "\n").encode("utf-8")
-                        continue
-                    if "model" in obj and obj["model"]:
-                        obj["model"] = f"{self.name}:{obj['model']}"
-                    yield ("data: " + json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+                    raise bad_gateway(f"Qwen returned {resp.status_code}: {detail}", upstream_status=resp.status_code)
+
+                # Relay events as bytes: only the model field is rewritten, nothing is re-serialized.
+                parser = SSEParser()
+                prefix = f"{self.name}:".encode("utf-8")
+                async for raw in resp.aiter_bytes():
+                    for event in parser.feed(raw):
+                        yield self._relay_event(event, prefix)
+                for event in parser.close():
+                    yield self._relay_event(event, prefix)
         except httpx.TimeoutException as e:
             log.exception("Qwen streaming timed out: %s", _format_http_error(e))
             raise gateway_timeout("Qwen streaming timed out") from e
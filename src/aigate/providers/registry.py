@@ -1,10 +1,15 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
 from dataclasses import dataclass, field
 
 from aigate.domain.models import ModelInfo
 from aigate.providers.base import ProviderAdapter
 
+log = logging.getLogger(__name__)
+
 
 @dataclass
 class ProviderRegistry:
@@ -24,3 +29,25 @@ class ProviderRegistry:
         for adapter in self._providers.values():
             items.extend(await adapter.list_models())
         return items
+
+    async def warmup(self, timeout_seconds: float) -> None:
+        """Warm every adapter concurrently; a slow or failing provider never blocks startup."""
+        await self._each("warmup", lambda a: asyncio.wait_for(a.warmup(), timeout_seconds))
+
+    def health(self) -> dict[str, bool]:
+        return {name: self._providers[name].healthy() for name in self.list_providers()}
+
+    async def drain(self, timeout_seconds: float) -> None:
+        await self._each("drain", lambda a: a.drain(timeout_seconds))
+
+    async def aclose(self) -> None:
+        await self._each("aclose", lambda a: a.aclose())
+
+    async def _each(self, hook: str, call: Callable[[ProviderAdapter], Awaitable[None]]) -> None:
+        adapters = list(self._providers.values())
+        results = await asyncio.gather(*(call(a) for a in adapters), return_exceptions=True)
+        for adapter, result in zip(adapters, results):
+            if isinstance(result, BaseException):
+                log.warning(
+                    "provider.hook_failed", extra={"provider": adapter.name, "hook": hook, "error": repr(result)}
+                )
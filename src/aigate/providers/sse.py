@@ -0,0 +1,140 @@
+"""Byte-level SSE relay: incremental event parsing and in-place `model` rewrite, no JSON round trip."""
+
+from __future__ import annotations
+
+import re
+from typing import Any
+
+from aigate.core.jsoncodec import dumps, loads
+
+DONE = b"[DONE]"
+_MODEL_KEY = b'"model":'
+# Longest model id we rewrite in place; anything else takes the JSON slow path.
+_MAX_MODEL_VALUE = 256
+# A usage object, not the "usage":null DashScope sends on every delta.
+_USAGE_OBJECT = re.compile(rb'"usage"\s*:\s*\{')
+
+
+class SSEParser:
+    """
+    Incremental parser over arbitrary byte chunks (aiter_bytes). Returns each complete event as its
+    list of `data:` payloads; multi-line events keep one payload per line. Other fields and comments
+    are dropped, as the relay only forwards data.
+    """
+
+    def __init__(self) -> None:
+        self._buf = b""
+        self._data: list[bytes] = []
+
+    def feed(self, chunk: bytes) -> list[list[bytes]]:
+        events: list[list[bytes]] = []
+        buf = self._buf + chunk if self._buf else chunk
+        start = 0
+        while True:
+            end = buf.find(b"\n", start)
+            if end < 0:
+                break
+            line = buf[start:end]
+            start = end + 1
+            if line.endswith(b"\r"):
+                line = line[:-1]
+            self._line(line, events)
+        self._buf = buf[start:]
+        return events
+
+    def close(self) -> list[list[bytes]]:
+        """Flush a trailing line/event the upstream ended without a blank line."""
+        events: list[list[bytes]] = []
+        if self._buf:
+            line, self._buf = self._buf.rstrip(b"\r"), b""
+            self._line(line, events)
+        if self._data:
+            events.append(self._data)
+            self._data = []
+        return events
+
+    def _line(self, line: bytes, events: list[list[bytes]]) -> None:
+        if not line:
+            if self._data:
+                events.append(self._data)
+                self._data = []
+            return
+        if line.startswith(b"data:"):
+            value = line[5:]
+            if value.startswith(b" "):
+                value = value[1:]
+            self._data.append(value)
+
+
+def rewrite_model(data: bytes, prefix: bytes) -> bytes:
+    """
+    Prefix the top-level "model" value (e.g. b"qwen:") without parsing the rest of the payload.
+    A JSON key `"model":` cannot occur unescaped inside a string, so the first match is the field.
+    Escaped or oversized values fall back to a JSON round trip; non-JSON payloads pass through.
+    """
+    idx = data.find(_MODEL_KEY)
+    if idx < 0:
+        return data
+    pos = idx + len(_MODEL_KEY)
+    while pos < len(data) and data[pos] in b" \t":
+        pos += 1
+    if pos >= len(data) or data[pos] != 0x22:  # '"': null / non-string model is left alone
+        return data
+    end = data.find(b'"', pos + 1, pos + 2 + _MAX_MODEL_VALUE)
+    if end < 0 or b"\\" in data[pos + 1 : end]:
+        return _rewrite_model_slow(data, prefix)
+    if end == pos + 1:
+        return data  # empty model
+    return data[: pos + 1] + prefix + data[pos + 1 :]
+
+
+def _rewrite_model_slow(data: bytes, prefix: bytes) -> bytes:
+    try:
+        obj = loads(data)
+    except ValueError:
+        return data
+    if isinstance(obj, dict) and obj.get("model"):
+        obj["model"] = prefix.decode("utf-8") + str(obj["model"])
+        return dumps(obj)
+    return data
+
+
+def encode_event(data: list[bytes]) -> bytes:
+    return b"".join(b"data: " + line + b"\n" for line in data)
+
+
+def _event_json(chunk: bytes) -> Any:
+    payload = b"\n".join(line[6:] for line in chunk.split(b"\n") if line.startswith(b"data: "))
+    if not payload or payload == DONE:
+        return None
+    try:
+        return loads(payload)
+    except ValueError:
+        return None
+
+
+def find_usage(chunk: bytes) -> tuple[dict[str, Any] | None, bool]:
+    """
+    Return (usage, usage_only) for one relayed event. Only events carrying a usage object are
+    parsed (a regex pre-check skips deltas and "usage":null); usage_only marks the trailing
+    stream_options.include_usage chunk, which has no choices.
+    """
+    if _USAGE_OBJECT.search(chunk) is None:
+        return (None, False)
+    obj = _event_json(chunk)
+    if not isinstance(obj, dict) or not isinstance(obj.get("usage"), dict):
+        return (None, False)
+    return (obj["usage"], not obj.get("choices"))
+
+
+def delta_text(chunk: bytes) -> str:
+    """Concatenated choices[].delta.content of one relayed event (for local token estimates)."""
+    obj = _event_json(chunk)
+    if not isinstance(obj, dict):
+        return ""
+    parts = []
+    for choice in obj.get("choices") or []:
+        content = (choice.get("delta") or {}).get("content") if isinstance(choice, dict) else None
+        if isinstance(content, str):
+            parts.append(content)
+    return "".join(parts)
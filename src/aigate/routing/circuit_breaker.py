@@ -0,0 +1,221 @@
+"""Per provider/model circuit breakers: fail fast while an upstream is degraded, probe it back in."""
+
+from __future__ import annotations
+
+import logging
+import math
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import Literal
+
+from fastapi import HTTPException
+
+from aigate.core.errors import service_unavailable
+from aigate.core.metrics import aigate_circuit_breaker_rejections_total, aigate_circuit_breaker_state
+
+log = logging.getLogger(__name__)
+
+State = Literal["closed", "open", "half_open"]
+Outcome = Literal["success", "error", "timeout"]
+_STATE_VALUE: dict[State, int] = {"closed": 0, "half_open": 1, "open": 2}
+_BUCKETS = 10
+
+
+def classify(exc: BaseException) -> Outcome | None:
+    """
+    Upstream timeouts and 5xx/429 count against the upstream; client errors (upstream 4xx) do not.
+    None: the gateway itself refused the call (503 from an open circuit or load shedding).
+    """
+    status = getattr(exc, "status_code", 500)
+    if status == 503:
+        return None
+    if status == 504:
+        return "timeout"
+    upstream_status = getattr(exc, "upstream_status", None)
+    if upstream_status is not None:
+        return "error" if upstream_status >= 500 or upstream_status == 429 else "success"
+    return "error" if status >= 500 else "success"
+
+
+class _RollingWindow:
+    """Outcome counts over the last `seconds`, in fixed buckets so old results age out cheaply."""
+
+    def __init__(self, seconds: float) -> None:
+        self._width = seconds / _BUCKETS
+        self._buckets: deque[list[int]] = deque()  # [bucket index, total, errors, timeouts]
+
+    def add(self, now: float, outcome: Outcome) -> None:
+        index = int(now // self._width)
+        self._prune(index)
+        if not self._buckets or self._buckets[-1][0] != index:
+            self._buckets.append([index, 0, 0, 0])
+        bucket = self._buckets[-1]
+        bucket[1] += 1
+        if outcome == "error":
+            bucket[2] += 1
+        elif outcome == "timeout":
+            bucket[3] += 1
+
+    def counts(self, now: float) -> tuple[int, int, int]:
+        self._prune(int(now // self._width))
+        return (
+            sum(b[1] for b in self._buckets),
+            sum(b[2] for b in self._buckets),
+            sum(b[3] for b in self._buckets),
+        )
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+    def _prune(self, index: int) -> None:
+        while self._buckets and self._buckets[0][0] <= index - _BUCKETS:
+            self._buckets.popleft()
+
+
+class CircuitBreaker:
+    """
+    closed     calls pass; trips to open once the window has min_requests and the error or
+               timeout rate reaches its threshold;
+    open       calls fail fast with 503 + Retry-After for open_seconds;
+    half_open  up to half_open_probes calls pass at a time; that many successes close the
+               breaker, any failure opens it again.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        model: str,
+        *,
+        window_seconds: float,
+        min_requests: int,
+        error_rate: float,
+        timeout_rate: float,
+        open_seconds: float,
+        half_open_probes: int,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.provider = provider
+        self.model = model
+        self._window = _RollingWindow(window_seconds)
+        self._min_requests = min_requests
+        self._error_rate = error_rate
+        self._timeout_rate = timeout_rate
+        self._open_seconds = open_seconds
+        self._half_open_probes = half_open_probes
+        self._clock = clock
+        self._state: State = "closed"
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        aigate_circuit_breaker_state.labels(provider=provider, model=model).set(0)
+
+    @property
+    def state(self) -> State:
+        if self._state == "open" and self._clock() - self._opened_at >= self._open_seconds:
+            self._transition("half_open")
+        return self._state
+
+    def admits(self) -> bool:
+        """Whether a call would pass right now (without taking a probe slot)."""
+        state = self.state
+        return state == "closed" or (state == "half_open" and self._probes_in_flight < self._half_open_probes)
+
+    def rejection(self) -> HTTPException:
+        retry_after = 1
+        if self._state == "open":
+            retry_after = max(1, math.ceil(self._open_seconds - (self._clock() - self._opened_at)))
+        return service_unavailable(
+            f"{self.provider}:{self.model} is temporarily unavailable (circuit open)",
+            retry_after_seconds=retry_after,
+        )
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """Wrap one upstream call; raises 503 instead of calling while the breaker rejects."""
+        if not self.admits():
+            aigate_circuit_breaker_rejections_total.labels(provider=self.provider, model=self.model).inc()
+            raise self.rejection()
+        probe = self._state == "half_open"
+        if probe:
+            self._probes_in_flight += 1
+        outcome: Outcome | None = None
+        try:
+            yield
+            outcome = "success"
+        except Exception as e:
+            outcome = classify(e)
+            raise
+        finally:
+            # No verdict when the call was cancelled (client gone, hedge lost) or shed by the gateway.
+            if probe:
+                self._probes_in_flight -= 1
+            if outcome is not None:
+                self._record(outcome, probe=probe)
+
+    def snapshot(self) -> dict[str, object]:
+        now = self._clock()
+        total, errors, timeouts = self._window.counts(now)
+        return {
+            "provider": self.provider,
+            "model": self.model,
+            "state": self.state,
+            "window_requests": total,
+            "window_errors": errors,
+            "window_timeouts": timeouts,
+            "probes_in_flight": self._probes_in_flight,
+            "open_for_seconds": round(now - self._opened_at, 3) if self._state == "open" else None,
+        }
+
+    def _record(self, outcome: Outcome, *, probe: bool) -> None:
+        now = self._clock()
+        if self._state == "half_open" and probe:
+            if outcome != "success":
+                self._open(now)
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self._half_open_probes:
+                self._window.clear()
+                self._transition("closed")
+            return
+        if self._state != "closed":
+            return  # late result of a call admitted before the breaker opened
+        self._window.add(now, outcome)
+        total, errors, timeouts = self._window.counts(now)
+        if total >= self._min_requests and (
+            errors / total >= self._error_rate or timeouts / total >= self._timeout_rate
+        ):
+            self._open(now)
+
+    def _open(self, now: float) -> None:
+        self._opened_at = now
+        self._transition("open")
+
+    def _transition(self, state: State) -> None:
+        self._state = state
+        self._probe_successes = 0
+        aigate_circuit_breaker_state.labels(provider=self.provider, model=self.model).set(_STATE_VALUE[state])
+        log.warning(
+            "circuit_breaker.transition",
+            extra={"provider": self.provider, "model": self.model, "state": state},
+        )
+
+
+class CircuitBreakers:
+    """Lazily created breakers, one per "provider:model"."""
+
+    def __init__(self, **options: object) -> None:
+        self._options = options
+        self._breakers: dict[tuple[str, str], CircuitBreaker] = {}
+
+    def get(self, provider: str, model: str) -> CircuitBreaker:
+        key = (provider, model)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(provider, model, **self._options)  # type: ignore[arg-type]
+            self._breakers[key] = breaker
+        return breaker
+
+    def snapshot(self) -> list[dict[str, object]]:
+        return [b.snapshot() for _, b in sorted(self._breakers.items())]
@@ -0,0 +1,246 @@
+"""Adaptive per-provider concurrency limit (AIMD) with a deadline-aware, weighted fair wait queue."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+
+from aigate.core.errors import service_unavailable
+from aigate.core.metrics import (
+    aigate_upstream_concurrency_limit,
+    aigate_upstream_in_flight,
+    aigate_upstream_queue_depth,
+    aigate_upstream_queue_wait_seconds,
+    aigate_upstream_shed_total,
+)
+from aigate.domain.chat import ChatRequest, ChatResponse
+from aigate.domain.models import ModelInfo
+from aigate.providers.base import ProviderAdapter
+from aigate.routing.circuit_breaker import classify
+from aigate.routing.fair_queue import FairQueue, QueueEntry, current_admission
+
+log = logging.getLogger(__name__)
+
+
+class Slot:
+    """
+    One admitted call. Unary calls report seconds per completion token as the latency signal;
+    streams call first_byte() so their expected duration is time to first byte, not stream length.
+    """
+
+    def __init__(self, clock: Callable[[], float], stream: bool = False) -> None:
+        self.stream = stream
+        self.latency_per_token: float | None = None
+        self.first_byte_at: float | None = None
+        self._clock = clock
+
+    def first_byte(self) -> None:
+        if self.first_byte_at is None:
+            self.first_byte_at = self._clock()
+
+
+class AdaptiveLimiter:
+    """
+    AIMD over in-flight upstream calls:
+      - 429/5xx/timeouts, or per-token latency above `tolerance` x the learned baseline,
+        cut the limit by `backoff` (at most once per cooldown, so one burst of failures is one cut);
+      - other completions while the limit is saturated raise it by 1/limit (about +1 per limit calls).
+    Calls above the limit wait in a weighted fair queue across flows (org + priority, see
+    fair_queue) until their deadline minus the expected call time (tracked separately for unary
+    calls and for streams, where it is time to first byte); a call that cannot start in
+    time is shed with 503 instead of timing out upstream, and one whose deadline passed while it
+    waited is dropped when its turn comes instead of taking the freed slot.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        *,
+        initial_limit: int = 50,
+        min_limit: int = 4,
+        max_limit: int = 500,
+        backoff: float = 0.9,
+        tolerance: float = 2.0,
+        max_queue: int = 1000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.provider = provider
+        self._limit = float(initial_limit)
+        self._min = min_limit
+        self._max = max_limit
+        self._backoff = backoff
+        self._tolerance = tolerance
+        self._max_queue = max_queue
+        self._clock = clock
+        self._in_flight = 0
+        self._waiters = FairQueue()
+        self._baseline: float | None = None  # seconds per completion token, near the unloaded minimum
+        # EWMA of call duration (streams: time to first byte), per kind, used for the shed decision.
+        self._call_seconds: dict[bool, float] = {}
+        self._last_decrease = float("-inf")
+        self._publish()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    @asynccontextmanager
+    async def acquire(self, timeout_seconds: float | None = None, *, stream: bool = False) -> AsyncIterator[Slot]:
+        """Hold a slot for one upstream call or stream; queueing gives up once timeout_seconds cannot be met."""
+        await self._admit(self._clock() + timeout_seconds if timeout_seconds is not None else None, stream)
+        slot = Slot(self._clock, stream)
+        started = self._clock()
+        failed = False
+        try:
+            yield slot
+        except Exception as e:
+            failed = classify(e) in ("error", "timeout")
+            raise
+        finally:
+            ended = slot.first_byte_at if slot.first_byte_at is not None else self._clock()
+            self._on_done(slot, ended - started, failed)
+
+    def _expected_seconds(self, stream: bool) -> float:
+        return self._call_seconds.get(stream, 0.0)
+
+    async def _admit(self, deadline: float | None, stream: bool = False) -> None:
+        admission = current_admission()
+        if not self._waiters and self._in_flight < self.limit:
+            self._in_flight += 1
+            self._publish()
+            aigate_upstream_queue_wait_seconds.labels(provider=self.provider, priority=admission.priority).observe(0)
+            return
+        budget = None
+        if deadline is not None:
+            budget = deadline - self._clock() - self._expected_seconds(stream)
+            if budget <= 0:
+                self._shed("deadline")
+        if len(self._waiters) >= self._max_queue:
+            self._shed("queue_full")
+
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        entry = self._waiters.push(waiter, admission, deadline, self._clock(), stream=stream)
+        self._publish()
+        try:
+            await asyncio.wait_for(waiter, timeout=budget)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                self._release()  # the slot was handed over just as we gave up
+            else:
+                self._waiters.remove(entry)
+                self._publish()
+            if isinstance(e, asyncio.TimeoutError):
+                self._shed("deadline")
+            raise
+
+    def _shed_error(self, reason: str) -> HTTPException:
+        aigate_upstream_shed_total.labels(provider=self.provider, reason=reason).inc()
+        return service_unavailable(f"{self.provider} is overloaded, request shed ({reason})", retry_after_seconds=1)
+
+    def _shed(self, reason: str) -> None:
+        raise self._shed_error(reason)
+
+    def _on_done(self, slot: Slot, seconds: float, failed: bool) -> None:
+        if not failed:
+            previous = self._call_seconds.get(slot.stream)
+            self._call_seconds[slot.stream] = seconds if previous is None else 0.8 * previous + 0.2 * seconds
+        latency_per_token = slot.latency_per_token
+        slow = False
+        if latency_per_token is not None and not failed:
+            if self._baseline is None or latency_per_token < self._baseline:
+                self._baseline = latency_per_token
+            else:
+                # Drift up slowly so a model that got permanently slower re-learns its baseline.
+                self._baseline += (latency_per_token - self._baseline) * 0.01
+            slow = latency_per_token > self._baseline * self._tolerance
+        now = self._clock()
+        if failed or slow:
+            cooldown = self._expected_seconds(slot.stream) or 1.0
+            if now - self._last_decrease >= cooldown:
+                self._last_decrease = now
+                self._limit = max(self._min, self._limit * self._backoff)
+                log.info(
+                    "upstream.concurrency_decrease",
+                    extra={"provider": self.provider, "limit": self.limit, "failed": failed},
+                )
+        elif self._in_flight >= self.limit:
+            self._limit = min(self._max, self._limit + 1.0 / self._limit)
+        self._release()
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        while self._waiters and self._in_flight < self.limit:
+            entry = self._waiters.pop()
+            if entry is None or entry.waiter.done():
+                continue
+            if self._expired(entry):
+                entry.waiter.set_exception(self._shed_error("expired"))
+                continue
+            self._in_flight += 1
+            entry.waiter.set_result(None)
+            aigate_upstream_queue_wait_seconds.labels(
+                provider=self.provider, priority=entry.admission.priority
+            ).observe(self._clock() - entry.enqueued_at)
+        self._publish()
+
+    def _expired(self, entry: QueueEntry) -> bool:
+        """The call can no longer finish before its deadline: do not spend upstream capacity on it."""
+        return entry.deadline is not None and entry.deadline - self._clock() <= self._expected_seconds(entry.stream)
+
+    def _publish(self) -> None:
+        aigate_upstream_concurrency_limit.labels(provider=self.provider).set(self.limit)
+        aigate_upstream_in_flight.labels(provider=self.provider).set(self._in_flight)
+        aigate_upstream_queue_depth.labels(provider=self.provider).set(len(self._waiters))
+
+
+class ConcurrencyLimitedAdapter(ProviderAdapter):
+    """Wraps a provider adapter so every chat call holds a slot of the provider's AdaptiveLimiter."""
+
+    def __init__(self, inner: ProviderAdapter, limiter: AdaptiveLimiter) -> None:
+        self.name = inner.name
+        self._inner = inner
+        self._limiter = limiter
+
+    async def warmup(self) -> None:
+        await self._inner.warmup()
+
+    def healthy(self) -> bool:
+        return self._inner.healthy()
+
+    async def drain(self, timeout_seconds: float) -> None:
+        await self._inner.drain(timeout_seconds)
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+    async def list_models(self) -> list[ModelInfo]:
+        return await self._inner.list_models()
+
+    async def chat_completions(self, req: ChatRequest, timeout_seconds: float | None = None) -> ChatResponse:
+        async with self._limiter.acquire(timeout_seconds) as slot:
+            started = time.monotonic()
+            resp = await self._inner.chat_completions(req, timeout_seconds=timeout_seconds)
+            if resp.usage is not None and resp.usage.completion_tokens:
+                slot.latency_per_token = (time.monotonic() - started) / resp.usage.completion_tokens
+            return resp
+
+    async def stream_chat_completions(
+        self, req: ChatRequest, timeout_seconds: float | None = None
+    ) -> AsyncIterator[bytes]:
+        async with self._limiter.acquire(timeout_seconds, stream=True) as slot:
+            async for chunk in self._inner.stream_chat_completions(req, timeout_seconds=timeout_seconds):
+                slot.first_byte()
+                yield chunk
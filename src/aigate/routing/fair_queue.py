@@ -0,0 +1,135 @@
+"""
+Weighted fair queuing of requests waiting for upstream capacity.
+
+Each flow (org + priority) gets a share of the freed slots proportional to its weight, so one noisy
+org cannot push every other tenant's wait up. Start-time fair queuing: a request's tag is
+max(virtual time, its flow's last finish tag), the flow's finish tag advances by 1 / weight, and
+the smallest tag is served next; the virtual time is the tag last served.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Literal
+
+Priority = Literal["interactive", "batch"]
+
+
+@dataclass(frozen=True)
+class Admission:
+    """Who is asking for upstream capacity; set per request by the API layer."""
+
+    flow: str
+    weight: float = 1.0
+    priority: Priority = "interactive"
+
+
+DEFAULT_ADMISSION = Admission(flow="")
+
+# Per-request context: the adapter interface carries no tenant, so the API sets it here and the
+# concurrency limiter reads it when a call has to queue.
+_admission: ContextVar[Admission] = ContextVar("aigate_admission", default=DEFAULT_ADMISSION)
+
+
+def set_admission(admission: Admission) -> None:
+    _admission.set(admission)
+
+
+def current_admission() -> Admission:
+    return _admission.get()
+
+
+def parse_priority(header: str | None) -> Priority:
+    """X-Priority: "batch" for throughput traffic; anything else is interactive."""
+    return "batch" if (header or "").strip().lower() == "batch" else "interactive"
+
+
+def parse_weights(spec: str | None) -> dict[str, float]:
+    """Parse "name=weight,..." (e.g. FAIR_QUEUE_TIER_WEIGHTS)."""
+    out: dict[str, float] = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        name, weight = (p.strip() for p in item.split("=", 1))
+        if name and weight:
+            out[name] = float(weight)
+    return out
+
+
+def admission_for(
+    org_id: str,
+    tier: str,
+    priority: Priority,
+    *,
+    tier_weights: dict[str, float],
+    batch_weight: float,
+) -> Admission:
+    weight = tier_weights.get(tier, 1.0) * (batch_weight if priority == "batch" else 1.0)
+    return Admission(flow=f"{org_id}:{priority}", weight=weight, priority=priority)
+
+
+@dataclass(order=True)
+class QueueEntry:
+    tag: float
+    seq: int
+    waiter: asyncio.Future[None] = field(compare=False)
+    admission: Admission = field(compare=False)
+    deadline: float | None = field(compare=False)  # clock time the call must finish by
+    enqueued_at: float = field(compare=False)
+    stream: bool = field(default=False, compare=False)  # deadline covers time to first byte, not the whole call
+    removed: bool = field(default=False, compare=False)  # cancelled or already popped
+
+
+class FairQueue:
+    """Waiters ordered by start-time fair queuing tags; removal is lazy (skipped on pop)."""
+
+    def __init__(self) -> None:
+        self._heap: list[QueueEntry] = []
+        self._seq = itertools.count()
+        self._virtual = 0.0
+        self._finish: dict[str, float] = {}
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def push(
+        self,
+        waiter: asyncio.Future[None],
+        admission: Admission,
+        deadline: float | None,
+        now: float,
+        *,
+        stream: bool = False,
+    ) -> QueueEntry:
+        start = max(self._virtual, self._finish.get(admission.flow, 0.0))
+        self._finish[admission.flow] = start + 1.0 / max(admission.weight, 1e-6)
+        entry = QueueEntry(start, next(self._seq), waiter, admission, deadline, now, stream)
+        heapq.heappush(self._heap, entry)
+        self._len += 1
+        return entry
+
+    def pop(self) -> QueueEntry | None:
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            if entry.removed:
+                continue
+            entry.removed = True  # out of the queue: a later remove() is a no-op
+            self._len -= 1
+            self._virtual = entry.tag
+            if not self._len:
+                # Idle: forget per-flow history so the flow table does not grow without bound.
+                self._heap.clear()
+                self._finish.clear()
+                self._virtual = 0.0
+            return entry
+        return None
+
+    def remove(self, entry: QueueEntry) -> None:
+        if not entry.removed:
+            entry.removed = True
+            self._len -= 1
@@ -0,0 +1,144 @@
+"""Hedged unary calls: if the first attempt is slow, race a second one and keep whichever finishes first."""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+
+from aigate.core.metrics import aigate_hedge_requests_total
+from aigate.domain.chat import ChatResponse
+
+_MIN_SAMPLES = 20
+
+
+class LatencyWindow:
+    """Recent successful latencies for one model; p95 is recomputed every few observations."""
+
+    def __init__(self, size: int = 200, recompute_every: int = 10) -> None:
+        self._samples: deque[float] = deque(maxlen=size)
+        self._recompute_every = recompute_every
+        self._since_recompute = 0
+        self._p95: float | None = None
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self._since_recompute += 1
+        if self._since_recompute >= self._recompute_every and len(self._samples) >= _MIN_SAMPLES:
+            ordered = sorted(self._samples)
+            self._p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            self._since_recompute = 0
+
+    @property
+    def p95(self) -> float | None:
+        return self._p95
+
+
+class HedgeBudget:
+    """Each primary request earns `ratio` of a hedge; a hedge spends one. Caps extra traffic at ~ratio."""
+
+    def __init__(self, ratio: float, max_tokens: float = 10.0) -> None:
+        self._ratio = ratio
+        self._max = max_tokens
+        self._tokens = 0.0
+
+    def deposit(self) -> None:
+        self._tokens = min(self._max, self._tokens + self._ratio)
+
+    def try_spend(self) -> bool:
+        if self._tokens < 1.0:
+            return False
+        self._tokens -= 1.0
+        return True
+
+
+class Hedger:
+    """
+    Hedging policy for unary completions. A model is hedged when listed in `models` ("*" for all)
+    or when the request asks for it with X-Hedge. The hedge fires after `delay_seconds`, or after the
+    model's observed p95 when no fixed delay is configured.
+    """
+
+    def __init__(
+        self,
+        *,
+        models: set[str],
+        delay_seconds: float | None,
+        min_delay_seconds: float,
+        budget_ratio: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._models = models
+        self._delay = delay_seconds
+        self._min_delay = min_delay_seconds
+        self._budget = HedgeBudget(budget_ratio)
+        self._clock = clock
+        self._latency: dict[str, LatencyWindow] = {}
+
+    def delay_for(self, model: str, header: str | None) -> float | None:
+        """Hedge delay (seconds) for this request, or None to call upstream once."""
+        value = (header or "").strip().lower()
+        if value in ("off", "0", "false", "no"):
+            return None
+        if value and value not in ("on", "1", "true", "yes"):
+            try:
+                return max(self._min_delay, float(value) / 1000.0)  # X-Hedge: <delay ms>
+            except ValueError:
+                return None
+        if not value and "*" not in self._models and model not in self._models:
+            return None
+        if self._delay is not None:
+            return self._delay
+        window = self._latency.get(model)
+        p95 = window.p95 if window is not None else None
+        # Until the window has a p95, run unhedged but keep observing (infinite delay).
+        return max(self._min_delay, p95) if p95 is not None else math.inf
+
+    async def run(
+        self,
+        model: str,
+        delay: float,
+        primary: Callable[[], Awaitable[ChatResponse]],
+        hedge: Callable[[], Awaitable[ChatResponse]],
+    ) -> ChatResponse:
+        """Return the first successful response; the other attempt is cancelled (and never billed)."""
+        self._budget.deposit()
+        started = self._clock()
+        first = asyncio.create_task(primary())
+        tasks = [first]
+        try:
+            # An infinite delay (p95 still warming up) just observes the single attempt.
+            done, _ = await asyncio.wait({first}, timeout=None if math.isinf(delay) else delay)
+            if done:
+                return self._finish(model, first, started)
+            if not self._budget.try_spend():
+                aigate_hedge_requests_total.labels(model=model, outcome="budget_exhausted").inc()
+                await first
+                return self._finish(model, first, started)
+
+            aigate_hedge_requests_total.labels(model=model, outcome="fired").inc()
+            hedge_started = self._clock()
+            second = asyncio.create_task(hedge())
+            tasks.append(second)
+            pending: set[asyncio.Task] = {first, second}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            aigate_hedge_requests_total.labels(model=model, outcome="won").inc()
+                            return self._finish(model, task, hedge_started)
+                        return self._finish(model, task, started)
+            # Both attempts failed: surface the primary's error.
+            raise first.exception()  # type: ignore[misc]
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def _finish(self, model: str, task: asyncio.Task, started: float) -> ChatResponse:
+        resp = task.result()
+        self._latency.setdefault(model, LatencyWindow()).observe(self._clock() - started)
+        return resp
@@ -7,6 +7,8 @@ from dataclasses import dataclass
 from aigate.core.errors import bad_request
 from aigate.domain.chat import ChatRequest, ChatResponse
 from aigate.providers.registry import ProviderRegistry
+from aigate.routing.circuit_breaker import CircuitBreaker, CircuitBreakers
+from aigate.routing.hedging import Hedger
 
 log = logging.getLogger(__name__)
 
@@ -29,8 +31,60 @@ def parse_explicit_model(model: str) -> RoutedTarget:
     return RoutedTarget(provider=provider, provider_model=provider_model)
 
 
+def parse_model_fallbacks(spec: str | None) -> dict[str, str]:
+    """Parse "provider:model=provider:fallback,..." (e.g. MODEL_FALLBACKS)."""
+    out: dict[str, str] = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        model, fallback = (p.strip() for p in item.split("=", 1))
+        if model and fallback:
+            if ":" not in fallback:
+                raise ValueError(f'Fallback must be "provider:model_id": {item}')
+            out[model] = fallback
+    return out
+
+
 async def route_and_call(
-    registry: ProviderRegistry, req: ChatRequest, timeout_seconds: float | None = None
+    registry: ProviderRegistry,
+    req: ChatRequest,
+    timeout_seconds: float | None = None,
+    *,
+    hedger: Hedger | None = None,
+    hedge_delay: float | None = None,
+    fallback_model: str | None = None,
+    breakers: CircuitBreakers | None = None,
+) -> ChatResponse:
+    """
+    Call the provider for req.model. With a hedger and hedge_delay, a second attempt (to fallback_model
+    if given, otherwise the same model on whichever endpoint the pool picks) races a slow first one.
+    While req.model's circuit is open, the call goes to fallback_model instead (or fails fast with 503).
+    """
+    if breakers is not None and fallback_model and not _breaker(breakers, req.model).admits():
+        if _breaker(breakers, fallback_model).admits():
+            log.warning("Circuit open for %s, routing to %s", req.model, fallback_model)
+            req, fallback_model = req.model_copy(update={"model": fallback_model}), None
+    if hedger is None or hedge_delay is None:
+        return await _call_once(registry, req, timeout_seconds, breakers)
+    hedge_req = req.model_copy(update={"model": fallback_model}) if fallback_model else req
+    return await hedger.run(
+        req.model,
+        hedge_delay,
+        lambda: _call_once(registry, req, timeout_seconds, breakers),
+        lambda: _call_once(registry, hedge_req, timeout_seconds, breakers),
+    )
+
+
+def _breaker(breakers: CircuitBreakers, model: str) -> CircuitBreaker:
+    target = parse_explicit_model(model)
+    return breakers.get(target.provider, target.provider_model)
+
+
+async def _call_once(
+    registry: ProviderRegistry,
+    req: ChatRequest,
+    timeout_seconds: float | None,
+    breakers: CircuitBreakers | None = None,
 ) -> ChatResponse:
     target = parse_explicit_model(req.model)
     try:
@@ -40,12 +94,20 @@ async def route_and_call(
         raise bad_request(f"Unknown provider: {target.provider}") from e
 
     provider_req = req.model_copy(update={"model": target.provider_model})
-    resp = await adapter.chat_completions(provider_req, timeout_seconds=timeout_seconds)
+    if breakers is None:
+        resp = await adapter.chat_completions(provider_req, timeout_seconds=timeout_seconds)
+    else:
+        with breakers.get(target.provider, target.provider_model).guard():
+            resp = await adapter.chat_completions(provider_req, timeout_seconds=timeout_seconds)
     return resp.model_copy(update={"model": f"{target.provider}:{target.provider_model}"})
 
 
 async def route_and_stream(
-    registry: ProviderRegistry, req: ChatRequest, timeout_seconds: float | None = None
+    registry: ProviderRegistry,
+    req: ChatRequest,
+    timeout_seconds: float | None = None,
+    *,
+    breakers: CircuitBreakers | None = None,
 ) -> AsyncIterator[bytes]:
     """Stream chat completions from the appropriate provider. Model prefix is applied by adapter."""
     target = parse_explicit_model(req.model)
@@ -56,7 +118,11 @@ async def route_and_stream(
         raise bad_request(f"Unknown provider: {target.provider}") from e
 
     provider_req = req.model_copy(update={"model": target.provider_model})
-    async for chunk in adapter.stream_chat_completions(
-        provider_req, timeout_seconds=timeout_seconds
-    ):
-        yield chunk
+    chunks = adapter.stream_chat_completions(provider_req, timeout_seconds=timeout_seconds)
+    if breakers is None:
+        async for chunk in chunks:
+            yield chunk
+        return
+    with breakers.get(target.provider, target.provider_model).guard():
+        async for chunk in chunks:
+            yield chunk
@@ -0,0 +1,122 @@
+"""Single-flight coalescing: concurrent identical requests share one upstream call."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import uuid
+from collections.abc import Awaitable, Callable
+from typing import TYPE_CHECKING
+
+from aigate.core.metrics import aigate_singleflight_requests_total
+from aigate.domain.chat import ChatResponse
+
+if TYPE_CHECKING:
+    from redis.asyncio import Redis
+
+log = logging.getLogger(__name__)
+
+KEY_PREFIX = "singleflight"
+
+# Delete the lock only if we still own it (lease may have expired and been re-acquired).
+_SCRIPT_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """
+    In-flight table keyed by (org_id, request_hash). The upstream call runs as its own task, so a
+    leader whose client disconnects does not cancel the call for its followers.
+
+    With redis, the local leader additionally takes a cross-replica lease (SET NX PX). Replicas that
+    lose the race poll for the published result until the lease disappears, then call upstream themselves.
+    """
+
+    def __init__(
+        self,
+        redis: Redis | None = None,
+        *,
+        lease_seconds: float = 300.0,
+        result_ttl_seconds: int = 30,
+        poll_interval_seconds: float = 0.05,
+    ) -> None:
+        self._redis = redis
+        self._lease_ms = int(lease_seconds * 1000)
+        self._result_ttl = result_ttl_seconds
+        self._poll_interval = poll_interval_seconds
+        self._inflight: dict[str, asyncio.Task[tuple[ChatResponse, bool]]] = {}
+
+    async def do(
+        self, org_id: str, request_hash: str, fn: Callable[[], Awaitable[ChatResponse]]
+    ) -> tuple[ChatResponse, bool]:
+        """Return (response, shared). shared=True means another request paid for the upstream call."""
+        key = f"{org_id}:{request_hash}"
+        task = self._inflight.get(key)
+        if task is not None:
+            aigate_singleflight_requests_total.labels(role="follower").inc()
+            resp, _ = await asyncio.shield(task)
+            return resp.model_copy(deep=True), True
+
+        task = asyncio.create_task(self._lead(key, fn))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _t: self._inflight.pop(key, None))
+        resp, shared = await asyncio.shield(task)
+        aigate_singleflight_requests_total.labels(role="remote_follower" if shared else "leader").inc()
+        # Followers may be copying the same object concurrently; hand the leader its own copy too.
+        return resp.model_copy(deep=True), shared
+
+    async def _lead(self, key: str, fn: Callable[[], Awaitable[ChatResponse]]) -> tuple[ChatResponse, bool]:
+        if self._redis is None:
+            return await fn(), False
+
+        lock_key = f"{KEY_PREFIX}:lock:{key}"
+        result_key = f"{KEY_PREFIX}:result:{key}"
+        token = uuid.uuid4().hex
+        try:
+            remote = await self._acquire_or_wait(lock_key, result_key, token)
+        except Exception as e:
+            log.warning("singleflight.redis_unavailable", extra={"error": str(e)})
+            return await fn(), False
+        if remote is not None:
+            return remote, True
+
+        try:
+            resp = await fn()
+            try:
+                await self._redis.set(result_key, resp.model_dump_json(), ex=self._result_ttl)
+            except Exception as e:
+                log.warning("singleflight.publish_failed", extra={"error": str(e)})
+            return resp, False
+        finally:
+            try:
+                await self._redis.eval(_SCRIPT_RELEASE, 1, lock_key, token)
+            except Exception as e:
+                log.warning("singleflight.release_failed", extra={"error": str(e)})
+
+    async def _acquire_or_wait(self, lock_key: str, result_key: str, token: str) -> ChatResponse | None:
+        """Return None once we hold the lease, or the result another replica published."""
+        assert self._redis is not None
+        if await self._try_acquire(lock_key, result_key, token):
+            return None
+        while True:
+            await asyncio.sleep(self._poll_interval)
+            # Check the result before the lock: the leader publishes first, then releases.
+            raw = await self._redis.get(result_key)
+            if raw is not None:
+                return ChatResponse.model_validate_json(raw)
+            if not await self._redis.exists(lock_key):
+                # Leader failed without publishing or its lease expired: try to lead.
+                if await self._try_acquire(lock_key, result_key, token):
+                    return None
+
+    async def _try_acquire(self, lock_key: str, result_key: str, token: str) -> bool:
+        assert self._redis is not None
+        if not await self._redis.set(lock_key, token, nx=True, px=self._lease_ms):
+            return False
+        # Drop a previous flight's result so remote followers only ever see this one.
+        await self._redis.delete(result_key)
+        return True
@@ -0,0 +1,302 @@
+"""Ledger pipeline: requests enqueue immutable records, a background writer bulk-inserts them."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any
+from uuid import uuid4
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from aigate.core.metrics import (
+    aigate_ledger_flush_duration_seconds,
+    aigate_ledger_queue_depth,
+    aigate_ledger_records_total,
+)
+from aigate.storage.models import RequestLog, UsageEvent
+
+if TYPE_CHECKING:
+    from aigate.storage.spool import LedgerSpool
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class LedgerUsage:
+    prompt_tokens: int | None
+    completion_tokens: int | None
+    total_tokens: int | None
+    raw_cost: Decimal | None
+    billed_cost: Decimal | None
+    currency: str = "USD"
+    estimated: bool = False
+
+
+@dataclass(frozen=True)
+class LedgerRecord:
+    """One RequestLog row plus its optional UsageEvent. Primary key is assigned at creation."""
+
+    id: str
+    request_id: str
+    org_id: str
+    provider: str
+    model: str
+    status_code: int
+    latency_ms: int
+    request_hash: str
+    idempotency_key: str | None
+    created_at: datetime
+    usage: LedgerUsage | None = None
+    cache_hit: bool = False
+    coalesced: bool = False
+    api_key_id: str | None = None
+
+
+def new_ledger_record(
+    *,
+    request_id: str,
+    org_id: str,
+    provider: str,
+    model: str,
+    status_code: int,
+    latency_ms: int,
+    request_hash: str,
+    idempotency_key: str | None,
+    usage: LedgerUsage | None = None,
+    cache_hit: bool = False,
+    coalesced: bool = False,
+    api_key_id: str | None = None,
+) -> LedgerRecord:
+    return LedgerRecord(
+        id=str(uuid4()),
+        request_id=request_id,
+        org_id=org_id,
+        provider=provider,
+        model=model,
+        status_code=status_code,
+        latency_ms=latency_ms,
+        request_hash=request_hash,
+        idempotency_key=idempotency_key,
+        created_at=datetime.now(tz=timezone.utc),
+        usage=usage,
+        cache_hit=cache_hit,
+        coalesced=coalesced,
+        api_key_id=api_key_id,
+    )
+
+
+def _request_row(r: LedgerRecord) -> dict[str, Any]:
+    return {
+        "id": r.id,
+        "request_id": r.request_id,
+        "org_id": r.org_id,
+        "provider": r.provider,
+        "model": r.model,
+        "status_code": r.status_code,
+        "latency_ms": r.latency_ms,
+        "request_hash": r.request_hash,
+        "idempotency_key": r.idempotency_key,
+        "cache_hit": r.cache_hit,
+        "coalesced": r.coalesced,
+        "api_key_id": r.api_key_id,
+        "created_at": r.created_at,
+    }
+
+
+def _usage_row(r: LedgerRecord, u: LedgerUsage) -> dict[str, Any]:
+    return {
+        "id": str(uuid4()),
+        "org_id": r.org_id,
+        "request_db_id": r.id,
+        "provider": r.provider,
+        "model": r.model,
+        "prompt_tokens": u.prompt_tokens,
+        "completion_tokens": u.completion_tokens,
+        "total_tokens": u.total_tokens,
+        "raw_cost": u.raw_cost,
+        "billed_cost": u.billed_cost,
+        "currency": u.currency,
+        "estimated": u.estimated,
+        "created_at": r.created_at,
+    }
+
+
+def is_transient_db_error(e: BaseException) -> bool:
+    """Postgres unreachable or slow (worth retrying later), as opposed to a record it will never accept."""
+    if isinstance(e, DBAPIError):
+        return e.connection_invalidated or isinstance(e, (OperationalError, InterfaceError))
+    return isinstance(e, (OSError, TimeoutError))
+
+
+async def write_ledger_records(session: AsyncSession, records: list[LedgerRecord]) -> None:
+    """Bulk insert (one multi-row INSERT per table). Caller commits."""
+    if not records:
+        return
+    await session.execute(insert(RequestLog), [_request_row(r) for r in records])
+    usage_rows = [_usage_row(r, r.usage) for r in records if r.usage is not None]
+    if usage_rows:
+        await session.execute(insert(UsageEvent), usage_rows)
+
+
+class LedgerWriter:
+    """
+    Bounded queue drained by one task: flush every batch_size records or flush_interval_ms.
+
+    With a spool, a batch whose DB write errors or exceeds write_budget_ms is appended to the spool
+    instead, and a full queue spools immediately, so requests never wait on a degraded database.
+    Without one, a full queue makes enqueue wait up to enqueue_timeout_ms (backpressure) before dropping.
+    A batch Postgres rejects is retried record by record, so only the records it still rejects are
+    lost (dead-lettered with a spool).
+    """
+
+    def __init__(
+        self,
+        sessionmaker: async_sessionmaker,
+        *,
+        max_queue: int,
+        batch_size: int,
+        flush_interval_ms: int,
+        enqueue_timeout_ms: int,
+        spool: LedgerSpool | None = None,
+        write_budget_ms: int | None = None,
+    ) -> None:
+        self._sessionmaker = sessionmaker
+        self._spool = spool
+        self._write_budget = write_budget_ms / 1000.0 if write_budget_ms else None
+        self._queue: asyncio.Queue[LedgerRecord] = asyncio.Queue(maxsize=max_queue)
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval_ms / 1000.0
+        self._enqueue_timeout = enqueue_timeout_ms / 1000.0
+        self._task: asyncio.Task | None = None
+        self._interrupted: list[LedgerRecord] = []
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def enqueue(self, record: LedgerRecord) -> bool:
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            if self._spool is not None:
+                # Off the event loop: the queue is full exactly when the system is already overloaded.
+                try:
+                    await self._spool.write([record])
+                    return True
+                except Exception as e:
+                    aigate_ledger_records_total.labels(outcome="dropped").inc()
+                    log.error("ledger.spool_append_failed", extra={"request_id": record.request_id, "error": str(e)})
+                    return False
+            try:
+                await asyncio.wait_for(self._queue.put(record), timeout=self._enqueue_timeout)
+            except asyncio.TimeoutError:
+                aigate_ledger_records_total.labels(outcome="dropped").inc()
+                log.error("ledger.enqueue_dropped", extra={"request_id": record.request_id})
+                return False
+        aigate_ledger_queue_depth.set(self._queue.qsize())
+        return True
+
+    async def close(self) -> None:
+        """Stop the writer after flushing everything already enqueued."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        batch, self._interrupted = self._interrupted, []
+        await self._flush(batch)
+        while not self._queue.empty():
+            await self._flush(self._take_batch())
+
+    def _take_batch(self) -> list[LedgerRecord]:
+        batch: list[LedgerRecord] = []
+        while len(batch) < self._batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch: list[LedgerRecord] = []
+            try:
+                batch.append(await self._queue.get())
+                deadline = loop.time() + self._flush_interval
+                while len(batch) < self._batch_size:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                    except asyncio.TimeoutError:
+                        break
+                await self._flush(batch)
+            except asyncio.CancelledError:
+                # Shutdown mid-batch: close() writes these records.
+                self._interrupted = batch
+                raise
+
+    async def _flush(self, batch: list[LedgerRecord]) -> None:
+        if not batch:
+            return
+        aigate_ledger_queue_depth.set(self._queue.qsize())
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._write(batch), timeout=self._write_budget)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if is_transient_db_error(e):
+                await self._write_failed(batch, e)
+            else:
+                await self._write_one_by_one(batch)
+            return
+        finally:
+            aigate_ledger_flush_duration_seconds.observe(time.perf_counter() - started)
+        aigate_ledger_records_total.labels(outcome="written").inc(len(batch))
+
+    async def _write_one_by_one(self, batch: list[LedgerRecord]) -> None:
+        """Postgres rejected the batch (e.g. one oversized value): keep every record it does accept."""
+        for i, record in enumerate(batch):
+            try:
+                await asyncio.wait_for(self._write([record]), timeout=self._write_budget)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if is_transient_db_error(e):
+                    await self._write_failed(batch[i:], e)
+                    return
+                if self._spool is not None:
+                    try:
+                        await self._spool.dead_letter(record, e)
+                        continue
+                    except Exception:
+                        log.exception("ledger.dead_letter_failed", extra={"record_id": record.id})
+                aigate_ledger_records_total.labels(outcome="failed").inc()
+                log.error(
+                    "ledger.record_rejected",
+                    extra={"record_id": record.id, "request_id": record.request_id, "error": str(e)},
+                )
+                continue
+            aigate_ledger_records_total.labels(outcome="written").inc()
+
+    async def _write_failed(self, batch: list[LedgerRecord], e: Exception) -> None:
+        if self._spool is not None:
+            try:
+                await self._spool.write(batch)
+                log.warning("ledger.flush_spooled", extra={"records": len(batch), "error": repr(e)})
+                return
+            except Exception:
+                log.exception("ledger.spool_append_failed", extra={"records": len(batch)})
+        aigate_ledger_records_total.labels(outcome="failed").inc(len(batch))
+        log.error("ledger.flush_failed", extra={"records": len(batch), "error": str(e)})
+
+    async def _write(self, batch: list[LedgerRecord]) -> None:
+        async with self._sessionmaker() as session:
+            await write_ledger_records(session, batch)
+            await session.commit()
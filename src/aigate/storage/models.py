@@ -4,7 +4,7 @@ from decimal import Decimal
 from datetime import datetime, timezone
 from uuid import uuid4
 
-from sqlalchemy import Boolean, DateTime, Float, ForeignKey, Integer, Numeric, String, UniqueConstraint
+from sqlalchemy import Boolean, DateTime, Float, ForeignKey, Index, Integer, Numeric, String, UniqueConstraint, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
@@ -23,6 +23,7 @@ class Organization(Base):
 
     id: Mapped[str] = mapped_column(UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid4()))
     name: Mapped[str] = mapped_column(String(200), nullable=False)
+    tier: Mapped[str] = mapped_column(String(16), nullable=False, default="standard")  # fair-queuing weight class
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=utcnow)
 
     api_keys: Mapped[list["ApiKey"]] = relationship(back_populates="org", cascade="all, delete-orphan")
@@ -82,6 +83,9 @@ class RequestLog(Base):
 
     idempotency_key: Mapped[str | None] = mapped_column(String(128), nullable=True)
     request_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    cache_hit: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    coalesced: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)  # shared another request's upstream call
+    api_key_id: Mapped[str | None] = mapped_column(UUID(as_uuid=False), ForeignKey("api_keys.id"), nullable=True, index=True)
 
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=utcnow)
 
@@ -106,12 +110,36 @@ class UsageEvent(Base):
     raw_cost: Mapped[Decimal | None] = mapped_column(Numeric(18, 8), nullable=True)
     billed_cost: Mapped[Decimal | None] = mapped_column(Numeric(18, 8), nullable=True)
     currency: Mapped[str] = mapped_column(String(8), nullable=False, default="USD")
+    # Tokens counted locally because the provider did not report usage.
+    estimated: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
 
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=utcnow)
 
     request: Mapped[RequestLog] = relationship(back_populates="usage_events")
 
 
+class SpendBudget(Base):
+    """Billed-cost cap per UTC day or month for an org (api_key_id NULL) or one of its API keys."""
+
+    __tablename__ = "spend_budgets"
+    __table_args__ = (
+        UniqueConstraint("org_id", "api_key_id", "period", name="uq_spend_budgets_scope"),
+        # NULLs are distinct above: one org-wide (api_key_id NULL) budget per period needs its own index.
+        Index(
+            "uq_spend_budgets_org_scope", "org_id", "period", unique=True, postgresql_where=text("api_key_id IS NULL")
+        ),
+    )
+
+    id: Mapped[str] = mapped_column(UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid4()))
+    org_id: Mapped[str] = mapped_column(UUID(as_uuid=False), ForeignKey("organizations.id"), nullable=False, index=True)
+    api_key_id: Mapped[str | None] = mapped_column(UUID(as_uuid=False), ForeignKey("api_keys.id"), nullable=True)
+
+    period: Mapped[str] = mapped_column(String(8), nullable=False)  # day | month
+    limit_amount: Mapped[Decimal] = mapped_column(Numeric(18, 8), nullable=False)
+    currency: Mapped[str] = mapped_column(String(8), nullable=False, default="USD")
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=utcnow)
+
+
 class AssistantKnowledgeBase(Base):
     __tablename__ = "assistant_kbs"
 
@@ -0,0 +1,153 @@
+"""Compiled price-rule index: billing lookups without a DB round trip."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from aigate.storage.models import PriceRule
+
+if TYPE_CHECKING:
+    from redis.asyncio import Redis
+
+log = logging.getLogger(__name__)
+
+VERSION_KEY = "pricing:version"
+_QUANT = Decimal("0.00000001")
+
+
+@dataclass(frozen=True)
+class CompiledPriceRule:
+    markup_pct: Decimal
+    multiplier: Decimal
+    input_price_per_1k: Decimal | None
+    output_price_per_1k: Decimal | None
+
+    @classmethod
+    def from_row(cls, row: Any) -> CompiledPriceRule:
+        markup_pct = Decimal(row.markup_pct)
+        return cls(
+            markup_pct=markup_pct,
+            multiplier=Decimal("1") + markup_pct / Decimal("100"),
+            input_price_per_1k=row.input_price_per_1k,
+            output_price_per_1k=row.output_price_per_1k,
+        )
+
+
+def apply_price_rule(
+    rule: CompiledPriceRule | None,
+    *,
+    prompt_tokens: int | None,
+    completion_tokens: int | None,
+    raw_cost_from_provider: Decimal | None,
+) -> tuple[Decimal | None, Decimal | None]:
+    """Return (raw_cost, billed_cost) for a resolved rule; see repos.compute_billed_cost."""
+    mult = rule.multiplier if rule else Decimal("1")
+
+    if raw_cost_from_provider is not None:
+        billed = (raw_cost_from_provider * mult).quantize(_QUANT)
+        return (raw_cost_from_provider, billed)
+
+    if rule is None or rule.input_price_per_1k is None or rule.output_price_per_1k is None:
+        return (None, None)
+
+    prompt = Decimal(prompt_tokens or 0)
+    completion = Decimal(completion_tokens or 0)
+    base = (prompt / 1000 * rule.input_price_per_1k + completion / 1000 * rule.output_price_per_1k).quantize(_QUANT)
+    billed = (base * mult).quantize(_QUANT)
+    return (None, billed)
+
+
+class PriceIndex:
+    """
+    In-memory (org_id, provider, model) -> CompiledPriceRule, with model=None as the provider default.
+    Resolution matches get_price_rule: exact model first, then newest provider default.
+    """
+
+    def __init__(self, *, ttl_seconds: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self._ttl = ttl_seconds
+        self._clock = clock
+        self._rules: dict[tuple[str, str, str | None], CompiledPriceRule] = {}
+        self._loaded_at: float | None = None
+        self.version: str | None = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def is_stale(self) -> bool:
+        return self._loaded_at is None or self._clock() - self._loaded_at >= self._ttl
+
+    def replace(self, rows: Iterable[Any], *, version: str | None = None) -> None:
+        """Swap in a new index. Rows must be ordered newest first (first row per scope wins)."""
+        rules: dict[tuple[str, str, str | None], CompiledPriceRule] = {}
+        for row in rows:
+            rules.setdefault((str(row.org_id), row.provider, row.model), CompiledPriceRule.from_row(row))
+        self._rules = rules
+        self._loaded_at = self._clock()
+        self.version = version
+
+    def lookup(self, *, org_id: str, provider: str, model: str) -> CompiledPriceRule | None:
+        rule = self._rules.get((org_id, provider, model))
+        if rule is None:
+            rule = self._rules.get((org_id, provider, None))
+        return rule
+
+    def compute_billed_cost(
+        self,
+        *,
+        org_id: str,
+        provider: str,
+        model: str,
+        prompt_tokens: int | None,
+        completion_tokens: int | None,
+        raw_cost_from_provider: Decimal | None,
+    ) -> tuple[Decimal | None, Decimal | None]:
+        return apply_price_rule(
+            self.lookup(org_id=org_id, provider=provider, model=model),
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            raw_cost_from_provider=raw_cost_from_provider,
+        )
+
+    async def refresh(self, session: AsyncSession, *, version: str | None = None) -> None:
+        stmt = select(PriceRule).order_by(PriceRule.created_at.desc())
+        rows = (await session.execute(stmt)).scalars().all()
+        self.replace(rows, version=version)
+
+
+async def bump_price_rules_version(redis: Redis) -> None:
+    """Call after changing price_rules so every replica reloads its index on the next poll."""
+    await redis.incr(VERSION_KEY)
+
+
+async def run_price_index_refresher(
+    index: PriceIndex,
+    sessionmaker: async_sessionmaker,
+    redis: Redis | None,
+    *,
+    poll_interval_seconds: float,
+) -> None:
+    """Reload the index when the Redis version changes or the TTL elapses, until cancelled."""
+    while True:
+        try:
+            version = await redis.get(VERSION_KEY) if redis is not None else None
+            if version is not None:
+                version = str(version)
+            if index.is_stale() or version != index.version:
+                async with sessionmaker() as session:
+                    await index.refresh(session, version=version)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Keep serving the last good index; compute paths fall back to the DB until first load.
+            log.warning("pricing.refresh_failed", extra={"error": str(e)})
+        await asyncio.sleep(poll_interval_seconds)
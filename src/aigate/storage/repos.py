@@ -1,12 +1,14 @@
 from __future__ import annotations
 
 import hashlib
+from datetime import datetime, timezone
 from decimal import Decimal
 
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from aigate.storage.models import ApiKey, PriceRule, RequestLog, UsageEvent
+from aigate.storage.models import ApiKey, Organization, PriceRule, RequestLog, SpendBudget, UsageEvent
+from aigate.storage.pricing import CompiledPriceRule, apply_price_rule
 
 
 def hash_api_key(api_key: str) -> str:
@@ -23,6 +25,31 @@ async def get_active_api_key_by_hash(session: AsyncSession, *, key_hash: str) ->
     return result.scalar_one_or_none()
 
 
+async def get_org_tier(session: AsyncSession, *, org_id: str) -> str | None:
+    result = await session.execute(select(Organization.tier).where(Organization.id == org_id))
+    return result.scalar_one_or_none()
+
+
+async def get_spend_budgets(session: AsyncSession, *, org_id: str, api_key_id: str) -> list[SpendBudget]:
+    """The org's own budgets plus the budgets of this API key."""
+    stmt = select(SpendBudget).where(
+        SpendBudget.org_id == org_id,
+        (SpendBudget.api_key_id.is_(None)) | (SpendBudget.api_key_id == api_key_id),
+    )
+    return list((await session.execute(stmt)).scalars().all())
+
+
+async def revoke_api_key(session: AsyncSession, *, key_hash: str) -> bool:
+    """Deactivate key; caller must commit and then publish the cache invalidation."""
+    stmt = (
+        update(ApiKey)
+        .where(ApiKey.key_hash == key_hash, ApiKey.is_active.is_(True))
+        .values(is_active=False, revoked_at=datetime.now(tz=timezone.utc))
+    )
+    result = await session.execute(stmt)
+    return bool(result.rowcount)
+
+
 def _pick_price_rule(rows: list[PriceRule], model: str) -> PriceRule | None:
     for row in rows:
         if row.model is None or row.model == model:
@@ -63,23 +90,12 @@ async def compute_billed_cost(
     When raw_cost absent: use price_rule base prices (input/output per 1k) + markup if set.
     """
     rule = await get_price_rule(session, org_id=org_id, provider=provider, model=model)
-    markup_pct = Decimal(rule.markup_pct) if rule else Decimal("0")
-    mult = Decimal("1") + markup_pct / Decimal("100")
-
-    if raw_cost_from_provider is not None:
-        billed = (raw_cost_from_provider * mult).quantize(Decimal("0.00000001"))
-        return (raw_cost_from_provider, billed)
-
-    if rule is None or rule.input_price_per_1k is None or rule.output_price_per_1k is None:
-        return (None, None)
-
-    prompt = Decimal(prompt_tokens or 0)
-    completion = Decimal(completion_tokens or 0)
-    base = (prompt / 1000 * rule.input_price_per_1k + completion / 1000 * rule.output_price_per_1k).quantize(
-        Decimal("0.00000001")
+    return apply_price_rule(
+        CompiledPriceRule.from_row(rule) if rule else None,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        raw_cost_from_provider=raw_cost_from_provider,
     )
-    billed = (base * mult).quantize(Decimal("0.00000001"))
-    return (None, billed)
 
 
 async def create_request_log(
@@ -0,0 +1,271 @@
+"""Durable on-disk spool for ledger records the DB could not take in time, plus its replayer."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import struct
+import zlib
+from dataclasses import asdict
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import IO, Any
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from aigate.core.jsoncodec import dumps, loads
+from aigate.core.metrics import (
+    aigate_ledger_spool_bytes,
+    aigate_ledger_spool_errors_total,
+    aigate_ledger_spool_records_total,
+)
+from aigate.storage.ledger import LedgerRecord, LedgerUsage, is_transient_db_error, write_ledger_records
+from aigate.storage.models import RequestLog
+
+log = logging.getLogger(__name__)
+
+# Frame: payload length (u32 BE) + crc32 of payload (u32 BE) + JSON payload.
+_HEADER = struct.Struct(">II")
+_SEGMENT_GLOB = "ledger-*.seg"
+# Records Postgres rejected (not replayed again); same framing as segments, kept for inspection.
+DEAD_LETTER_FILE = "dead-letter.seg"
+
+
+def _encode(record: LedgerRecord) -> bytes:
+    data = asdict(record)
+    data["created_at"] = record.created_at.isoformat()
+    if record.usage is not None:
+        for name in ("raw_cost", "billed_cost"):
+            value = data["usage"][name]
+            data["usage"][name] = str(value) if value is not None else None
+    payload = dumps(data)
+    return _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def _decode(payload: bytes) -> LedgerRecord:
+    data: dict[str, Any] = loads(payload)
+    usage = data.pop("usage", None)
+    if usage is not None:
+        for name in ("raw_cost", "billed_cost"):
+            if usage[name] is not None:
+                usage[name] = Decimal(usage[name])
+        usage = LedgerUsage(**usage)
+    data["created_at"] = datetime.fromisoformat(data["created_at"])
+    return LedgerRecord(**data, usage=usage)
+
+
+def read_segment(path: Path) -> list[LedgerRecord]:
+    """Read records until EOF or the first torn/corrupt frame (a crash mid-append)."""
+    out: list[LedgerRecord] = []
+    raw = path.read_bytes()
+    offset = 0
+    while offset + _HEADER.size <= len(raw):
+        length, crc = _HEADER.unpack_from(raw, offset)
+        start = offset + _HEADER.size
+        payload = raw[start : start + length]
+        if len(payload) != length or zlib.crc32(payload) != crc:
+            aigate_ledger_spool_records_total.labels(outcome="corrupt").inc()
+            log.error("ledger.spool_corrupt_frame", extra={"segment": path.name, "offset": offset})
+            break
+        out.append(_decode(payload))
+        offset = start + length
+    return out
+
+
+class LedgerSpool:
+    """
+    Append-only segment files in one directory. Appends are buffered writes; sync() fsyncs them in
+    a worker thread, so durability is batched. seal() rotates the active segment for replay.
+    From the event loop use write(), which appends in a worker thread; the lock keeps those
+    appends and sync() / seal() from touching the active segment at the same time.
+    """
+
+    def __init__(self, directory: str | Path, *, segment_max_bytes: int) -> None:
+        self._dir = Path(directory)
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._segment_max_bytes = segment_max_bytes
+        existing = sorted(self._dir.glob(_SEGMENT_GLOB))
+        self._next_seq = int(existing[-1].stem.split("-")[1]) + 1 if existing else 0
+        self._active: IO[bytes] | None = None
+        self._active_path: Path | None = None
+        self._active_bytes = 0
+        self._dirty = False
+        self._lock = asyncio.Lock()
+        self._update_size_gauge()
+
+    async def write(self, records: list[LedgerRecord]) -> None:
+        """append() off the event loop (opening a segment and writing are blocking file I/O)."""
+        async with self._lock:
+            await asyncio.to_thread(self.append, records)
+
+    def append(self, records: list[LedgerRecord]) -> None:
+        if not records:
+            return
+        if self._active is None:
+            self._open_segment()
+        assert self._active is not None
+        data = b"".join(_encode(r) for r in records)
+        self._active.write(data)
+        self._active_bytes += len(data)
+        self._dirty = True
+        aigate_ledger_spool_records_total.labels(outcome="spooled").inc(len(records))
+        aigate_ledger_spool_bytes.inc(len(data))
+
+    async def sync(self) -> None:
+        """fsync everything appended so far; rotate the active segment once it is full."""
+        async with self._lock:
+            await self._sync()
+
+    async def _sync(self) -> None:
+        if self._active is None:
+            return
+        if self._dirty:
+            self._active.flush()
+            await asyncio.to_thread(os.fsync, self._active.fileno())
+            self._dirty = False
+        if self._active_bytes >= self._segment_max_bytes:
+            self._close_active()
+
+    async def seal(self) -> None:
+        """Sync and close the active segment (if any) so the replayer may pick it up."""
+        async with self._lock:
+            await self._sync()
+            if self._active is not None:
+                self._close_active()
+
+    def sealed_segments(self) -> list[Path]:
+        return sorted(p for p in self._dir.glob(_SEGMENT_GLOB) if p != self._active_path)
+
+    async def dead_letter(self, record: LedgerRecord, error: BaseException) -> None:
+        """Set aside a record Postgres will not take, durably, so the rest of the spool can drain."""
+        aigate_ledger_spool_records_total.labels(outcome="dead_lettered").inc()
+        log.error(
+            "ledger.spool_dead_letter",
+            extra={"record_id": record.id, "request_id": record.request_id, "error": str(error)},
+        )
+        frame = _encode(record)
+
+        def write() -> None:
+            with open(self._dir / DEAD_LETTER_FILE, "ab") as f:
+                f.write(frame)
+                f.flush()
+                os.fsync(f.fileno())
+
+        await asyncio.to_thread(write)
+
+    def remove(self, path: Path) -> None:
+        path.unlink(missing_ok=True)
+        self._update_size_gauge()
+
+    def close(self) -> None:
+        if self._active is not None:
+            self._active.flush()
+            os.fsync(self._active.fileno())
+            self._close_active()
+
+    def _open_segment(self) -> None:
+        self._active_path = self._dir / f"ledger-{self._next_seq:012d}.seg"
+        self._next_seq += 1
+        self._active = open(self._active_path, "ab")
+        self._active_bytes = 0
+
+    def _close_active(self) -> None:
+        assert self._active is not None
+        self._active.close()
+        self._active = None
+        self._active_path = None
+        self._dirty = False
+
+    def _update_size_gauge(self) -> None:
+        aigate_ledger_spool_bytes.set(sum(p.stat().st_size for p in self._dir.glob(_SEGMENT_GLOB)))
+
+
+async def replay_records(session: AsyncSession, records: list[LedgerRecord]) -> int:
+    """
+    Insert records not already present, in one transaction. Idempotent: a record whose primary key
+    is already in `requests` (e.g. the original commit succeeded after the writer gave up) is skipped
+    together with its usage event. Returns the number of records inserted.
+    """
+    ids = [r.id for r in records]
+    existing = set((await session.execute(select(RequestLog.id).where(RequestLog.id.in_(ids)))).scalars())
+    fresh = [r for r in records if r.id not in existing]
+    await write_ledger_records(session, fresh)
+    await session.commit()
+    return len(fresh)
+
+
+async def _replay_batch(sessionmaker: async_sessionmaker, records: list[LedgerRecord]) -> int:
+    async with sessionmaker() as session:
+        return await replay_records(session, records)
+
+
+async def replay_segment(
+    spool: LedgerSpool, segment: Path, sessionmaker: async_sessionmaker, *, batch_size: int
+) -> int:
+    """
+    Insert a sealed segment's records, then remove it; returns the number inserted. Raises when
+    Postgres is unreachable (the segment stays for the next round). A batch Postgres rejects is
+    retried record by record and whatever it still rejects is dead-lettered.
+    """
+    records = await asyncio.to_thread(read_segment, segment)
+    inserted = 0
+    for i in range(0, len(records), batch_size):
+        batch = records[i : i + batch_size]
+        try:
+            inserted += await _replay_batch(sessionmaker, batch)
+            continue
+        except Exception as e:
+            if is_transient_db_error(e):
+                raise
+        for record in batch:
+            try:
+                inserted += await _replay_batch(sessionmaker, [record])
+            except Exception as e:
+                if is_transient_db_error(e):
+                    raise
+                await spool.dead_letter(record, e)
+    spool.remove(segment)
+    return inserted
+
+
+def _spool_failed(operation: str, e: Exception, **extra: str) -> None:
+    aigate_ledger_spool_errors_total.labels(operation=operation).inc()
+    log.error(f"ledger.spool_{operation}_failed", extra={**extra, "error": str(e)})
+
+
+async def run_spool_replayer(
+    spool: LedgerSpool,
+    sessionmaker: async_sessionmaker,
+    *,
+    fsync_interval_ms: int,
+    replay_interval_seconds: float,
+    batch_size: int,
+) -> None:
+    """fsync appended records every fsync_interval_ms; drain sealed segments into Postgres when it is reachable."""
+    loop = asyncio.get_running_loop()
+    next_replay = loop.time() + replay_interval_seconds
+    while True:
+        await asyncio.sleep(fsync_interval_ms / 1000.0)
+        try:
+            await spool.sync()
+        except Exception as e:  # e.g. ENOSPC: keep running, the next round retries
+            _spool_failed("sync", e)
+        if loop.time() < next_replay:
+            continue
+        next_replay = loop.time() + replay_interval_seconds
+        try:
+            await spool.seal()
+        except Exception as e:
+            _spool_failed("seal", e)
+        for segment in spool.sealed_segments():
+            try:
+                inserted = await replay_segment(spool, segment, sessionmaker, batch_size=batch_size)
+            except Exception as e:
+                # Postgres unreachable (or the segment unreadable): retry the whole spool next round.
+                _spool_failed("replay", e, segment=segment.name)
+                break
+            aigate_ledger_spool_records_total.labels(outcome="replayed").inc(inserted)
+            log.info("ledger.spool_replayed", extra={"segment": segment.name, "records": inserted})
@@ -9,7 +9,7 @@ from qdrant_client.async_qdrant_client import AsyncQdrantClient
 from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
 
 from aigate.core.logging import configure_logging
-from aigate.core.middleware import RequestIdMiddleware
+from aigate.core.middleware import install_middleware
 from aigate.storage.db import create_engine, create_sessionmaker
 from aigate_assistant.api import api_router
 from aigate_assistant.core.config import get_assistant_settings
@@ -75,7 +75,7 @@ async def lifespan(app: FastAPI):
 
 def create_app() -> FastAPI:
     app = FastAPI(title="AIGate Assistant", version="0.1.0", lifespan=lifespan)
-    app.add_middleware(RequestIdMiddleware)
+    install_middleware(app, body_guard=False)
     app.include_router(api_router)
     return app
 
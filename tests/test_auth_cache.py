@@ -0,0 +1,91 @@
+"""Tests for the in-process API key cache used by get_auth_context."""
+
+from __future__ import annotations
+
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi import HTTPException
+
+from aigate.core.auth import get_auth_context
+from aigate.core.auth_cache import NEGATIVE, ApiKeyCache, CachedApiKey, _apply_invalidation
+from aigate.core.config import Settings
+from aigate.limits.budget import Budget
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _cache(clock: _Clock, max_size: int = 10) -> ApiKeyCache:
+    return ApiKeyCache(max_size=max_size, ttl_seconds=60, negative_ttl_seconds=5, clock=clock)
+
+
+def test_positive_and_negative_entries_expire_separately() -> None:
+    clock = _Clock()
+    cache = _cache(clock)
+    cache.put("good", CachedApiKey(org_id="org-1", is_active=True))
+    cache.put("bad", NEGATIVE)
+
+    clock.now = 10
+    assert cache.get("bad") is None
+    assert cache.get("good") == CachedApiKey(org_id="org-1", is_active=True)
+
+    clock.now = 61
+    assert cache.get("good") is None
+
+
+def test_lru_evicts_least_recently_used() -> None:
+    cache = _cache(_Clock(), max_size=2)
+    cache.put("a", NEGATIVE)
+    cache.put("b", NEGATIVE)
+    assert cache.get("a") is not None
+    cache.put("c", NEGATIVE)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert len(cache) == 2
+
+
+def test_invalidation_message_drops_one_key_or_all() -> None:
+    cache = _cache(_Clock())
+    cache.put("a", NEGATIVE)
+    cache.put("b", NEGATIVE)
+    _apply_invalidation(cache, "a")
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+    _apply_invalidation(cache, b"*")
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_get_auth_context_hits_db_once_per_key() -> None:
+    cache = _cache(_Clock())
+    request = SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(api_key_cache=cache)))
+    session = AsyncMock()
+    budget_row = SimpleNamespace(period="day", limit_amount=Decimal("5"), api_key_id=None)
+    with (
+        patch("aigate.core.auth.get_active_api_key_by_hash", new_callable=AsyncMock) as lookup,
+        patch("aigate.core.auth.get_spend_budgets", new_callable=AsyncMock, return_value=[budget_row]),
+        patch("aigate.core.auth.get_org_tier", new_callable=AsyncMock, return_value="enterprise"),
+    ):
+        lookup.return_value = SimpleNamespace(id="key-1", org_id="org-1", is_active=True)
+        for _ in range(3):
+            auth = await get_auth_context(request, "Bearer agk_good", Settings(), session)
+            assert auth.org_id == "org-1"
+            assert auth.api_key_id == "key-1"
+            assert auth.budgets == (Budget(period="day", limit=Decimal("5")),)
+            assert auth.tier == "enterprise"
+
+        lookup.return_value = None
+        for _ in range(2):
+            with pytest.raises(HTTPException) as exc:
+                await get_auth_context(request, "Bearer agk_bad", Settings(), session)
+            assert exc.value.status_code == 401
+
+    assert lookup.await_count == 2
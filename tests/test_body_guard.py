@@ -0,0 +1,141 @@
+"""Tests for the streaming request body guard (413 as soon as a limit is crossed)."""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+from aigate.core.auth import AuthContext, get_auth_context
+from aigate.core.middleware import BodyGuardMiddleware
+from aigate.limits.body_guard import BodyGuard, BodyLimitPolicy, BodyLimits, parse_body_limits
+from aigate.main import create_app
+
+DEFAULT = BodyLimits(max_body_bytes=10_000, max_messages=3, max_image_bytes=1_000)
+POLICY = BodyLimitPolicy(DEFAULT, parse_body_limits("enterprise=100000||50000, org-big=|10", DEFAULT))
+
+
+def _body(messages: int, image_bytes: int) -> bytes:
+    content = [
+        {"type": "text", "text": 'say \\"hi\\" {['},
+        {"type": "image_url", "image_url": {"url": "data:image/png;base64," + "A" * image_bytes}},
+    ]
+    body = {"model": "qwen:qwen-vl-max", "messages": [{"role": "user", "content": content}] * messages}
+    return json.dumps(body).encode()
+
+
+def _feed(guard: BodyGuard, body: bytes, chunk: int) -> None:
+    for i in range(0, len(body), chunk):
+        guard.feed(body[i : i + chunk])
+
+
+@pytest.mark.parametrize("chunk", [1, 7, 4096])
+def test_structure_is_tracked_across_chunk_boundaries(chunk: int) -> None:
+    guard = BodyGuard(POLICY)
+    guard.apply("org-1", "standard")
+    _feed(guard, _body(3, 900), chunk)
+    assert guard.messages == 3
+
+
+@pytest.mark.parametrize(
+    ("body", "reason"),
+    [(_body(4, 10), "messages"), (_body(1, 1_200), "image_bytes"), (b"x" * 10_001, "body_bytes")],
+    ids=["messages", "image_bytes", "body_bytes"],
+)
+def test_limits_reject_with_413_and_reason(body: bytes, reason: str) -> None:
+    guard = BodyGuard(POLICY)
+    guard.apply("org-1", "standard")
+    with pytest.raises(HTTPException) as exc_info:
+        _feed(guard, body, 512)
+    assert exc_info.value.status_code == 413
+    assert reason.split("_")[0] in exc_info.value.detail.lower()
+
+
+def test_limits_come_from_org_then_tier_then_default() -> None:
+    assert POLICY.for_org("org-big", "free").max_messages == 10
+    assert POLICY.for_org("org-1", "enterprise") == BodyLimits(100_000, 3, 50_000)
+    assert POLICY.for_org("org-1", "free") == DEFAULT
+    assert POLICY.ceiling == BodyLimits(100_000, 10, 50_000)
+
+
+@pytest.mark.asyncio
+async def test_middleware_stops_reading_once_a_limit_is_crossed() -> None:
+    app = FastAPI()
+
+    @app.post("/echo")
+    async def echo(request: Request) -> dict[str, int]:
+        request.state.body_guard.apply("org-1", "free")
+        return {"size": len(await request.body())}
+
+    body = _body(1, 5_000)
+    chunks = [body[i : i + 256] for i in range(0, len(body), 256)]
+    sent: list[dict] = []
+    read = 0
+
+    async def receive() -> dict:
+        nonlocal read
+        read += 1
+        return {"type": "http.request", "body": chunks[read - 1], "more_body": read < len(chunks)}
+
+    async def send(message: dict) -> None:
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/echo", "headers": [], "query_string": b""}
+    await BodyGuardMiddleware(app, POLICY)(scope, receive, send)
+
+    assert sent[0]["status"] == 413
+    assert read < len(chunks) // 2  # the image crossed 1000 bytes early on
+
+
+def test_declared_length_over_every_limit_is_rejected_before_the_app_runs() -> None:
+    app = FastAPI()
+    app.add_middleware(BodyGuardMiddleware, policy=POLICY)
+    client = TestClient(app)
+    resp = client.post("/anything", content=b"x" * 100_001)
+    assert resp.status_code == 413
+    assert resp.json() == {"detail": "Request body exceeds 100000 bytes"}
+
+
+def test_chat_endpoint_applies_the_org_limits_before_reading() -> None:
+    app = create_app()
+    app.dependency_overrides[get_auth_context] = lambda: AuthContext(org_id="org-1", api_key="k")
+    body = {"model": "qwen:qwen-plus", "messages": [{"role": "user", "content": "hi"}] * 1_001}
+    resp = TestClient(app).post("/v1/chat/completions", json=body)
+    assert resp.status_code == 413
+    assert resp.json()["detail"] == "Request has more than 1000 messages"
+
+
+def _escaped(key: str) -> bytes:
+    return ('"' + "".join(f"\\u{ord(c):04x}" for c in key) + '"').encode()
+
+
+@pytest.mark.parametrize(
+    ("body", "reason"),
+    [
+        (_body(4, 10).replace(b'"messages"', b'"m\\u0065ssages"'), "messages"),
+        (_body(4, 10).replace(b'"messages"', _escaped("messages")), "messages"),
+        (_body(1, 1_200).replace(b'"url"', b'"\\u0075rl"'), "image_bytes"),
+    ],
+    ids=["escaped-char", "fully-escaped", "escaped-url"],
+)
+def test_escaped_keys_are_matched_as_decoded(body: bytes, reason: str) -> None:
+    guard = BodyGuard(POLICY)
+    guard.apply("org-1", "standard")
+    with pytest.raises(HTTPException) as exc_info:
+        _feed(guard, body, 5)
+    assert exc_info.value.status_code == 413
+    assert reason.split("_")[0] in exc_info.value.detail.lower()
+
+
+def test_parsed_request_is_checked_again() -> None:
+    from aigate.domain.chat import ChatRequest
+
+    guard = BodyGuard(POLICY)
+    guard.apply("org-1", "standard")
+    guard.check_request(ChatRequest.model_validate_json(_body(3, 900)))
+    with pytest.raises(HTTPException, match="Image exceeds"):
+        guard.check_request(ChatRequest.model_validate_json(_body(1, 1_200)))
+    with pytest.raises(HTTPException, match="more than 3 messages"):
+        guard.check_request(ChatRequest.model_validate_json(_body(4, 10)))
@@ -0,0 +1,97 @@
+"""Tests for spend budgets: Redis counters, admission checks and reconciliation."""
+
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import fakeredis
+import pytest
+from fastapi import HTTPException
+
+from aigate.limits.budget import (
+    Budget,
+    counter_key,
+    period_bounds,
+    plan_budgets,
+    reconcile_budgets,
+    record_spend,
+)
+from aigate.limits.lease import LeaseRateLimiter
+from aigate.limits.rate_limit import check_rate_limit
+
+NOW = datetime(2026, 12, 31, 23, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def redis() -> fakeredis.FakeAsyncRedis:
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+def test_periods_are_utc_days_and_months() -> None:
+    new_year = datetime(2027, 1, 1, tzinfo=timezone.utc)
+    assert period_bounds("day", NOW) == (datetime(2026, 12, 31, tzinfo=timezone.utc), new_year)
+    assert period_bounds("month", NOW) == (datetime(2026, 12, 1, tzinfo=timezone.utc), new_year)
+    assert counter_key("org-1", Budget("month", Decimal("10")), NOW) == "budget:org:org-1:month:202612"
+    key_budget = Budget("day", Decimal("1"), api_key_id="key-1")
+    assert counter_key("org-1", key_budget, NOW) == "budget:key:key-1:day:20261231"
+    (counter,) = plan_budgets("org-1", [Budget("day", Decimal("1"))], NOW)
+    assert counter.reset_seconds == 3600
+
+
+@pytest.mark.asyncio
+async def test_admission_rejects_with_402_once_a_budget_is_spent(redis) -> None:
+    budgets = plan_budgets(
+        "org-1", [Budget("day", Decimal("1.00")), Budget("month", Decimal("5"), api_key_id="key-1")]
+    )
+    await check_rate_limit(redis, "org-1", 60, budgets=budgets)
+
+    assert await record_spend(redis, budgets, Decimal("0.75")) == [Decimal("0.75"), Decimal("0.75")]
+    await check_rate_limit(redis, "org-1", 60, budgets=budgets)
+    await record_spend(redis, budgets, Decimal("0.25"))
+
+    with pytest.raises(HTTPException) as exc_info:
+        await check_rate_limit(redis, "org-1", 60, budgets=budgets)
+    assert exc_info.value.status_code == 402
+    assert exc_info.value.detail == "Daily spend budget exhausted for this organization"
+    assert int((exc_info.value.headers or {})["Retry-After"]) == budgets[0].reset_seconds
+    # A rejected request takes nothing from the rate limit either.
+    assert (await check_rate_limit(redis, "org-1", 60)).remaining == 57
+
+
+@pytest.mark.asyncio
+async def test_lease_limiter_checks_budgets_from_recorded_totals(redis) -> None:
+    limiter = LeaseRateLimiter(redis, flush_interval_ms=0)
+    budgets = plan_budgets("org-1", [Budget("day", Decimal("1"), api_key_id="key-1")])
+    await limiter.check("org-1", 60, budgets=budgets)
+    limiter.note_spend(budgets, await record_spend(redis, budgets, Decimal("1.5")))
+    with pytest.raises(HTTPException) as exc_info:
+        await limiter.check("org-1", 60, budgets=budgets)
+    assert exc_info.value.detail == "Daily spend budget exhausted for this API key"
+
+
+@pytest.mark.asyncio
+async def test_reconcile_raises_lagging_counters_but_never_lowers_them(redis) -> None:
+    rows = [
+        SimpleNamespace(org_id="org-1", api_key_id=None, period="day", limit_amount=Decimal("10")),
+        SimpleNamespace(org_id="org-1", api_key_id="key-1", period="month", limit_amount=Decimal("10")),
+    ]
+    spent = iter([Decimal("3.5"), Decimal("1")])
+
+    def result(stmt) -> MagicMock:
+        out = MagicMock()
+        out.scalars.return_value.all.return_value = rows
+        out.scalar_one.side_effect = lambda: next(spent)
+        return out
+
+    session = AsyncMock()
+    session.execute.side_effect = result
+    day, month = plan_budgets("org-1", [Budget.from_row(r) for r in rows], NOW)
+    await redis.set(month.key, "2")  # spend still in the ledger queue
+
+    assert await reconcile_budgets(session, redis, now=NOW) == 1
+    assert Decimal(await redis.get(day.key)) == Decimal("3.5")
+    assert Decimal(await redis.get(month.key)) == Decimal("2")
+    assert await redis.ttl(day.key) > 3600
@@ -123,3 +123,78 @@ def test_chat_completions_streaming_rejects_idempotency_key() -> None:
     )
     assert r.status_code == 400
     assert "idempotency" in r.json().get("detail", "").lower()
+
+
+class UsageTailAdapter(StreamingDummyAdapter):
+    """Upstream honouring stream_options.include_usage: usage comes in a trailing chunk without choices."""
+
+    def __init__(self, *, send_usage: bool) -> None:
+        self.send_usage = send_usage
+
+    async def stream_chat_completions(
+        self, req: ChatRequest, timeout_seconds: float | None = None
+    ) -> AsyncIterator[bytes]:
+        yield b'data: {"choices":[{"index":0,"delta":{"content":"Hello there"}}],"usage":null}\n'
+        yield b'data: {"choices":[{"index":0,"delta":{},"finish_reason":"stop"}],"usage":null}\n'
+        if self.send_usage:
+            yield b'data: {"choices":[],"usage":{"prompt_tokens":7,"completion_tokens":2,"total_tokens":9}}\n'
+        yield b"data: [DONE]\n"
+
+
+class _CaptureWriter:
+    def __init__(self) -> None:
+        self.records = []
+
+    async def enqueue(self, record) -> bool:  # noqa: ANN001
+        self.records.append(record)
+        return True
+
+
+def _usage_client(adapter: StreamingDummyAdapter) -> tuple[TestClient, _CaptureWriter]:
+    from aigate.core.auth import AuthContext, get_auth_context
+    from aigate.core.deps import get_db_session, get_provider_registry
+
+    app = create_app()
+    writer = _CaptureWriter()
+    app.state.ledger_writer = writer
+    registry = ProviderRegistry()
+    registry.register(adapter)
+
+    async def _db_override():
+        yield None
+
+    app.dependency_overrides[get_auth_context] = lambda: AuthContext(org_id="org-1", api_key="agk_test")
+    app.dependency_overrides[get_provider_registry] = lambda: registry
+    app.dependency_overrides[get_db_session] = _db_override
+    return TestClient(app), writer
+
+
+def test_streaming_usage_chunk_only_forwarded_when_requested() -> None:
+    body = {"model": "qwen:qwen-plus", "messages": [{"role": "user", "content": "Hi"}], "stream": True}
+    headers = {"Authorization": "Bearer agk_test"}
+
+    client, writer = _usage_client(UsageTailAdapter(send_usage=True))
+    r = client.post("/v1/chat/completions", headers=headers, json=body)
+    assert r.status_code == 200
+    assert '"prompt_tokens":7' not in r.text
+    assert writer.records[0].usage.prompt_tokens == 7
+    assert writer.records[0].usage.estimated is False
+
+    client, writer = _usage_client(UsageTailAdapter(send_usage=True))
+    r = client.post(
+        "/v1/chat/completions", headers=headers, json={**body, "stream_options": {"include_usage": True}}
+    )
+    assert '"prompt_tokens":7' in r.text
+    assert writer.records[0].usage.completion_tokens == 2
+
+
+def test_streaming_without_usage_records_estimate() -> None:
+    body = {"model": "qwen:qwen-plus", "messages": [{"role": "user", "content": "Hi"}], "stream": True}
+    client, writer = _usage_client(UsageTailAdapter(send_usage=False))
+    r = client.post("/v1/chat/completions", headers={"Authorization": "Bearer agk_test"}, json=body)
+    assert r.status_code == 200
+
+    usage = writer.records[0].usage
+    assert usage.estimated is True
+    assert usage.prompt_tokens > 0
+    assert usage.completion_tokens > 0
@@ -0,0 +1,166 @@
+"""Tests for per provider/model circuit breakers and their use in routing."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from aigate.core.errors import bad_gateway, gateway_timeout
+from aigate.domain.chat import ChatRequest, ChatResponse, Choice, Message
+from aigate.providers.registry import ProviderRegistry
+from aigate.routing.circuit_breaker import CircuitBreaker, CircuitBreakers
+from aigate.routing.router import route_and_call, route_and_stream
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+OPTIONS = {
+    "window_seconds": 10,
+    "min_requests": 4,
+    "error_rate": 0.5,
+    "timeout_rate": 0.5,
+    "open_seconds": 30,
+    "half_open_probes": 2,
+}
+
+
+def _breaker(clock: FakeClock) -> CircuitBreaker:
+    return CircuitBreaker("qwen", "qwen-plus", clock=clock, **OPTIONS)
+
+
+def _call(breaker: CircuitBreaker, exc: Exception | None = None) -> None:
+    try:
+        with breaker.guard():
+            if exc is not None:
+                raise exc
+    except HTTPException:
+        pass
+
+
+def test_trips_on_error_rate_and_fails_fast_with_retry_after() -> None:
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    _call(breaker)
+    _call(breaker)
+    _call(breaker, bad_gateway("down"))
+    assert breaker.state == "closed"  # below min_requests
+    _call(breaker, bad_gateway("down"))
+    assert breaker.state == "open"
+
+    clock.now = 12
+    with pytest.raises(HTTPException) as exc_info:
+        with breaker.guard():
+            pytest.fail("upstream must not be called while open")
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.headers == {"Retry-After": "18"}
+
+
+def test_trips_on_timeout_rate() -> None:
+    breaker = _breaker(FakeClock())
+    for exc in (None, None, gateway_timeout(), gateway_timeout()):
+        _call(breaker, exc)
+    assert breaker.state == "open"
+    assert breaker.snapshot()["window_timeouts"] == 2
+
+
+def test_client_errors_and_old_failures_do_not_trip() -> None:
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    for _ in range(4):
+        _call(breaker, bad_gateway("Qwen returned 400: bad", upstream_status=400))
+    assert breaker.state == "closed"
+
+    _call(breaker, bad_gateway("down"))
+    _call(breaker, bad_gateway("down"))
+    clock.now = 11  # the failures above aged out of the window
+    _call(breaker)
+    _call(breaker, bad_gateway("down"))
+    assert breaker.state == "closed"
+
+
+def test_half_open_probes_close_or_reopen() -> None:
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    for _ in range(4):
+        _call(breaker, bad_gateway("down"))
+    clock.now = 30
+    assert breaker.state == "half_open"
+
+    with breaker.guard():
+        with breaker.guard():
+            assert not breaker.admits()  # both probe slots taken
+    assert breaker.state == "closed"
+
+    for _ in range(4):
+        _call(breaker, bad_gateway("down"))
+    clock.now = 60
+    _call(breaker, bad_gateway("still down"))
+    assert breaker.state == "open"
+
+
+def test_cancelled_probe_frees_its_slot() -> None:
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    for _ in range(4):
+        _call(breaker, bad_gateway("down"))
+    clock.now = 30
+    with pytest.raises(asyncio.CancelledError):
+        with breaker.guard():
+            raise asyncio.CancelledError()
+    assert breaker.state == "half_open"
+    assert breaker.snapshot()["probes_in_flight"] == 0
+
+
+class _Adapter:
+    name = "qwen"
+
+    def __init__(self, failing: set[str]) -> None:
+        self.failing = failing
+        self.calls: list[str] = []
+
+    async def chat_completions(self, req: ChatRequest, timeout_seconds: float | None = None) -> ChatResponse:
+        self.calls.append(req.model)
+        if req.model in self.failing:
+            raise gateway_timeout("Qwen chat completion timed out")
+        return ChatResponse(
+            model=req.model,
+            choices=[Choice(index=0, message=Message(role="assistant", content="ok"), finish_reason="stop")],
+        )
+
+    async def stream_chat_completions(self, req: ChatRequest, timeout_seconds: float | None = None):
+        self.calls.append(req.model)
+        yield b"data: [DONE]\n"
+
+
+@pytest.mark.asyncio
+async def test_route_and_call_uses_fallback_while_open() -> None:
+    adapter = _Adapter(failing={"qwen-max"})
+    registry = ProviderRegistry()
+    registry.register(adapter)
+    breakers = CircuitBreakers(clock=FakeClock(), **OPTIONS)
+    req = ChatRequest(model="qwen:qwen-max", messages=[Message(role="user", content="hi")])
+
+    for _ in range(4):
+        with pytest.raises(HTTPException):
+            await route_and_call(registry, req, breakers=breakers)
+    with pytest.raises(HTTPException) as exc_info:
+        await route_and_call(registry, req, breakers=breakers)
+    assert exc_info.value.status_code == 503
+    assert adapter.calls == ["qwen-max"] * 4
+
+    resp = await route_and_call(registry, req, fallback_model="qwen:qwen-plus", breakers=breakers)
+    assert resp.model == "qwen:qwen-plus"
+    assert [b["state"] for b in breakers.snapshot()] == ["open", "closed"]  # qwen-max, qwen-plus
+
+    with pytest.raises(HTTPException) as exc_info:
+        async for _ in route_and_stream(registry, req, breakers=breakers):
+            pass
+    assert exc_info.value.status_code == 503
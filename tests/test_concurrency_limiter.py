@@ -0,0 +1,133 @@
+"""Tests for the adaptive upstream concurrency limiter."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from aigate.core.errors import bad_gateway
+from aigate.domain.chat import ChatRequest, ChatResponse, Choice, Message, Usage
+from aigate.routing.concurrency import AdaptiveLimiter, ConcurrencyLimitedAdapter
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_excess_calls_queue_in_order_until_a_slot_frees() -> None:
+    limiter = AdaptiveLimiter("qwen", initial_limit=1, min_limit=1)
+    order: list[str] = []
+    release = asyncio.Event()
+
+    async def call(name: str) -> None:
+        async with limiter.acquire():
+            order.append(name)
+            await release.wait()
+
+    tasks = [asyncio.create_task(call(n)) for n in ("a", "b", "c")]
+    await asyncio.sleep(0)
+    assert (limiter.in_flight, limiter.queue_depth) == (1, 2)
+    release.set()
+    await asyncio.gather(*tasks)
+    assert order == ["a", "b", "c"]
+    assert (limiter.in_flight, limiter.queue_depth) == (0, 0)
+
+
+@pytest.mark.asyncio
+async def test_queued_call_is_shed_when_deadline_cannot_be_met() -> None:
+    limiter = AdaptiveLimiter("qwen", initial_limit=1, min_limit=1)
+    async with limiter.acquire():
+        with pytest.raises(HTTPException) as exc_info:
+            async with limiter.acquire(timeout_seconds=0.01):
+                pytest.fail("must not be admitted while the only slot is held")
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.headers == {"Retry-After": "1"}
+    assert (limiter.in_flight, limiter.queue_depth) == (0, 0)
+
+
+@pytest.mark.asyncio
+async def test_failures_decrease_once_per_cooldown_and_saturation_increases() -> None:
+    clock = FakeClock()
+    limiter = AdaptiveLimiter("qwen", initial_limit=10, min_limit=1, clock=clock)
+    for _ in range(3):  # one burst of failures is one cut
+        with pytest.raises(HTTPException):
+            async with limiter.acquire():
+                raise bad_gateway("down")
+    assert limiter.limit == 9
+
+    clock.now = 5.0
+    with pytest.raises(HTTPException):
+        async with limiter.acquire():
+            raise bad_gateway("still down")
+    assert limiter.limit == 8  # 9 * 0.9
+
+    # Client errors are not overload signals.
+    with pytest.raises(HTTPException):
+        async with limiter.acquire():
+            raise bad_gateway("Qwen returned 400: bad", upstream_status=400)
+    assert limiter.limit == 8
+
+    # Completions while every slot is busy grow the limit by about one per limit calls.
+    slots = [limiter.acquire() for _ in range(8)]
+    for slot in slots:
+        await slot.__aenter__()
+    for _ in range(10):
+        await slots.pop(0).__aexit__(None, None, None)
+        if limiter.in_flight < limiter.limit:
+            slots.append(limiter.acquire())
+            await slots[-1].__aenter__()
+    assert limiter.limit == 9
+    for slot in slots:
+        await slot.__aexit__(None, None, None)
+
+
+@pytest.mark.asyncio
+async def test_adapter_reports_per_token_latency() -> None:
+    class Inner:
+        name = "qwen"
+
+        async def chat_completions(self, req: ChatRequest, timeout_seconds: float | None = None) -> ChatResponse:
+            return ChatResponse(
+                model=req.model,
+                choices=[Choice(index=0, message=Message(role="assistant", content="ok"), finish_reason="stop")],
+                usage=Usage(prompt_tokens=3, completion_tokens=10, total_tokens=13),
+            )
+
+    limiter = AdaptiveLimiter("qwen")
+    adapter = ConcurrencyLimitedAdapter(Inner(), limiter)
+    req = ChatRequest(model="qwen-plus", messages=[Message(role="user", content="hi")])
+    await adapter.chat_completions(req, timeout_seconds=5)
+    assert limiter._baseline is not None
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_long_stream_does_not_shed_unary_calls() -> None:
+    clock = FakeClock()
+    limiter = AdaptiveLimiter("qwen", initial_limit=1, min_limit=1, max_limit=1, clock=clock)
+    async with limiter.acquire(stream=True) as slot:
+        clock.now = 0.5
+        slot.first_byte()
+        clock.now = 100.0  # the stream stays open long after its first byte
+    assert limiter._call_seconds == {True: 0.5}
+
+    holder = limiter.acquire()
+    await holder.__aenter__()
+
+    async def queued() -> None:
+        async with limiter.acquire(timeout_seconds=5):
+            pass
+
+    task = asyncio.create_task(queued())
+    await asyncio.sleep(0)
+    assert limiter.queue_depth == 1  # waits for the slot instead of a 503 "deadline"
+    await holder.__aexit__(None, None, None)
+    await asyncio.wait_for(task, timeout=1)
+    assert (limiter.in_flight, limiter.queue_depth) == (0, 0)
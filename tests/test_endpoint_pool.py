@@ -0,0 +1,147 @@
+"""Tests for EndpointPool balancing, passive health and QwenAdapter over a pool."""
+
+from __future__ import annotations
+
+import random
+from collections import Counter
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from aigate.core.errors import bad_gateway, bad_request
+from aigate.domain.chat import ChatRequest, Message
+from aigate.providers.pool import Endpoint, EndpointPool, parse_endpoints
+from aigate.providers.qwen_adapter import QwenAdapter
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _endpoints(*weights: int) -> list[Endpoint]:
+    return [
+        Endpoint(name=f"ep{i}", client=httpx.AsyncClient(base_url=f"https://ep{i}.test"), weight=w)
+        for i, w in enumerate(weights)
+    ]
+
+
+def test_parse_endpoints() -> None:
+    specs = parse_endpoints("https://a/v1|2, https://b/v1||sk-b ,https://c/v1")
+    assert [(s.base_url, s.weight, s.api_key) for s in specs] == [
+        ("https://a/v1", 2, None),
+        ("https://b/v1", 1, "sk-b"),
+        ("https://c/v1", 1, None),
+    ]
+
+
+def test_round_robin_respects_weights_smoothly() -> None:
+    pool = EndpointPool("qwen", _endpoints(2, 1), strategy="round_robin")
+    picks = [pool.pick().name for _ in range(6)]
+    assert Counter(picks) == {"ep0": 4, "ep1": 2}
+    assert picks[:3] == ["ep0", "ep1", "ep0"]
+
+
+@pytest.mark.asyncio
+async def test_least_outstanding_avoids_busy_endpoint() -> None:
+    pool = EndpointPool("qwen", _endpoints(1, 1), strategy="least_outstanding")
+    async with pool.acquire() as first:
+        async with pool.acquire() as second:
+            assert second.endpoint is not first.endpoint
+    assert all(e.outstanding == 0 for e in pool.endpoints)
+
+
+@pytest.mark.asyncio
+async def test_p2c_ewma_prefers_fast_endpoint() -> None:
+    clock = FakeClock()
+    pool = EndpointPool("qwen", _endpoints(1, 1), strategy="p2c_ewma", clock=clock, rng=random.Random(1))
+    slow, fast = pool.endpoints
+    for endpoint, latency in ((slow, 2.0), (fast, 0.1)):
+        endpoint.ewma_seconds = latency
+    assert Counter(pool.pick().name for _ in range(20)) == {"ep1": 20}
+
+    # Observed latency moves the score: after fast gets slow, traffic shifts back.
+    for _ in range(10):
+        async with pool.acquire() as attempt:
+            clock.now += 5.0 if attempt.endpoint is fast else 0.01
+    assert fast.ewma_seconds > slow.ewma_seconds
+
+
+@pytest.mark.asyncio
+async def test_consecutive_failures_eject_endpoint_until_timeout() -> None:
+    clock = FakeClock()
+    pool = EndpointPool(
+        "qwen", _endpoints(1, 1), strategy="round_robin", eject_after_failures=2, eject_seconds=30, clock=clock
+    )
+    bad = pool.endpoints[0]
+    for _ in range(4):  # round-robin alternates, so ep0 fails twice
+        try:
+            async with pool.acquire() as attempt:
+                if attempt.endpoint is bad:
+                    raise bad_gateway("upstream down")
+        except HTTPException:
+            pass
+    assert bad.ejected_until == 30
+    assert {pool.pick().name for _ in range(4)} == {"ep1"}
+
+    clock.now = 31
+    assert {pool.pick().name for _ in range(4)} == {"ep0", "ep1"}
+
+
+@pytest.mark.asyncio
+async def test_client_errors_do_not_count_against_endpoint() -> None:
+    pool = EndpointPool("qwen", _endpoints(1), eject_after_failures=1)
+    with pytest.raises(HTTPException):
+        async with pool.acquire():
+            raise bad_request("invalid model")
+    with pytest.raises(HTTPException):
+        async with pool.acquire() as attempt:
+            attempt.upstream_status = 400
+            raise bad_gateway("Qwen returned 400")
+    assert pool.endpoints[0].consecutive_failures == 0
+
+
+@pytest.mark.asyncio
+async def test_qwen_adapter_fails_over_to_healthy_endpoint() -> None:
+    calls: Counter[str] = Counter()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls[request.url.host] += 1
+        if request.url.host == "down.test":
+            return httpx.Response(503, text="unavailable")
+        return httpx.Response(
+            200,
+            json={
+                "id": "c1",
+                "model": "qwen-plus",
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "hi"}}],
+            },
+        )
+
+    transport = httpx.MockTransport(handler)
+    pool = EndpointPool(
+        "qwen",
+        [
+            Endpoint(name="down", client=httpx.AsyncClient(transport=transport, base_url="https://down.test")),
+            Endpoint(name="up", client=httpx.AsyncClient(transport=transport, base_url="https://up.test")),
+        ],
+        strategy="round_robin",
+        eject_after_failures=1,
+    )
+    adapter = QwenAdapter(pool=pool)
+    req = ChatRequest(model="qwen-plus", messages=[Message(role="user", content="hi")])
+
+    results = []
+    for _ in range(4):
+        try:
+            results.append((await adapter.chat_completions(req)).choices[0].message.content)
+        except HTTPException as e:
+            results.append(e.status_code)
+    await pool.aclose()
+
+    assert results.count("hi") == 3
+    assert calls["down.test"] == 1
@@ -0,0 +1,83 @@
+"""Tests for weighted fair queuing of upstream concurrency slots."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from aigate.routing.concurrency import AdaptiveLimiter
+from aigate.routing.fair_queue import Admission, admission_for, parse_priority, parse_weights, set_admission
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+async def _served_order(limiter: AdaptiveLimiter, requests: list[Admission]) -> list[str]:
+    order: list[str] = []
+
+    async def call(admission: Admission) -> None:
+        set_admission(admission)
+        async with limiter.acquire():
+            order.append(admission.flow)
+
+    async with limiter.acquire():  # hold the only slot while everyone queues
+        tasks = [asyncio.create_task(call(a)) for a in requests]
+        await asyncio.sleep(0)
+        assert limiter.queue_depth == len(requests)
+    await asyncio.gather(*tasks)
+    return order
+
+
+@pytest.mark.asyncio
+async def test_a_noisy_org_does_not_starve_others() -> None:
+    limiter = AdaptiveLimiter("qwen", initial_limit=1, min_limit=1)
+    noisy, quiet = Admission("noisy"), Admission("quiet")
+    order = await _served_order(limiter, [noisy] * 6 + [quiet] * 2)
+    assert order[:4] == ["noisy", "quiet", "noisy", "quiet"]
+
+
+@pytest.mark.asyncio
+async def test_slots_are_shared_by_weight() -> None:
+    limiter = AdaptiveLimiter("qwen", initial_limit=1, min_limit=1)
+    order = await _served_order(limiter, [Admission("gold", weight=3.0)] * 6 + [Admission("free")] * 6)
+    assert order[:8].count("gold") == 6
+
+
+@pytest.mark.asyncio
+async def test_request_past_its_deadline_is_dropped_before_taking_a_slot() -> None:
+    clock = FakeClock()
+    limiter = AdaptiveLimiter("qwen", initial_limit=1, min_limit=1, clock=clock)
+    served: list[str] = []
+
+    async def call(name: str, timeout: float | None) -> None:
+        async with limiter.acquire(timeout):
+            served.append(name)
+
+    async with limiter.acquire():
+        late = asyncio.create_task(call("late", 5.0))
+        other = asyncio.create_task(call("other", None))
+        await asyncio.sleep(0)
+        clock.now = 6.0  # "late" can no longer finish in time
+    await other
+    with pytest.raises(HTTPException) as exc_info:
+        await late
+    assert exc_info.value.status_code == 503
+    assert served == ["other"]
+    assert (limiter.in_flight, limiter.queue_depth) == (0, 0)
+
+
+def test_admission_weight_comes_from_tier_and_priority() -> None:
+    weights = parse_weights("free=1, enterprise=4,bad")
+    assert weights == {"free": 1.0, "enterprise": 4.0}
+    assert parse_priority("Batch") == "batch"
+    assert parse_priority(None) == "interactive"
+    batch = admission_for("org-1", "enterprise", "batch", tier_weights=weights, batch_weight=0.25)
+    assert batch == Admission(flow="org-1:batch", weight=1.0, priority="batch")
+    assert admission_for("org-1", "unknown", "interactive", tier_weights=weights, batch_weight=0.25).weight == 1.0
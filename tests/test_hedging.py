@@ -0,0 +1,155 @@
+"""Tests for hedged unary calls: delay policy, budget and racing attempts."""
+
+from __future__ import annotations
+
+import asyncio
+import math
+
+import pytest
+
+from aigate.core.errors import bad_gateway
+from aigate.domain.chat import ChatRequest, ChatResponse, Choice, Message
+from aigate.providers.registry import ProviderRegistry
+from aigate.routing.hedging import HedgeBudget, Hedger, LatencyWindow
+from aigate.routing.router import parse_model_fallbacks, route_and_call
+
+
+def _resp(model: str = "qwen:qwen-plus", content: str = "ok") -> ChatResponse:
+    return ChatResponse(
+        model=model,
+        choices=[Choice(index=0, message=Message(role="assistant", content=content), finish_reason="stop")],
+    )
+
+
+def _hedger(**kwargs) -> Hedger:
+    opts = {"models": {"qwen:qwen-plus"}, "delay_seconds": 0.01, "min_delay_seconds": 0.0, "budget_ratio": 1.0}
+    opts.update(kwargs)
+    return Hedger(**opts)
+
+
+def test_delay_for_respects_config_and_header() -> None:
+    hedger = _hedger(delay_seconds=0.2, min_delay_seconds=0.05)
+    assert hedger.delay_for("qwen:qwen-plus", None) == 0.2
+    assert hedger.delay_for("qwen:qwen-max", None) is None
+    assert hedger.delay_for("qwen:qwen-max", "on") == 0.2
+    assert hedger.delay_for("qwen:qwen-plus", "off") is None
+    assert hedger.delay_for("qwen:qwen-max", "300") == 0.3
+    assert hedger.delay_for("qwen:qwen-max", "1") == 0.2  # "1" means on, not 1 ms
+    assert hedger.delay_for("qwen:qwen-max", "10") == 0.05  # clamped to the minimum
+    assert _hedger(models={"*"}).delay_for("any:model", None) == 0.01
+
+
+def test_delay_defaults_to_observed_p95() -> None:
+    hedger = _hedger(delay_seconds=None)
+    assert math.isinf(hedger.delay_for("qwen:qwen-plus", None))  # warming up
+
+    window = LatencyWindow()
+    for i in range(1, 101):
+        window.observe(i / 100)
+    assert window.p95 == pytest.approx(0.96)
+
+
+def test_budget_caps_hedges_to_ratio() -> None:
+    budget = HedgeBudget(0.25)
+    spent = 0
+    for _ in range(100):
+        budget.deposit()
+        spent += budget.try_spend()
+    assert spent == 25
+
+
+def test_parse_model_fallbacks() -> None:
+    assert parse_model_fallbacks(" qwen:qwen-max=qwen:qwen-plus, ,x") == {"qwen:qwen-max": "qwen:qwen-plus"}
+    assert parse_model_fallbacks(None) == {}
+    with pytest.raises(ValueError):
+        parse_model_fallbacks("qwen:qwen-max=qwen-plus")
+
+
+@pytest.mark.asyncio
+async def test_fast_primary_does_not_fire_hedge() -> None:
+    hedge_calls = 0
+
+    async def primary() -> ChatResponse:
+        return _resp(content="primary")
+
+    async def hedge() -> ChatResponse:
+        nonlocal hedge_calls
+        hedge_calls += 1
+        return _resp(content="hedge")
+
+    resp = await _hedger().run("qwen:qwen-plus", 0.5, primary, hedge)
+    assert resp.choices[0].message.content == "primary"
+    assert hedge_calls == 0
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_loses_to_hedge_and_is_cancelled() -> None:
+    primary_cancelled = asyncio.Event()
+
+    async def primary() -> ChatResponse:
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            primary_cancelled.set()
+            raise
+        return _resp(content="primary")
+
+    async def hedge() -> ChatResponse:
+        return _resp(content="hedge")
+
+    resp = await _hedger().run("qwen:qwen-plus", 0.01, primary, hedge)
+    assert resp.choices[0].message.content == "hedge"
+    await asyncio.wait_for(primary_cancelled.wait(), 1)
+
+
+@pytest.mark.asyncio
+async def test_failed_hedge_waits_for_primary() -> None:
+    async def primary() -> ChatResponse:
+        await asyncio.sleep(0.05)
+        return _resp(content="primary")
+
+    async def hedge() -> ChatResponse:
+        raise bad_gateway("upstream down")
+
+    resp = await _hedger().run("qwen:qwen-plus", 0.01, primary, hedge)
+    assert resp.choices[0].message.content == "primary"
+
+
+@pytest.mark.asyncio
+async def test_exhausted_budget_runs_single_attempt() -> None:
+    hedge_calls = 0
+
+    async def primary() -> ChatResponse:
+        await asyncio.sleep(0.03)
+        return _resp(content="primary")
+
+    async def hedge() -> ChatResponse:
+        nonlocal hedge_calls
+        hedge_calls += 1
+        return _resp(content="hedge")
+
+    resp = await _hedger(budget_ratio=0.0).run("qwen:qwen-plus", 0.01, primary, hedge)
+    assert resp.choices[0].message.content == "primary"
+    assert hedge_calls == 0
+
+
+class _SlowPlus:
+    """qwen-plus hangs, every other model answers at once."""
+
+    name = "qwen"
+
+    async def chat_completions(self, req: ChatRequest, timeout_seconds: float | None = None) -> ChatResponse:
+        if req.model == "qwen-plus":
+            await asyncio.sleep(10)
+        return _resp(model=req.model, content=req.model)
+
+
+@pytest.mark.asyncio
+async def test_route_and_call_hedges_to_fallback_model() -> None:
+    registry = ProviderRegistry()
+    registry.register(_SlowPlus())
+    req = ChatRequest(model="qwen:qwen-plus", messages=[Message(role="user", content="hi")])
+
+    resp = await route_and_call(registry, req, hedger=_hedger(), hedge_delay=0.01, fallback_model="qwen:qwen-turbo")
+    assert resp.model == "qwen:qwen-turbo"
+    assert resp.choices[0].message.content == "qwen-turbo"
@@ -1,11 +1,22 @@
-"""Tests for idempotency cache (get_cached_response / set_cached_response)."""
+"""Tests for idempotency cache (get_cached_response / set_cached_response) and in-flight locking."""
 
 from __future__ import annotations
 
+import asyncio
+
 import pytest
+from fastapi import HTTPException
+from redis.exceptions import NoScriptError
 
 from aigate.domain.chat import ChatResponse, Choice, Message
-from aigate.limits.idempotency import get_cached_response, set_cached_response
+from aigate.limits.idempotency import (
+    IdempotencyLock,
+    acquire_idempotency_lock,
+    begin_idempotent_request,
+    get_cached_response,
+    release_idempotency_lock,
+    set_cached_response,
+)
 
 
 class FakeRedis:
@@ -15,17 +26,36 @@ class FakeRedis:
     async def get(self, key: str) -> str | None:
         return self._store.get(key)
 
-    async def set(self, key: str, value: str, ex: int | None = None) -> None:
+    async def set(self, key: str, value: str, ex: int | None = None, nx: bool = False) -> bool | None:
+        if nx and key in self._store:
+            return None
         self._store[key] = value
+        return True
+
+    async def delete(self, key: str) -> int:
+        return 1 if self._store.pop(key, None) is not None else 0
+
+    async def evalsha(self, sha: str, numkeys: int, *args: str) -> int:
+        raise NoScriptError("NOSCRIPT")
+
+    async def eval(self, script: str, numkeys: int, key: str, expected: bytes) -> int:
+        # The release script: compare-and-delete.
+        if self._store.get(key) == expected:
+            return await self.delete(key)
+        return 0
+
+
+def _response(content: str = "hi") -> ChatResponse:
+    return ChatResponse(
+        model="qwen:qwen-turbo",
+        choices=[Choice(index=0, message=Message(role="assistant", content=content), finish_reason="stop")],
+    )
 
 
 @pytest.mark.asyncio
 async def test_set_then_get_returns_same_response() -> None:
     redis = FakeRedis()
-    resp = ChatResponse(
-        model="qwen:qwen-turbo",
-        choices=[Choice(index=0, message=Message(role="assistant", content="hi"), finish_reason="stop")],
-    )
+    resp = _response()
     await set_cached_response(redis, "org-1", "idem-abc", "hash1", resp, ttl_seconds=60)
 
     out = await get_cached_response(redis, "org-1", "idem-abc", "hash1")
@@ -38,10 +68,7 @@ async def test_set_then_get_returns_same_response() -> None:
 @pytest.mark.asyncio
 async def test_get_different_request_hash_returns_conflict() -> None:
     redis = FakeRedis()
-    resp = ChatResponse(
-        model="qwen:qwen-turbo",
-        choices=[Choice(index=0, message=Message(role="assistant", content="hi"), finish_reason="stop")],
-    )
+    resp = _response()
     await set_cached_response(redis, "org-1", "idem-abc", "hash1", resp, ttl_seconds=60)
 
     out = await get_cached_response(redis, "org-1", "idem-abc", "hash2")
@@ -53,3 +80,90 @@ async def test_get_missing_key_returns_none() -> None:
     redis = FakeRedis()
     out = await get_cached_response(redis, "org-1", "idem-xyz", "hash1")
     assert out is None
+
+
+@pytest.mark.asyncio
+async def test_lock_is_pending_until_response_is_stored() -> None:
+    redis = FakeRedis()
+    assert await acquire_idempotency_lock(redis, "org-1", "idem-abc", "hash1", lease_seconds=30)
+    assert not await acquire_idempotency_lock(redis, "org-1", "idem-abc", "hash1", lease_seconds=30)
+    assert await get_cached_response(redis, "org-1", "idem-abc", "hash1") == "pending"
+    assert await get_cached_response(redis, "org-1", "idem-abc", "hash2") == "conflict"
+
+    await set_cached_response(redis, "org-1", "idem-abc", "hash1", _response(), ttl_seconds=60)
+    assert isinstance(await get_cached_response(redis, "org-1", "idem-abc", "hash1"), ChatResponse)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicate_waits_for_owner() -> None:
+    redis = FakeRedis()
+    owner = await begin_idempotent_request(
+        redis, "org-1", "idem-abc", "hash1", lease_seconds=30, wait_seconds=5, poll_interval_seconds=0.01
+    )
+    assert isinstance(owner, IdempotencyLock)
+
+    follower = asyncio.create_task(
+        begin_idempotent_request(
+            redis, "org-1", "idem-abc", "hash1", lease_seconds=30, wait_seconds=5, poll_interval_seconds=0.01
+        )
+    )
+    await asyncio.sleep(0.05)
+    assert not follower.done()
+
+    await set_cached_response(redis, "org-1", "idem-abc", "hash1", _response("done"), ttl_seconds=60)
+    out = await asyncio.wait_for(follower, timeout=1)
+    assert isinstance(out, ChatResponse) and out.choices[0].message.content == "done"
+
+
+@pytest.mark.asyncio
+async def test_follower_takes_over_after_owner_releases() -> None:
+    redis = FakeRedis()
+    owner = await begin_idempotent_request(redis, "org-1", "k", "h", lease_seconds=30, wait_seconds=5)
+    assert isinstance(owner, IdempotencyLock)
+
+    follower = asyncio.create_task(
+        begin_idempotent_request(redis, "org-1", "k", "h", lease_seconds=30, wait_seconds=5, poll_interval_seconds=0.01)
+    )
+    await asyncio.sleep(0.03)
+    await release_idempotency_lock(redis, owner)
+    # The follower now owns the key and must call upstream itself.
+    taken_over = await asyncio.wait_for(follower, timeout=1)
+    assert isinstance(taken_over, IdempotencyLock) and taken_over.token != owner.token
+    assert await get_cached_response(redis, "org-1", "k", "h") == "pending"
+
+
+@pytest.mark.asyncio
+async def test_stale_owner_cannot_release_new_owners_lock() -> None:
+    redis = FakeRedis()
+    stale = await acquire_idempotency_lock(redis, "org-1", "k", "h", lease_seconds=30)
+    assert stale is not None
+    # The stale owner's lease expires and a duplicate takes the key over.
+    await redis.delete("idempotency:org-1:k")
+    current = await acquire_idempotency_lock(redis, "org-1", "k", "h", lease_seconds=30)
+    assert current is not None
+
+    await release_idempotency_lock(redis, stale)
+    assert await get_cached_response(redis, "org-1", "k", "h") == "pending"
+    await release_idempotency_lock(redis, current)
+    assert await get_cached_response(redis, "org-1", "k", "h") is None
+
+
+@pytest.mark.asyncio
+async def test_release_keeps_finished_response() -> None:
+    redis = FakeRedis()
+    lock = await acquire_idempotency_lock(redis, "org-1", "k", "h", lease_seconds=30)
+    assert lock is not None
+    await set_cached_response(redis, "org-1", "k", "h", _response(), ttl_seconds=60)
+    await release_idempotency_lock(redis, lock)
+    assert isinstance(await get_cached_response(redis, "org-1", "k", "h"), ChatResponse)
+
+
+@pytest.mark.asyncio
+async def test_follower_gets_409_when_owner_exceeds_deadline() -> None:
+    redis = FakeRedis()
+    await acquire_idempotency_lock(redis, "org-1", "k", "h", lease_seconds=30)
+    with pytest.raises(HTTPException) as exc:
+        await begin_idempotent_request(
+            redis, "org-1", "k", "h", lease_seconds=30, wait_seconds=0.05, poll_interval_seconds=0.01
+        )
+    assert exc.value.status_code == 409
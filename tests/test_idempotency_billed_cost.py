@@ -18,12 +18,18 @@ class FakeRedis:
     async def get(self, key: str) -> str | None:
         return self._store.get(key)
 
-    async def set(self, key: str, value: str, ex: int | None = None) -> None:
+    async def set(self, key: str, value: str, ex: int | None = None, nx: bool = False) -> bool | None:
+        if nx and key in self._store:
+            return None
         self._store[key] = value
+        return True
+
+    async def delete(self, key: str) -> int:
+        return 1 if self._store.pop(key, None) is not None else 0
 
-    async def eval(self, script: str, numkeys: int, *args: object) -> int:
+    async def evalsha(self, sha: str, numkeys: int, *args: object) -> list[int]:
         # For rate limiting in chat_completions; always allow.
-        return 1
+        return [0, 0, 59, 1000]
 
 
 class DummyAdapter(ProviderAdapter):
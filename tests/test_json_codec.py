@@ -0,0 +1,62 @@
+"""Tests for the shared JSON codec (orjson or pydantic-core) and its callers."""
+
+from __future__ import annotations
+
+import json
+import logging
+from decimal import Decimal
+
+import pytest
+
+from aigate.core import jsoncodec
+from aigate.core.logging import JsonFormatter
+from aigate.domain.chat import ChatResponse, Choice, Message, Usage
+
+BACKENDS = [pytest.param(jsoncodec._pydantic_dumps, jsoncodec._pydantic_loads, id="pydantic-core")]
+if jsoncodec.orjson is not None:
+    BACKENDS.append(pytest.param(jsoncodec._orjson_dumps, jsoncodec.orjson.loads, id="orjson"))
+
+DOC = {"msg": "Привет, \"мир\"\n", "n": [1, 2.5, None, True], "nested": {"emoji": "🙂", "ctrl": "\x01"}}
+
+
+@pytest.mark.parametrize(("dumps", "loads"), BACKENDS)
+def test_output_matches_compact_stdlib_json(dumps, loads) -> None:
+    expected = json.dumps(DOC, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    assert dumps(DOC) == expected
+    assert loads(expected) == DOC
+    assert loads(expected.decode("utf-8")) == DOC
+
+
+@pytest.mark.parametrize(("dumps", "loads"), BACKENDS)
+def test_decimal_is_written_as_a_string_like_model_dump(dumps, loads) -> None:
+    usage = Usage(prompt_tokens=1, raw_cost=Decimal("0.000123"), billed_cost=Decimal("1E-7"))
+    assert loads(dumps({"cost": Decimal("0.000123"), "tiny": Decimal("1E-7")})) == {
+        "cost": "0.000123",
+        "tiny": "1E-7",
+    }
+    assert loads(dumps(usage.model_dump(mode="json"))) == json.loads(usage.model_dump_json())
+
+
+@pytest.mark.parametrize(("dumps", "loads"), BACKENDS)
+def test_invalid_input_raises_value_error(dumps, loads) -> None:
+    with pytest.raises(ValueError):
+        loads(b'{"a":')
+    assert dumps({"x": float("nan")}) == b'{"x":null}'
+
+
+def test_model_bytes_equal_model_dump_json() -> None:
+    resp = ChatResponse(
+        model="qwen:qwen-plus",
+        choices=[Choice(message=Message(role="assistant", content="Готово"))],
+        usage=Usage(billed_cost=Decimal("0.0042")),
+    )
+    assert jsoncodec.dumps_model(resp) == resp.model_dump_json().encode("utf-8")
+
+
+def test_log_lines_are_one_json_object_with_unescaped_text() -> None:
+    record = logging.LogRecord("aigate", logging.INFO, __file__, 1, "запрос %s", ("ok",), None)
+    record.extra = {"org_id": "org-1", "cost": Decimal("0.5")}
+    line = JsonFormatter().format(record)
+    assert "запрос ok" in line
+    data = json.loads(line)
+    assert (data["msg"], data["org_id"], data["cost"]) == ("запрос ok", "org-1", "0.5")
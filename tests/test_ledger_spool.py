@@ -0,0 +1,245 @@
+"""Tests for the on-disk ledger spool and its replay."""
+
+from __future__ import annotations
+
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from aigate.storage.ledger import LedgerUsage, LedgerWriter, new_ledger_record
+from aigate.storage.spool import DEAD_LETTER_FILE, LedgerSpool, read_segment, replay_records, replay_segment
+
+
+def _record(i: int):
+    return new_ledger_record(
+        request_id=f"req-{i}",
+        org_id="org-1",
+        provider="qwen",
+        model="qwen-plus",
+        status_code=200,
+        latency_ms=12,
+        request_hash="h",
+        idempotency_key=None,
+        usage=LedgerUsage(
+            prompt_tokens=10,
+            completion_tokens=5,
+            total_tokens=15,
+            raw_cost=None,
+            billed_cost=Decimal("0.00001550"),
+        ),
+    )
+
+
+@pytest.mark.asyncio
+async def test_spool_round_trips_records(tmp_path: Path) -> None:
+    spool = LedgerSpool(tmp_path, segment_max_bytes=1 << 20)
+    records = [_record(i) for i in range(3)]
+    spool.append(records)
+    await spool.seal()
+
+    [segment] = spool.sealed_segments()
+    assert read_segment(segment) == records
+
+
+@pytest.mark.asyncio
+async def test_torn_tail_is_ignored(tmp_path: Path) -> None:
+    spool = LedgerSpool(tmp_path, segment_max_bytes=1 << 20)
+    spool.append([_record(1), _record(2)])
+    await spool.seal()
+    [segment] = spool.sealed_segments()
+    segment.write_bytes(segment.read_bytes()[:-3])
+
+    assert [r.request_id for r in read_segment(segment)] == ["req-1"]
+
+
+@pytest.mark.asyncio
+async def test_sequence_continues_after_restart(tmp_path: Path) -> None:
+    first = LedgerSpool(tmp_path, segment_max_bytes=1 << 20)
+    first.append([_record(1)])
+    first.close()
+
+    second = LedgerSpool(tmp_path, segment_max_bytes=1 << 20)
+    second.append([_record(2)])
+    await second.seal()
+    assert [p.name for p in second.sealed_segments()] == ["ledger-000000000000.seg", "ledger-000000000001.seg"]
+
+
+class _ReplaySession:
+    def __init__(self, existing_ids: set[str]) -> None:
+        self.existing_ids = existing_ids
+        self.inserted: list[tuple[str, int]] = []
+
+    async def execute(self, stmt, rows=None):  # noqa: ANN001
+        if rows is None:
+            ids = self.existing_ids
+
+            class _Result:
+                def scalars(self_inner):  # noqa: N805
+                    return iter(ids)
+
+            return _Result()
+        self.inserted.append((stmt.table.name, len(rows)))
+        return None
+
+    async def commit(self) -> None:
+        return None
+
+
+@pytest.mark.asyncio
+async def test_replay_skips_records_already_written() -> None:
+    records = [_record(i) for i in range(3)]
+    session = _ReplaySession(existing_ids={records[0].id})
+    inserted = await replay_records(session, records)
+    assert inserted == 2
+    assert session.inserted == [("requests", 2), ("usage_events", 2)]
+
+
+class _FailingSession:
+    async def __aenter__(self):
+        raise ConnectionError("postgres down")
+
+    async def __aexit__(self, *exc: object) -> None:
+        return None
+
+
+@pytest.mark.asyncio
+async def test_writer_spools_batch_when_db_write_fails(tmp_path: Path) -> None:
+    spool = LedgerSpool(tmp_path, segment_max_bytes=1 << 20)
+    writer = LedgerWriter(
+        lambda: _FailingSession(),
+        max_queue=10,
+        batch_size=10,
+        flush_interval_ms=10,
+        enqueue_timeout_ms=10,
+        spool=spool,
+        write_budget_ms=100,
+    )
+    await writer.enqueue(_record(1))
+    await writer.close()
+    await spool.seal()
+
+    [segment] = spool.sealed_segments()
+    assert [r.request_id for r in read_segment(segment)] == ["req-1"]
+
+
+class _Sessions:
+    """sessionmaker stand-in: rows whose id is in `reject` fail like an FK violation; `down` fails every call."""
+
+    def __init__(self, reject: set[str] = frozenset(), down: bool = False) -> None:
+        self.reject = reject
+        self.down = down
+        self.inserted: list[str] = []
+
+    def __call__(self) -> _Sessions:
+        return self
+
+    async def __aenter__(self) -> _Sessions:
+        if self.down:
+            raise OperationalError("connect", {}, ConnectionRefusedError("postgres down"))
+        return self
+
+    async def __aexit__(self, *exc: object) -> None:
+        return None
+
+    async def execute(self, stmt, rows=None):  # noqa: ANN001
+        if rows is None:
+
+            class _Result:
+                def scalars(self_inner):  # noqa: N805
+                    return iter(())
+
+            return _Result()
+        if stmt.table.name == "requests":
+            if any(row["id"] in self.reject for row in rows):
+                raise IntegrityError("insert", {}, Exception("violates foreign key constraint"))
+            self.inserted += [row["id"] for row in rows]
+        return None
+
+    async def commit(self) -> None:
+        return None
+
+
+@pytest.mark.asyncio
+async def test_rejected_record_is_dead_lettered_and_the_rest_replayed(tmp_path: Path) -> None:
+    spool = LedgerSpool(tmp_path, segment_max_bytes=1 << 20)
+    records = [_record(i) for i in range(5)]
+    spool.append(records)
+    await spool.seal()
+    [segment] = spool.sealed_segments()
+
+    sessions = _Sessions(reject={records[2].id})
+    assert await replay_segment(spool, segment, sessions, batch_size=10) == 4
+    assert sessions.inserted == [r.id for r in records if r is not records[2]]
+    assert spool.sealed_segments() == []
+    assert [r.id for r in read_segment(tmp_path / DEAD_LETTER_FILE)] == [records[2].id]
+
+
+@pytest.mark.asyncio
+async def test_segment_is_kept_while_postgres_is_unreachable(tmp_path: Path) -> None:
+    spool = LedgerSpool(tmp_path, segment_max_bytes=1 << 20)
+    spool.append([_record(1)])
+    await spool.seal()
+    [segment] = spool.sealed_segments()
+
+    with pytest.raises(OperationalError):
+        await replay_segment(spool, segment, _Sessions(down=True), batch_size=10)
+    assert spool.sealed_segments() == [segment]
+    assert not (tmp_path / DEAD_LETTER_FILE).exists()
+
+
+@pytest.mark.asyncio
+async def test_replayer_survives_disk_errors(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    import asyncio
+    import errno
+
+    from prometheus_client import REGISTRY
+
+    from aigate.storage.spool import run_spool_replayer
+
+    spool = LedgerSpool(tmp_path, segment_max_bytes=1 << 20)
+    calls = 0
+
+    async def failing_sync() -> None:
+        nonlocal calls
+        calls += 1
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(spool, "sync", failing_sync)
+    before = REGISTRY.get_sample_value("aigate_ledger_spool_errors_total", {"operation": "sync"}) or 0.0
+    task = asyncio.create_task(
+        run_spool_replayer(spool, _Sessions(), fsync_interval_ms=1, replay_interval_seconds=60, batch_size=10)
+    )
+    await asyncio.sleep(0.05)
+    assert not task.done()
+    task.cancel()
+    assert calls > 1
+    assert REGISTRY.get_sample_value("aigate_ledger_spool_errors_total", {"operation": "sync"}) - before == calls
+
+
+@pytest.mark.asyncio
+async def test_full_queue_spools_off_the_event_loop(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    import asyncio
+    import threading
+
+    spool = LedgerSpool(tmp_path, segment_max_bytes=1 << 20)
+    append = spool.append
+    threads: list[threading.Thread] = []
+
+    def recording_append(records):  # noqa: ANN001
+        threads.append(threading.current_thread())
+        append(records)
+
+    monkeypatch.setattr(spool, "append", recording_append)
+    writer = LedgerWriter(
+        lambda: _FailingSession(), max_queue=1, batch_size=10, flush_interval_ms=10, enqueue_timeout_ms=10, spool=spool
+    )
+    # Writer not started: the second record finds the queue full.
+    assert await writer.enqueue(_record(1))
+    assert await asyncio.wait_for(writer.enqueue(_record(2)), timeout=1)
+    await spool.seal()
+
+    assert threads and threads[0] is not threading.main_thread()
+    [segment] = spool.sealed_segments()
+    assert [r.request_id for r in read_segment(segment)] == ["req-2"]
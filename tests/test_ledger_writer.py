@@ -0,0 +1,114 @@
+"""Tests for the batched ledger writer (LedgerWriter)."""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import replace
+
+import pytest
+from sqlalchemy.exc import DataError
+
+from aigate.storage.ledger import LedgerUsage, LedgerWriter, new_ledger_record
+
+
+class _FakeSession:
+    def __init__(self, batches: list[tuple[str, int]]) -> None:
+        self._batches = batches
+
+    async def __aenter__(self) -> _FakeSession:
+        return self
+
+    async def __aexit__(self, *exc: object) -> None:
+        return None
+
+    async def execute(self, stmt, rows) -> None:  # noqa: ANN001
+        self._batches.append((stmt.table.name, len(rows)))
+
+    async def commit(self) -> None:
+        return None
+
+
+def _sessionmaker(batches: list[tuple[str, int]]):
+    return lambda: _FakeSession(batches)
+
+
+def _record(i: int, *, with_usage: bool = True):
+    usage = LedgerUsage(prompt_tokens=1, completion_tokens=2, total_tokens=3, raw_cost=None, billed_cost=None)
+    return new_ledger_record(
+        request_id=f"req-{i}",
+        org_id="org-1",
+        provider="qwen",
+        model="qwen-plus",
+        status_code=200,
+        latency_ms=5,
+        request_hash="h",
+        idempotency_key=None,
+        usage=usage if with_usage else None,
+    )
+
+
+@pytest.mark.asyncio
+async def test_writer_flushes_full_batches_as_multi_row_inserts() -> None:
+    batches: list[tuple[str, int]] = []
+    writer = LedgerWriter(
+        _sessionmaker(batches), max_queue=100, batch_size=3, flush_interval_ms=10_000, enqueue_timeout_ms=10
+    )
+    writer.start()
+    for i in range(3):
+        assert await writer.enqueue(_record(i, with_usage=i != 1))
+    for _ in range(20):
+        if batches:
+            break
+        await asyncio.sleep(0.01)
+    assert batches == [("requests", 3), ("usage_events", 2)]
+    await writer.close()
+
+
+@pytest.mark.asyncio
+async def test_close_flushes_pending_records() -> None:
+    batches: list[tuple[str, int]] = []
+    writer = LedgerWriter(
+        _sessionmaker(batches), max_queue=100, batch_size=50, flush_interval_ms=10_000, enqueue_timeout_ms=10
+    )
+    writer.start()
+    for i in range(5):
+        await writer.enqueue(_record(i, with_usage=False))
+    await writer.close()
+    assert sum(n for table, n in batches if table == "requests") == 5
+
+
+@pytest.mark.asyncio
+async def test_enqueue_drops_after_backpressure_timeout() -> None:
+    writer = LedgerWriter(
+        _sessionmaker([]), max_queue=1, batch_size=10, flush_interval_ms=10, enqueue_timeout_ms=10
+    )
+    # Writer not started: the queue never drains.
+    assert await writer.enqueue(_record(1)) is True
+    assert await writer.enqueue(_record(2)) is False
+
+
+class _RejectingSession(_FakeSession):
+    """Rejects any INSERT containing a request_id longer than the column (like Postgres would)."""
+
+    async def execute(self, stmt, rows) -> None:  # noqa: ANN001
+        if any(len(row.get("request_id", "")) > 64 for row in rows):
+            raise DataError("insert", {}, Exception("value too long for type character varying(64)"))
+        await super().execute(stmt, rows)
+
+
+@pytest.mark.asyncio
+async def test_rejected_batch_is_retried_record_by_record() -> None:
+    batches: list[tuple[str, int]] = []
+    writer = LedgerWriter(
+        lambda: _RejectingSession(batches),
+        max_queue=100,
+        batch_size=50,
+        flush_interval_ms=10_000,
+        enqueue_timeout_ms=10,
+    )
+    records = [_record(i, with_usage=False) for i in range(4)]
+    records[1] = replace(records[1], request_id="x" * 65)
+    for record in records:
+        await writer.enqueue(record)
+    await writer.close()
+    assert batches == [("requests", 1)] * 3  # every record but the bad one
@@ -1,4 +1,7 @@
-"""Tests for compute_billed_cost (billed_cost from raw_cost+markup or from base prices)."""
+"""Tests for compute_billed_cost (billed_cost from raw_cost+markup or from base prices).
+
+Every case runs against both the per-request DB path and the in-memory PriceIndex.
+"""
 
 from __future__ import annotations
 
@@ -7,6 +10,7 @@ from unittest.mock import AsyncMock, patch
 
 import pytest
 
+from aigate.storage.pricing import PriceIndex
 from aigate.storage.repos import compute_billed_cost
 
 
@@ -16,66 +20,97 @@ class _FakeRule:
         markup_pct: Decimal,
         input_price_per_1k: Decimal | None = None,
         output_price_per_1k: Decimal | None = None,
+        *,
+        org_id: str = "org-1",
+        provider: str = "qwen",
+        model: str | None = None,
     ) -> None:
+        self.org_id = org_id
+        self.provider = provider
+        self.model = model
         self.markup_pct = markup_pct
         self.input_price_per_1k = input_price_per_1k
         self.output_price_per_1k = output_price_per_1k
 
 
-@pytest.mark.asyncio
-async def test_compute_billed_cost_with_raw_cost_applies_markup() -> None:
+async def _compute_via_db(rule: _FakeRule | None, **kwargs):
     session = AsyncMock()
     with patch("aigate.storage.repos.get_price_rule", new_callable=AsyncMock) as get_rule:
-        get_rule.return_value = _FakeRule(markup_pct=Decimal("10"))
-        raw, billed = await compute_billed_cost(
-            session,
-            org_id="org-1",
-            provider="qwen",
-            model="qwen-turbo",
-            prompt_tokens=100,
-            completion_tokens=50,
-            raw_cost_from_provider=Decimal("0.01"),
-        )
+        get_rule.return_value = rule
+        return await compute_billed_cost(session, **kwargs)
+
+
+async def _compute_via_index(rule: _FakeRule | None, **kwargs):
+    index = PriceIndex(ttl_seconds=60)
+    index.replace([rule] if rule is not None else [])
+    return index.compute_billed_cost(**kwargs)
+
+
+@pytest.fixture(params=[_compute_via_db, _compute_via_index], ids=["db", "index"])
+def compute(request):
+    return request.param
+
+
+@pytest.mark.asyncio
+async def test_compute_billed_cost_with_raw_cost_applies_markup(compute) -> None:
+    raw, billed = await compute(
+        _FakeRule(markup_pct=Decimal("10")),
+        org_id="org-1",
+        provider="qwen",
+        model="qwen-turbo",
+        prompt_tokens=100,
+        completion_tokens=50,
+        raw_cost_from_provider=Decimal("0.01"),
+    )
     assert raw == Decimal("0.01")
     assert billed == Decimal("0.011")  # 0.01 * 1.1
 
 
 @pytest.mark.asyncio
-async def test_compute_billed_cost_without_raw_uses_base_prices() -> None:
-    session = AsyncMock()
-    with patch("aigate.storage.repos.get_price_rule", new_callable=AsyncMock) as get_rule:
-        get_rule.return_value = _FakeRule(
+async def test_compute_billed_cost_without_raw_uses_base_prices(compute) -> None:
+    raw, billed = await compute(
+        _FakeRule(
             markup_pct=Decimal("0"),
             input_price_per_1k=Decimal("0.001"),
             output_price_per_1k=Decimal("0.002"),
-        )
-        raw, billed = await compute_billed_cost(
-            session,
-            org_id="org-1",
-            provider="qwen",
-            model="qwen-turbo",
-            prompt_tokens=1000,
-            completion_tokens=500,
-            raw_cost_from_provider=None,
-        )
+        ),
+        org_id="org-1",
+        provider="qwen",
+        model="qwen-turbo",
+        prompt_tokens=1000,
+        completion_tokens=500,
+        raw_cost_from_provider=None,
+    )
     assert raw is None
     # 1 * 0.001 + 0.5 * 0.002 = 0.001 + 0.001 = 0.002
     assert billed == Decimal("0.002")
 
 
 @pytest.mark.asyncio
-async def test_compute_billed_cost_no_rule_returns_none_none() -> None:
-    session = AsyncMock()
-    with patch("aigate.storage.repos.get_price_rule", new_callable=AsyncMock) as get_rule:
-        get_rule.return_value = None
-        raw, billed = await compute_billed_cost(
-            session,
-            org_id="org-1",
-            provider="qwen",
-            model="qwen-turbo",
-            prompt_tokens=100,
-            completion_tokens=50,
-            raw_cost_from_provider=None,
-        )
+async def test_compute_billed_cost_no_rule_returns_none_none(compute) -> None:
+    raw, billed = await compute(
+        None,
+        org_id="org-1",
+        provider="qwen",
+        model="qwen-turbo",
+        prompt_tokens=100,
+        completion_tokens=50,
+        raw_cost_from_provider=None,
+    )
     assert raw is None
     assert billed is None
+
+
+def test_price_index_prefers_exact_model_then_newest_provider_default() -> None:
+    index = PriceIndex(ttl_seconds=60)
+    # Newest first, as loaded by PriceIndex.refresh.
+    index.replace(
+        [
+            _FakeRule(markup_pct=Decimal("5"), model=None),
+            _FakeRule(markup_pct=Decimal("20"), model="qwen-max"),
+            _FakeRule(markup_pct=Decimal("1"), model=None),
+        ]
+    )
+    assert index.lookup(org_id="org-1", provider="qwen", model="qwen-max").markup_pct == Decimal("20")
+    assert index.lookup(org_id="org-1", provider="qwen", model="qwen-plus").markup_pct == Decimal("5")
+    assert index.lookup(org_id="org-2", provider="qwen", model="qwen-plus") is None
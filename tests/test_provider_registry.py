@@ -0,0 +1,96 @@
+"""Tests for the long-lived provider registry: config-driven build and adapter lifecycle hooks."""
+
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from aigate.core.config import Settings
+from aigate.main import create_app
+from aigate.providers.factory import build_registry
+from aigate.providers.pool import Endpoint, EndpointPool
+from aigate.providers.qwen_adapter import QwenAdapter
+from aigate.providers.registry import ProviderRegistry
+from aigate.routing.concurrency import ConcurrencyLimitedAdapter
+
+
+def _models_pool(calls: list[str], *, down: str | None = None) -> EndpointPool:
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.host)
+        if request.url.host == down:
+            raise httpx.ConnectError("refused", request=request)
+        return httpx.Response(200, json={"data": [{"id": "qwen-plus"}]})
+
+    transport = httpx.MockTransport(handler)
+    return EndpointPool(
+        "qwen",
+        [
+            Endpoint(name=host, client=httpx.AsyncClient(transport=transport, base_url=f"https://{host}"))
+            for host in ("a.example", "b.example")
+        ],
+    )
+
+
+def test_registry_is_built_from_settings() -> None:
+    registry = build_registry(Settings(providers="qwen,unknown", qwen_api_key="k", qwen_concurrency_enabled=True))
+    assert registry.list_providers() == ["qwen"]
+    assert isinstance(registry.get("qwen"), ConcurrencyLimitedAdapter)
+    assert build_registry(Settings(providers="qwen", qwen_api_key=None)).list_providers() == []
+
+
+@pytest.mark.asyncio
+async def test_warmup_opens_every_endpoint_and_serves_models_from_cache() -> None:
+    calls: list[str] = []
+    adapter = QwenAdapter(pool=_models_pool(calls, down="b.example"))
+    registry = ProviderRegistry()
+    registry.register(adapter)
+
+    await registry.warmup(timeout_seconds=1.0)
+    assert sorted(calls) == ["a.example", "b.example"]
+    assert [m.id for m in await registry.list_models()] == ["qwen-plus"]
+    assert len(calls) == 2  # served from the warmup cache
+    assert registry.health() == {"qwen": True}
+    await registry.aclose()
+
+
+@pytest.mark.asyncio
+async def test_drain_waits_for_in_flight_calls() -> None:
+    calls: list[str] = []
+    pool = _models_pool(calls)
+    adapter = QwenAdapter(pool=pool)
+    done = asyncio.Event()
+
+    async def in_flight() -> None:
+        async with pool.acquire():
+            await done.wait()
+
+    task = asyncio.create_task(in_flight())
+    await asyncio.sleep(0)
+    assert pool.outstanding == 1
+
+    drain = asyncio.create_task(adapter.drain(timeout_seconds=5.0))
+    await asyncio.sleep(0.1)
+    assert not drain.done()
+    done.set()
+    await asyncio.wait_for(drain, timeout=1.0)
+    await task
+    await adapter.drain(timeout_seconds=0.0)  # nothing in flight: returns at once
+    await adapter.aclose()
+
+
+def test_requests_share_the_startup_registry() -> None:
+    calls: list[str] = []
+    registry = ProviderRegistry()
+    registry.register(QwenAdapter(pool=_models_pool(calls)))
+    app = create_app()
+    app.state.provider_registry = registry
+    client = TestClient(app)
+
+    assert client.get("/debug/providers").status_code == 401
+    assert client.get("/debug/providers", headers={"Authorization": "Bearer k"}).json() == {"qwen": True}
+    for _ in range(2):
+        assert [m["id"] for m in client.get("/v1/models").json()] == ["qwen-plus"]
+    assert len(calls) == 1  # the second request hit the same adapter and its models cache
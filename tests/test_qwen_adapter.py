@@ -1,8 +1,6 @@
 from __future__ import annotations
 
-import contextlib
 import json
-from unittest.mock import MagicMock
 
 import httpx
 import pytest
@@ -157,33 +155,26 @@ async def test_qwen_adapter_vision_content_base64() -> None:
 @pytest.mark.asyncio
 async def test_qwen_adapter_stream_chat_completions() -> None:
     """Streaming: yields SSE chunks with model prefix applied."""
-    lines = [
+    events = [
         'data: {"id":"c1","model":"qwen-plus","choices":[{"index":0,"delta":{"role":"assistant","content":""}}]}',
         'data: {"id":"c1","model":"qwen-plus","choices":[{"index":0,"delta":{"content":"Hi"}}]}',
         'data: {"id":"c1","model":"qwen-plus","choices":[{"index":0,"delta":{},"finish_reason":"stop"}],"usage":{"prompt_tokens":1,"completion_tokens":1}}',
         "data: [DONE]",
     ]
+    body = ("\n\n".join(events) + "\n\n").encode("utf-8")
 
-    async def aiter_lines():
-        for line in lines:
-            yield line
+    async def split_body():
+        # Event boundaries do not line up with network reads.
+        for i in range(0, len(body), 7):
+            yield body[i : i + 7]
 
-    mock_resp = MagicMock()
-    mock_resp.status_code = 200
-    mock_resp.aiter_lines = aiter_lines
-
-    @contextlib.asynccontextmanager
-    async def fake_stream(*args, **kwargs):
-        yield mock_resp
-
-    transport = httpx.MockTransport(lambda r: httpx.Response(200))
+    transport = httpx.MockTransport(lambda r: httpx.Response(200, content=split_body()))
     async with httpx.AsyncClient(
         transport=transport,
         base_url="https://dashscope-intl.aliyuncs.com/compatible-mode/v1",
         headers={"Authorization": "Bearer test-key"},
     ) as client:
         adapter = QwenAdapter(client=client)
-        adapter._client.stream = fake_stream
         chunks = []
         async for chunk in adapter.stream_chat_completions(
             ChatRequest(model="qwen-plus", messages=[Message(role="user", content="hi")], stream=True)
@@ -192,6 +183,7 @@ async def test_qwen_adapter_stream_chat_completions() -> None:
 
     assert len(chunks) == 4
     assert b"qwen:qwen-plus" in chunks[0]
+    assert json.loads(chunks[1][6:])["choices"][0]["delta"]["content"] == "Hi"
     assert chunks[3] == b"data: [DONE]\n"
 
 
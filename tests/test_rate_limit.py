@@ -1,43 +1,118 @@
-"""Tests for rate limiting (check_rate_limit)."""
+"""Tests for rate limiting (check_rate_limit), run against fakeredis with the real Lua scripts."""
 
 from __future__ import annotations
 
 from unittest.mock import AsyncMock
 
+import fakeredis
 import pytest
+from fastapi import HTTPException
 
-from aigate.core.errors import too_many_requests
-from aigate.limits.rate_limit import check_rate_limit
+from aigate.limits.rate_limit import check_rate_limit, parse_model_limits, reconcile_tokens
 
 
-class FakeRedis:
-    """Mock Redis with configurable eval return (request count in window)."""
+@pytest.fixture
+def redis() -> fakeredis.FakeAsyncRedis:
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
 
-    def __init__(self, incr_returns: list[int] | None = None) -> None:
-        self._returns = iter(incr_returns) if incr_returns else iter([1])
-        self.eval = AsyncMock(side_effect=self._eval)
 
-    async def _eval(self, script: str, numkeys: int, *args: object) -> int:
-        return next(self._returns, 1)
+@pytest.mark.asyncio
+async def test_admits_up_to_the_limit_then_rejects_without_a_boundary_burst(redis) -> None:
+    for _ in range(60):
+        await check_rate_limit(redis, "org-1", 60)
+    with pytest.raises(HTTPException) as exc_info:
+        await check_rate_limit(redis, "org-1", 60)
+    assert exc_info.value.status_code == 429
+    assert exc_info.value.detail == "Rate limit exceeded"
+
+    # The next slot opens within one interval (60s / 60), not at a minute boundary. How much of it is
+    # left depends on how long the 60 calls took on Redis's own clock.
+    headers = exc_info.value.headers or {}
+    assert 0 < int(headers["Retry-After-Ms"]) <= 1000
+    assert headers["Retry-After"] == "1"
+    assert headers["X-RateLimit-Remaining"] == "0"
+    assert headers["X-RateLimit-Reset"] == "60"
+
+
+@pytest.mark.asyncio
+async def test_result_reports_remaining_and_reset(redis) -> None:
+    first = await check_rate_limit(redis, "org-1", 10)
+    assert (first.limit, first.remaining) == (10, 9)
+    assert 5900 <= first.reset_ms <= 6000
+    assert first.headers() == {"X-RateLimit-Limit": "10", "X-RateLimit-Remaining": "9", "X-RateLimit-Reset": "6"}
+    second = await check_rate_limit(redis, "org-1", 10)
+    assert second.remaining == 8
+
+
+def test_parse_model_limits() -> None:
+    assert parse_model_limits("qwen:qwen-max=50000, qwen:qwen-plus = 100 ,bad") == {
+        "qwen:qwen-max": 50000,
+        "qwen:qwen-plus": 100,
+    }
+    assert parse_model_limits(None) == {}
+
+
+@pytest.mark.asyncio
+async def test_tpm_reserves_and_rejects_without_partial_reservation(redis) -> None:
+    kwargs = {"model": "qwen:qwen-max", "tpm_limit": 1000, "model_tpm_limit": 500}
+
+    result = await check_rate_limit(redis, "org-1", 60, tokens=400, **kwargs)
+    assert result.reservation is not None and result.reservation.tokens == 400
+    assert len(result.reservation.keys) == 2
+    before = {k: await redis.get(k) for k in await redis.keys("*")}
+
+    # Org limit still has room, the model limit does not: nothing is taken anywhere.
+    with pytest.raises(HTTPException) as exc_info:
+        await check_rate_limit(redis, "org-1", 60, tokens=200, **kwargs)
+    assert exc_info.value.status_code == 429
+    assert exc_info.value.detail == "Token rate limit exceeded"
+    assert {k: await redis.get(k) for k in await redis.keys("*")} == before
+
+    # Another model only counts against the org limit.
+    other = await check_rate_limit(redis, "org-1", 60, tokens=200, model="qwen:qwen-plus", tpm_limit=1000)
+    assert other.reservation is not None and len(other.reservation.keys) == 1
 
 
 @pytest.mark.asyncio
-async def test_check_rate_limit_under_limit_passes() -> None:
-    redis = FakeRedis(incr_returns=[1])
-    await check_rate_limit(redis, "org-1", 60)
-    redis.eval.assert_called_once()
+async def test_reconcile_replaces_reservation_with_actual_usage(redis) -> None:
+    kwargs = {"model": "qwen:qwen-plus", "tokens": 1500, "tpm_limit": 2000}
+    result = await check_rate_limit(redis, "org-1", 60, **kwargs)
+    with pytest.raises(HTTPException):
+        await check_rate_limit(redis, "org-1", 60, **kwargs)
+
+    await reconcile_tokens(redis, result.reservation, 300)
+    assert await check_rate_limit(redis, "org-1", 60, **kwargs)  # freed capacity is available again
 
 
 @pytest.mark.asyncio
-async def test_check_rate_limit_at_limit_passes() -> None:
-    redis = FakeRedis(incr_returns=[60])
-    await check_rate_limit(redis, "org-1", 60)
+async def test_without_tpm_limits_nothing_is_reserved(redis) -> None:
+    assert (await check_rate_limit(redis, "org-1", 60, model="qwen:qwen-plus", tpm_limit=1000)).reservation is None
+    assert (await check_rate_limit(redis, "org-1", 60, model="qwen:qwen-plus", tokens=100)).reservation is None
+    await reconcile_tokens(redis, None, 100)
+    assert await redis.keys("ratelimit:tpm:*") == []
 
 
 @pytest.mark.asyncio
-async def test_check_rate_limit_over_limit_raises_429() -> None:
-    redis = FakeRedis(incr_returns=[61])
-    with pytest.raises(type(too_many_requests())) as exc_info:
+async def test_scripts_run_by_sha_once_loaded(redis) -> None:
+    eval_ = redis.eval
+
+    async def load(*args):
+        return await eval_(*args)
+
+    redis.eval = AsyncMock(side_effect=load)
+    for _ in range(3):
         await check_rate_limit(redis, "org-1", 60)
-    assert exc_info.value.status_code == 429
-    assert "Retry-After" in (exc_info.value.headers or {})
+    assert redis.eval.await_count == 1  # EVALSHA missed (NOSCRIPT) once, EVAL loaded the script
+    assert (await check_rate_limit(redis, "org-1", 60)).remaining == 56
+
+
+@pytest.mark.asyncio
+async def test_reservation_above_the_token_limit_is_not_retryable(redis) -> None:
+    with pytest.raises(HTTPException) as exc_info:
+        await check_rate_limit(redis, "org-1", 60, model="qwen:qwen-max", tokens=1500, tpm_limit=1000)
+    assert exc_info.value.status_code == 400
+    assert "token rate limit of 1000" in exc_info.value.detail
+    assert "Retry-After" not in (exc_info.value.headers or {})
+    # Nothing was taken: a request that fits is still admitted in full.
+    result = await check_rate_limit(redis, "org-1", 60, model="qwen:qwen-max", tokens=1000, tpm_limit=1000)
+    assert result.reservation is not None
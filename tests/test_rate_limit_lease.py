@@ -0,0 +1,104 @@
+"""Tests for the hybrid (local lease + Redis top-up) rate limiter."""
+
+from __future__ import annotations
+
+import asyncio
+
+import fakeredis
+import pytest
+from fastapi import HTTPException
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from aigate.limits import lease
+
+
+class CountingRedis(fakeredis.FakeAsyncRedis):
+    """fakeredis that counts script calls and can be taken down."""
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(decode_responses=True, **kwargs)
+        self.calls = 0
+        self.down = False
+
+    async def evalsha(self, *args, **kwargs):
+        self.calls += 1
+        if self.down:
+            raise RedisConnectionError("connection refused")
+        return await super().evalsha(*args, **kwargs)
+
+
+def _limiter(redis: CountingRedis, **kwargs) -> lease.LeaseRateLimiter:
+    return lease.LeaseRateLimiter(redis, lease_fraction=0.1, flush_interval_ms=0, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_most_requests_are_admitted_locally() -> None:
+    redis = CountingRedis()
+    limiter = _limiter(redis)
+    limiter.start()
+    for _ in range(50):
+        await limiter.check("org-1", 100)
+        await asyncio.sleep(0)  # let background refills run
+    await limiter.close()
+    assert redis.calls <= 10
+
+
+@pytest.mark.asyncio
+async def test_replicas_never_admit_more_than_the_global_limit() -> None:
+    redis = CountingRedis()
+    replicas = [_limiter(redis) for _ in range(3)]
+    admitted = 0
+    for _ in range(40):
+        for limiter in replicas:
+            try:
+                result = await limiter.check("org-1", 60)
+                admitted += 1
+                assert 0 <= result.remaining < 60
+            except HTTPException as e:
+                assert e.status_code == 429
+                assert 0 < int((e.headers or {})["Retry-After-Ms"]) <= 60_000
+    assert 60 - 3 * 6 <= admitted <= 60  # at most one unused lease per replica is lost
+
+
+@pytest.mark.asyncio
+async def test_token_reservations_are_reconciled_locally() -> None:
+    redis = CountingRedis()
+    limiter = _limiter(redis)
+    kwargs = {"model": "qwen:qwen-plus", "tokens": 900, "tpm_limit": 1000}
+    result = await limiter.check("org-1", 60, **kwargs)
+    with pytest.raises(HTTPException) as exc_info:
+        await limiter.check("org-1", 60, **kwargs)
+    assert exc_info.value.detail == "Token rate limit exceeded"
+
+    calls = redis.calls
+    await limiter.reconcile(result.reservation, 100)
+    await limiter.check("org-1", 60, model="qwen:qwen-plus", tokens=800, tpm_limit=1000)
+    assert redis.calls == calls  # the refund was local
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_local_limit_when_redis_is_down() -> None:
+    redis = CountingRedis()
+    redis.down = True
+    limiter = _limiter(redis)
+    for _ in range(5):
+        await limiter.check("org-1", 5)
+    with pytest.raises(HTTPException) as exc_info:
+        await limiter.check("org-1", 5)
+    assert exc_info.value.status_code == 429
+
+
+@pytest.mark.asyncio
+async def test_evicted_leases_return_unused_units(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(lease, "_MAX_LEASES", 2)
+    redis = CountingRedis()
+    limiter = _limiter(redis)
+    for org in ("org-1", "org-2", "org-3"):
+        await limiter.check(org, 60)  # takes a lease of 6, uses 1
+    assert len(limiter._leases) == 2
+    assert [units for _, units in limiter._returns.values()] == [5]
+
+    await limiter._return_units()
+    other = lease.LeaseRateLimiter(redis, lease_fraction=1.0)
+    result = await other.check("org-1", 60)
+    assert result.remaining == 58  # only the one used unit is still taken
@@ -0,0 +1,93 @@
+"""Tests for the raw-body fast path: scan once, hash without copies, forward original bytes."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+
+import httpx
+import pytest
+
+from aigate.api.chat_completions import _hash_request
+from aigate.domain.chat import ChatRequest
+from aigate.domain.raw_body import scan_object
+from aigate.providers.qwen_adapter import QwenAdapter
+
+IMAGE = "data:image/png;base64," + "iVBORw0KGgo" * 20_000
+BODY = (
+    '{"model": "qwen:qwen-vl-max",\n "messages": [{"role": "user", "content": ['
+    '{"type": "text", "text": "What is \\"this\\"? {[\\\\"}, '
+    '{"type": "image_url", "image_url": {"url": "' + IMAGE + '"}}]}],'
+    ' "temperature": 0.2, "stream": true, "stream_options": {"include_usage": false}}'
+).encode("utf-8")
+
+
+def test_scan_finds_top_level_values_only() -> None:
+    spans = scan_object(BODY)
+    assert spans is not None
+    assert {k: json.loads(BODY[s:e]) for k, (s, e) in spans.items()} == json.loads(BODY)
+    assert scan_object(b'{"a": 1, "a": 2}') is None
+    assert scan_object(b"[1]") is None
+
+
+def test_request_hash_is_unchanged_by_the_streaming_encoder() -> None:
+    req = ChatRequest.from_raw(BODY)
+    payload = req.model_dump(mode="json", exclude={"max_tokens"})  # unset: left out of the hash
+    expected = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    assert _hash_request(req) == hashlib.sha256(expected).hexdigest()
+
+
+async def _upstream_body(req: ChatRequest, *, stream: bool) -> bytes:
+    sent: list[bytes] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        sent.append(request.content)
+        if stream:
+            return httpx.Response(200, content=b"data: [DONE]\n\n")
+        choice = {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "ok"}}
+        return httpx.Response(200, json={"id": "1", "model": "qwen-vl-max", "choices": [choice]})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="https://q.example") as client:
+        adapter = QwenAdapter(client=client)
+        routed = req.model_copy(update={"model": "qwen-vl-max"})  # what the router hands the adapter
+        if stream:
+            async for _ in adapter.stream_chat_completions(routed):
+                pass
+        else:
+            await adapter.chat_completions(routed)
+    return sent[0]
+
+
+@pytest.mark.asyncio
+async def test_adapter_forwards_original_bytes_with_model_and_stream_flags_patched() -> None:
+    req = ChatRequest.from_raw(BODY)
+    assert req.raw_body is not None
+
+    streamed = await _upstream_body(req, stream=True)
+    assert IMAGE.encode() in streamed
+    sent = json.loads(streamed)
+    assert sent["model"] == "qwen-vl-max"
+    assert sent["stream_options"] == {"include_usage": True}
+    assert sent["messages"][0]["content"][0]["text"] == 'What is "this"? {[\\'  # escapes kept intact
+
+    unary = json.loads(await _upstream_body(req, stream=False))
+    assert "stream" not in unary and "stream_options" not in unary
+    assert unary["temperature"] == 0.2
+
+
+@pytest.mark.asyncio
+async def test_unknown_top_level_members_take_the_serialized_path() -> None:
+    req = ChatRequest.from_raw(b'{"model": "qwen:qwen-plus", "messages": [], "tools": []}')
+    assert req.raw_body is None
+    assert json.loads(await _upstream_body(req, stream=False)) == {"model": "qwen-vl-max", "messages": []}
+
+
+@pytest.mark.asyncio
+async def test_unknown_nested_members_take_the_serialized_path() -> None:
+    image = {"type": "image_url", "image_url": {"url": "x", "detail": "low"}}
+    message = {"role": "user", "name": "bob", "content": [image]}
+    req = ChatRequest.from_raw(json.dumps({"model": "qwen:qwen-plus", "messages": [message]}).encode())
+    assert req.raw_body is None
+    assert json.loads(await _upstream_body(req, stream=False))["messages"] == [
+        {"role": "user", "content": [{"type": "image_url", "image_url": {"url": "x"}}]}
+    ]
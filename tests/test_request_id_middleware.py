@@ -0,0 +1,79 @@
+"""Tests for the pure ASGI request id / timing middleware."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from aigate.core.auth import AuthContext, get_auth_context
+from aigate.core.middleware import install_middleware
+from aigate.main import create_app
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+    install_middleware(app, body_guard=False)
+
+    @app.get("/whoami")
+    async def whoami(request: Request) -> dict[str, str]:
+        return {"request_id": request.state.request_id}
+
+    @app.get("/slow-stream")
+    async def slow_stream() -> StreamingResponse:
+        async def chunks() -> AsyncIterator[bytes]:
+            for _ in range(3):
+                yield b"data: x\n\n"
+                await asyncio.sleep(0.05)
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    return app
+
+
+def _sample(name: str, route: str) -> float:
+    return REGISTRY.get_sample_value(name, {"route": route, "status": "200"}) or 0.0
+
+
+def test_request_id_is_taken_from_the_request_or_generated() -> None:
+    client = TestClient(_app())
+    resp = client.get("/whoami", headers={"X-Request-ID": "req-42"})
+    assert resp.json() == {"request_id": "req-42"}
+    assert resp.headers["X-Request-ID"] == "req-42"
+    assert "X-Response-Time-Ms" in resp.headers
+
+    generated = client.get("/whoami")
+    assert generated.headers["X-Request-ID"] == generated.json()["request_id"] != "req-42"
+
+
+def test_oversized_request_id_is_replaced() -> None:
+    client = TestClient(_app())
+    resp = client.get("/whoami", headers={"X-Request-ID": "r" * 65})
+    assert len(resp.json()["request_id"]) == 32
+    assert resp.headers["X-Request-ID"] == resp.json()["request_id"]
+
+
+def test_stream_duration_covers_the_whole_stream_not_just_the_headers() -> None:
+    ttfb_before = _sample("aigate_http_time_to_first_byte_seconds_sum", "/slow-stream")
+    total_before = _sample("aigate_http_response_duration_seconds_sum", "/slow-stream")
+
+    resp = TestClient(_app()).get("/slow-stream")
+    assert resp.text.count("data: x") == 3
+
+    ttfb = _sample("aigate_http_time_to_first_byte_seconds_sum", "/slow-stream") - ttfb_before
+    total = _sample("aigate_http_response_duration_seconds_sum", "/slow-stream") - total_before
+    assert int(resp.headers["X-Response-Time-Ms"]) < 100
+    assert total >= 0.15 > ttfb
+
+
+def test_body_guard_rejections_carry_the_request_id() -> None:
+    app = create_app()
+    app.dependency_overrides[get_auth_context] = lambda: AuthContext(org_id="org-1", api_key="k")
+    body = {"model": "qwen:qwen-plus", "messages": [{"role": "user", "content": "hi"}] * 1_001}
+    resp = TestClient(app).post("/v1/chat/completions", json=body, headers={"X-Request-ID": "req-413"})
+    assert resp.status_code == 413
+    assert resp.headers["X-Request-ID"] == "req-413"
@@ -0,0 +1,121 @@
+"""Tests for the exact-match response cache."""
+
+from __future__ import annotations
+
+from collections.abc import AsyncIterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from aigate.domain.chat import ChatRequest, ChatResponse, Choice, Message, Usage
+from aigate.limits.response_cache import ResponseCache, parse_cache_control
+from aigate.main import create_app
+from aigate.providers.base import ProviderAdapter
+from aigate.providers.registry import ProviderRegistry
+
+
+class FakeRedis:
+    def __init__(self) -> None:
+        self._store: dict[str, str] = {}
+
+    async def get(self, key: str) -> str | None:
+        return self._store.get(key)
+
+    async def set(self, key: str, value: str, ex: int | None = None) -> None:
+        self._store[key] = value
+
+
+class CountingAdapter(ProviderAdapter):
+    name = "qwen"
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def list_models(self):
+        return []
+
+    async def stream_chat_completions(
+        self, req: ChatRequest, timeout_seconds: float | None = None
+    ) -> AsyncIterator[bytes]:
+        yield b"data: [DONE]\n"
+
+    async def chat_completions(
+        self, req: ChatRequest, timeout_seconds: float | None = None
+    ) -> ChatResponse:
+        self.calls += 1
+        return ChatResponse(
+            model=req.model,
+            choices=[Choice(index=0, message=Message(role="assistant", content="label: spam"), finish_reason="stop")],
+            usage=Usage(prompt_tokens=5, completion_tokens=2, total_tokens=7),
+        )
+
+
+def _resp() -> ChatResponse:
+    return ChatResponse(
+        model="qwen:qwen-plus",
+        choices=[Choice(index=0, message=Message(role="assistant", content="hi"), finish_reason="stop")],
+    )
+
+
+def test_parse_cache_control() -> None:
+    assert parse_cache_control(None) == (True, True)
+    assert parse_cache_control("no-cache") == (False, True)
+    assert parse_cache_control("max-age=0, no-store") == (False, False)
+
+
+@pytest.mark.asyncio
+async def test_redis_tier_backfills_local_tier() -> None:
+    redis = FakeRedis()
+    writer = ResponseCache(redis, ttl_seconds=60, local_max_entries=10, local_ttl_seconds=60, max_entry_bytes=10_000)
+    await writer.set("org-1", "qwen:qwen-plus", "h1", _resp())
+
+    reader = ResponseCache(redis, ttl_seconds=60, local_max_entries=10, local_ttl_seconds=60, max_entry_bytes=10_000)
+    hit = await reader.get("org-1", "qwen:qwen-plus", "h1")
+    assert hit is not None and hit.choices[0].message.content == "hi"
+    redis._store.clear()
+    assert await reader.get("org-1", "qwen:qwen-plus", "h1") is not None
+    assert await reader.get("org-2", "qwen:qwen-plus", "h1") is None
+
+
+@pytest.mark.asyncio
+async def test_oversized_entries_are_not_stored() -> None:
+    cache = ResponseCache(None, ttl_seconds=60, local_max_entries=10, local_ttl_seconds=60, max_entry_bytes=10)
+    await cache.set("org-1", "qwen:qwen-plus", "h1", _resp())
+    assert await cache.get("org-1", "qwen:qwen-plus", "h1") is None
+
+
+def test_deterministic_request_is_served_from_cache() -> None:
+    from aigate.core.auth import AuthContext, get_auth_context
+    from aigate.core.deps import get_db_session, get_provider_registry
+
+    app = create_app()
+    app.state.response_cache = ResponseCache(
+        FakeRedis(), ttl_seconds=60, local_max_entries=10, local_ttl_seconds=60, max_entry_bytes=100_000
+    )
+    adapter = CountingAdapter()
+    registry = ProviderRegistry()
+    registry.register(adapter)
+
+    async def _db_override():
+        yield None
+
+    app.dependency_overrides[get_auth_context] = lambda: AuthContext(org_id="org-1", api_key="agk_test")
+    app.dependency_overrides[get_provider_registry] = lambda: registry
+    app.dependency_overrides[get_db_session] = _db_override
+
+    client = TestClient(app)
+    headers = {"Authorization": "Bearer agk_test"}
+    body = {"model": "qwen:qwen-plus", "messages": [{"role": "user", "content": "classify"}], "temperature": 0}
+
+    r1 = client.post("/v1/chat/completions", headers=headers, json=body)
+    r2 = client.post("/v1/chat/completions", headers=headers, json=body)
+    r3 = client.post("/v1/chat/completions", headers={**headers, "Cache-Control": "no-cache"}, json=body)
+    r4 = client.post("/v1/chat/completions", headers=headers, json={**body, "temperature": 0.7})
+
+    assert [r.status_code for r in (r1, r2, r3, r4)] == [200, 200, 200, 200]
+    assert r1.headers["X-Cache"] == "MISS"
+    assert r2.headers["X-Cache"] == "HIT"
+    assert r2.json()["choices"] == r1.json()["choices"]
+    assert r3.headers["X-Cache"] == "MISS"
+    assert "X-Cache" not in r4.headers
+    assert adapter.calls == 3
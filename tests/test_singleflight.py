@@ -0,0 +1,177 @@
+"""Tests for single-flight coalescing of identical in-flight requests."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from aigate.domain.chat import ChatResponse, Choice, Message
+from aigate.routing.singleflight import SingleFlight
+
+
+class FakeRedis:
+    def __init__(self) -> None:
+        self._store: dict[str, str] = {}
+
+    async def get(self, key: str) -> str | None:
+        return self._store.get(key)
+
+    async def set(self, key: str, value: str, ex: int | None = None, px: int | None = None, nx: bool = False):
+        if nx and key in self._store:
+            return None
+        self._store[key] = value
+        return True
+
+    async def exists(self, key: str) -> int:
+        return int(key in self._store)
+
+    async def delete(self, key: str) -> int:
+        return int(self._store.pop(key, None) is not None)
+
+    async def eval(self, script: str, numkeys: int, key: str, token: str) -> int:
+        # Release-if-owner script.
+        if self._store.get(key) == token:
+            del self._store[key]
+            return 1
+        return 0
+
+
+def _resp(content: str = "ok") -> ChatResponse:
+    return ChatResponse(
+        model="qwen:qwen-plus",
+        choices=[Choice(index=0, message=Message(role="assistant", content=content), finish_reason="stop")],
+    )
+
+
+class _Upstream:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self) -> ChatResponse:
+        self.calls += 1
+        await self.release.wait()
+        return _resp()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_requests_share_one_call() -> None:
+    sf = SingleFlight()
+    upstream = _Upstream()
+    tasks = [asyncio.create_task(sf.do("org-1", "h", upstream)) for _ in range(5)]
+    await asyncio.sleep(0)
+    upstream.release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert upstream.calls == 1
+    assert [shared for _, shared in results] == [False, True, True, True, True]
+    # Each caller gets its own copy to mutate (billing sets usage.billed_cost).
+    assert len({id(resp) for resp, _ in results}) == 5
+
+
+@pytest.mark.asyncio
+async def test_different_orgs_are_not_coalesced() -> None:
+    sf = SingleFlight()
+    upstream = _Upstream()
+    upstream.release.set()
+    await asyncio.gather(sf.do("org-1", "h", upstream), sf.do("org-2", "h", upstream))
+    assert upstream.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_leader_cancellation_does_not_cancel_followers() -> None:
+    sf = SingleFlight()
+    upstream = _Upstream()
+    leader = asyncio.create_task(sf.do("org-1", "h", upstream))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(sf.do("org-1", "h", upstream))
+    await asyncio.sleep(0)
+    leader.cancel()
+    upstream.release.set()
+    resp, shared = await follower
+    assert shared is True and resp.choices[0].message.content == "ok"
+
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_all_waiters() -> None:
+    sf = SingleFlight()
+
+    async def failing() -> ChatResponse:
+        await asyncio.sleep(0)
+        raise HTTPException(status_code=502, detail="boom")
+
+    results = await asyncio.gather(sf.do("org-1", "h", failing), sf.do("org-1", "h", failing), return_exceptions=True)
+    assert all(isinstance(r, HTTPException) and r.status_code == 502 for r in results)
+
+
+@pytest.mark.asyncio
+async def test_replicas_coalesce_through_redis() -> None:
+    redis = FakeRedis()
+    replica_a = SingleFlight(redis, poll_interval_seconds=0.001)
+    replica_b = SingleFlight(redis, poll_interval_seconds=0.001)
+    upstream = _Upstream()
+
+    a = asyncio.create_task(replica_a.do("org-1", "h", upstream))
+    await asyncio.sleep(0.01)
+    b = asyncio.create_task(replica_b.do("org-1", "h", upstream))
+    await asyncio.sleep(0.01)
+    upstream.release.set()
+
+    (_, shared_a), (resp_b, shared_b) = await asyncio.gather(a, b)
+    assert upstream.calls == 1
+    assert shared_a is False and shared_b is True
+    assert resp_b.choices[0].message.content == "ok"
+    assert not any(k.startswith("singleflight:lock:") for k in redis._store)
+
+
+class _SlowAdapter:
+    name = "qwen"
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def healthy(self) -> bool:
+        return True
+
+    async def list_models(self):
+        return []
+
+    async def chat_completions(self, req, timeout_seconds: float | None = None) -> ChatResponse:  # noqa: ANN001
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return _resp()
+
+
+async def _concurrent_calls(temperature: float) -> int:
+    import httpx
+
+    from aigate.core.auth import AuthContext, get_auth_context
+    from aigate.core.deps import get_db_session, get_provider_registry
+    from aigate.main import create_app
+    from aigate.providers.registry import ProviderRegistry
+
+    adapter = _SlowAdapter()
+    registry = ProviderRegistry()
+    registry.register(adapter)
+    app = create_app()
+    app.state.singleflight = SingleFlight(None)
+
+    async def _db_override():
+        yield None
+
+    app.dependency_overrides[get_auth_context] = lambda: AuthContext(org_id="org-1", api_key="k")
+    app.dependency_overrides[get_provider_registry] = lambda: registry
+    app.dependency_overrides[get_db_session] = _db_override
+    body = {"model": "qwen:qwen-plus", "messages": [{"role": "user", "content": "Hi"}], "temperature": temperature}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        responses = await asyncio.gather(*(client.post("/v1/chat/completions", json=body) for _ in range(3)))
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    return adapter.calls
+
+
+@pytest.mark.asyncio
+async def test_only_deterministic_requests_are_coalesced() -> None:
+    assert await _concurrent_calls(0) == 1
+    assert await _concurrent_calls(0.7) == 3  # each client asked for its own sample
@@ -0,0 +1,58 @@
+"""Tests for the byte-level SSE relay (parser, model rewrite, usage extraction)."""
+
+from __future__ import annotations
+
+import json
+
+from aigate.providers.sse import SSEParser, delta_text, encode_event, find_usage, rewrite_model
+
+
+def test_parser_handles_split_chunks_crlf_and_multiline_events() -> None:
+    stream = b': keep-alive\r\n\r\ndata: {"a":\r\ndata: 1}\r\n\r\nevent: x\ndata: [DONE]\n\n'
+    parser = SSEParser()
+    events = []
+    for i in range(len(stream)):
+        events.extend(parser.feed(stream[i : i + 1]))
+    events.extend(parser.close())
+    assert events == [[b'{"a":', b"1}"], [b"[DONE]"]]
+
+
+def test_parser_flushes_event_without_trailing_blank_line() -> None:
+    parser = SSEParser()
+    assert parser.feed(b"data: last") == []
+    assert parser.close() == [[b"last"]]
+
+
+def test_rewrite_model_prefixes_value_in_place() -> None:
+    data = b'{"choices":[{"delta":{"content":"say \\"model\\": x"}}],"model": "qwen-plus","id":"c1"}'
+    out = rewrite_model(data, b"qwen:")
+    assert json.loads(out)["model"] == "qwen:qwen-plus"
+    assert out.replace(b"qwen:", b"", 1) == data
+
+
+def test_rewrite_model_leaves_missing_null_and_non_json_alone() -> None:
+    assert rewrite_model(b'{"id":"c1"}', b"qwen:") == b'{"id":"c1"}'
+    assert rewrite_model(b'{"model":null}', b"qwen:") == b'{"model":null}'
+    assert rewrite_model(b'{"model":""}', b"qwen:") == b'{"model":""}'
+    assert rewrite_model(b"not json", b"qwen:") == b"not json"
+
+
+def test_rewrite_model_escaped_value_uses_json_path() -> None:
+    out = rewrite_model(b'{"model":"we\\"ird"}', b"qwen:")
+    assert json.loads(out)["model"] == 'qwen:we"ird'
+
+
+def test_find_usage_only_parses_usage_objects() -> None:
+    tail = encode_event([b'{"choices":[],"usage":{"prompt_tokens":3,"completion_tokens":5}}'])
+    assert find_usage(tail) == ({"prompt_tokens": 3, "completion_tokens": 5}, True)
+    inline = encode_event([b'{"choices":[{"delta":{}}],"usage": {"prompt_tokens":3}}'])
+    assert find_usage(inline) == ({"prompt_tokens": 3}, False)
+    assert find_usage(encode_event([b'{"choices":[],"usage":null}'])) == (None, False)
+    assert find_usage(encode_event([b'{"choices":[{"delta":{"content":"\\"usage\\": {"}}]}'])) == (None, False)
+    assert find_usage(b"data: [DONE]\n") == (None, False)
+
+
+def test_delta_text_joins_choice_contents() -> None:
+    event = encode_event([b'{"choices":[{"delta":{"content":"Hel"}},{"delta":{"content":"lo"}}]}'])
+    assert delta_text(event) == "Hello"
+    assert delta_text(b"data: [DONE]\n") == ""
@@ -0,0 +1,309 @@
+"""Tests for resumable streaming (StreamBuffer) and its use in chat completions."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from aigate.domain.chat import ChatRequest, ChatResponse, Choice, Message
+from aigate.limits.stream_resume import StreamBuffer, parse_last_event_id
+from aigate.main import create_app
+from aigate.providers.base import ProviderAdapter
+from aigate.providers.registry import ProviderRegistry
+
+
+class FakePipeline:
+    def __init__(self, redis: FakeRedis) -> None:
+        self._redis = redis
+        self._calls: list = []
+
+    def __getattr__(self, name: str):
+        return lambda *args, **kwargs: self._calls.append((name, args, kwargs))
+
+    async def execute(self) -> list:
+        await asyncio.sleep(self._redis.write_delay)
+        return [await getattr(self._redis, name)(*args, **kwargs) for name, args, kwargs in self._calls]
+
+
+class FakeRedis:
+    """Just enough of SET NX / GET / DEL / XADD / XREAD / pipelines for StreamBuffer."""
+
+    def __init__(self, write_delay: float = 0.0) -> None:
+        self._store: dict[str, str] = {}
+        self._streams: dict[str, list[tuple[str, dict[str, str]]]] = {}
+        self.write_delay = write_delay
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self)
+
+    async def delete(self, *keys: str) -> int:
+        return sum(self._store.pop(k, None) is not None or self._streams.pop(k, None) is not None for k in keys)
+
+    async def get(self, key: str) -> str | None:
+        return self._store.get(key)
+
+    async def set(self, key: str, value: str, ex: int | None = None, nx: bool = False) -> bool | None:
+        if nx and key in self._store:
+            return None
+        self._store[key] = value
+        return True
+
+    async def expire(self, key: str, seconds: int) -> bool:
+        return True
+
+    async def xadd(
+        self, key: str, fields: dict[str, str], id: str = "*", maxlen: int | None = None, approximate: bool = True
+    ) -> str:
+        entries = self._streams.get(key, [])
+        assert id != "*" and (not entries or _id_tuple(id) > _id_tuple(entries[-1][0]))
+        entry_id = id
+        self._streams.setdefault(key, []).append((entry_id, dict(fields)))
+        return entry_id
+
+    async def xread(self, streams: dict[str, str], count: int | None = None, block: int | None = None):
+        ((key, last),) = streams.items()
+        waited = 0.0
+        while True:
+            entries = [e for e in self._streams.get(key, []) if _id_tuple(e[0]) > _id_tuple(last)]
+            if entries:
+                return [[key, entries[:count]]]
+            if block is None or waited >= block / 1000:
+                return []
+            await asyncio.sleep(0.005)
+            waited += 0.005
+
+    async def evalsha(self, sha: str, numkeys: int, *args: object) -> list[int]:
+        # For rate limiting in chat_completions; always allow.
+        return [0, 0, 59, 1000]
+
+
+def _id_tuple(entry_id: str) -> tuple[int, int]:
+    ms, _, seq = entry_id.partition("-")
+    return (int(ms), int(seq or 0))
+
+
+async def _chunks(n: int, delay: float = 0.0) -> AsyncIterator[bytes]:
+    for i in range(n):
+        if delay:
+            await asyncio.sleep(delay)
+        yield f"data: {i}\n".encode()
+
+
+def test_parse_last_event_id() -> None:
+    assert parse_last_event_id("idem:key:1000-3") == ("idem:key", "1000-3")
+    assert parse_last_event_id("1000-3") is None
+    assert parse_last_event_id("abc:not-an-id") is None
+    assert parse_last_event_id(None) is None
+
+
+@pytest.mark.asyncio
+async def test_origin_and_replay_see_same_events() -> None:
+    buf = StreamBuffer(FakeRedis(), max_chunks=100, ttl_seconds=60, block_ms=10)
+    origin = [c async for c in buf.start("org-1", "s1", _chunks(3))]
+    assert origin[0] == b"id: s1:0-1\ndata: 0\n"
+    assert len(origin) == 3
+
+    replay = [c async for c in buf.replay("org-1", "s1", idle_timeout_seconds=1)]
+    assert replay == origin
+
+    tail = [c async for c in buf.replay("org-1", "s1", after="0-2", idle_timeout_seconds=1)]
+    assert tail == origin[2:]
+
+
+@pytest.mark.asyncio
+async def test_generation_survives_origin_disconnect() -> None:
+    buf = StreamBuffer(FakeRedis(), max_chunks=100, ttl_seconds=60, block_ms=10)
+    live = buf.start("org-1", "s1", _chunks(5, delay=0.01))
+    first = await live.__anext__()
+    await live.aclose()  # client went away after one event
+
+    replay = [c async for c in buf.replay("org-1", "s1", after="0-1", idle_timeout_seconds=1)]
+    assert first.endswith(b"data: 0\n")
+    assert [c.split(b"\n")[1] for c in replay] == [b"data: 1", b"data: 2", b"data: 3", b"data: 4"]
+
+
+@pytest.mark.asyncio
+async def test_live_chunks_do_not_wait_for_redis_writes() -> None:
+    redis = FakeRedis(write_delay=0.2)
+    buf = StreamBuffer(redis, max_chunks=100, ttl_seconds=60, block_ms=10)
+    live = buf.start("org-1", "s1", _chunks(3))
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    first = await live.__anext__()
+    assert loop.time() - started < 0.1
+    assert first == b"id: s1:0-1\ndata: 0\n"
+    rest = [c async for c in live]  # ends once everything (and the end marker) is written
+    replay = [c async for c in buf.replay("org-1", "s1", idle_timeout_seconds=1)]
+    assert replay == [first, *rest]
+    assert len(redis._streams["streambuf:org-1:s1"]) == 4  # 3 chunks + end marker
+
+
+@pytest.mark.asyncio
+async def test_claim_detects_replay_and_conflict() -> None:
+    buf = StreamBuffer(FakeRedis(), max_chunks=100, ttl_seconds=60)
+    assert await buf.claim("org-1", "k", "h1") == "owner"
+    assert await buf.claim("org-1", "k", "h1") == "replay"
+    assert await buf.claim("org-1", "k", "h2") == "conflict"
+
+
+class CountingStreamAdapter(ProviderAdapter):
+    name = "qwen"
+
+    def __init__(self) -> None:
+        self.stream_calls = 0
+
+    async def list_models(self):
+        return []
+
+    async def chat_completions(self, req: ChatRequest, timeout_seconds: float | None = None) -> ChatResponse:
+        return ChatResponse(
+            model=req.model,
+            choices=[Choice(index=0, message=Message(role="assistant", content="ok"), finish_reason="stop")],
+        )
+
+    async def stream_chat_completions(
+        self, req: ChatRequest, timeout_seconds: float | None = None
+    ) -> AsyncIterator[bytes]:
+        self.stream_calls += 1
+        for word in ("Hel", "lo", "!"):
+            yield f'data: {{"choices":[{{"index":0,"delta":{{"content":"{word}"}}}}]}}\n'.encode()
+        yield b"data: [DONE]\n"
+
+
+def _client(adapter: CountingStreamAdapter) -> TestClient:
+    from aigate.core.auth import AuthContext, get_auth_context
+    from aigate.core.deps import get_db_session, get_provider_registry
+
+    app = create_app()
+    redis = FakeRedis()
+    app.state.redis = redis
+    app.state.stream_buffer = StreamBuffer(redis, max_chunks=100, ttl_seconds=60, block_ms=10)
+    registry = ProviderRegistry()
+    registry.register(adapter)
+
+    async def _db_override():
+        yield None
+
+    app.dependency_overrides[get_auth_context] = lambda: AuthContext(org_id="org-1", api_key="agk_test")
+    app.dependency_overrides[get_provider_registry] = lambda: registry
+    app.dependency_overrides[get_db_session] = _db_override
+    return TestClient(app)
+
+
+BODY = {"model": "qwen:qwen-plus", "messages": [{"role": "user", "content": "Hi"}], "stream": True}
+
+
+def test_streaming_idempotency_key_replays_without_upstream_call() -> None:
+    adapter = CountingStreamAdapter()
+    client = _client(adapter)
+    headers = {"Authorization": "Bearer agk_test", "Idempotency-Key": "stream-1"}
+
+    r1 = client.post("/v1/chat/completions", headers=headers, json=BODY)
+    r2 = client.post("/v1/chat/completions", headers=headers, json=BODY)
+    assert r1.status_code == r2.status_code == 200
+    assert r2.text == r1.text
+    assert "id: stream-1:" in r1.text
+    assert adapter.stream_calls == 1
+
+    r3 = client.post(
+        "/v1/chat/completions", headers=headers, json={**BODY, "messages": [{"role": "user", "content": "Other"}]}
+    )
+    assert r3.status_code == 409
+
+
+def test_streaming_resumes_from_last_event_id() -> None:
+    adapter = CountingStreamAdapter()
+    client = _client(adapter)
+
+    r1 = client.post("/v1/chat/completions", headers={"Authorization": "Bearer agk_test"}, json=BODY)
+    ids = [line[4:] for line in r1.text.split("\n") if line.startswith("id: ")]
+    data = [line for line in r1.text.split("\n") if line.startswith("data: ")]
+    assert len(ids) == len(data) == 4
+
+    r2 = client.post(
+        "/v1/chat/completions",
+        headers={"Authorization": "Bearer agk_test", "Last-Event-ID": ids[1]},
+        json=BODY,
+    )
+    assert r2.status_code == 200
+    assert [line for line in r2.text.split("\n") if line.startswith("data: ")] == data[2:]
+    assert adapter.stream_calls == 1
+
+
+def test_rejected_stream_does_not_leave_its_key_claimed(monkeypatch: pytest.MonkeyPatch) -> None:
+    from aigate.api import chat_completions
+
+    adapter = CountingStreamAdapter()
+    client = _client(adapter)
+    headers = {"Authorization": "Bearer agk_test", "Idempotency-Key": "stream-429"}
+    real_check = chat_completions._check_rate_limit
+
+    async def reject_once(*args, **kwargs):
+        monkeypatch.setattr(chat_completions, "_check_rate_limit", real_check)
+        raise HTTPException(status_code=429, detail="Rate limit exceeded")
+
+    monkeypatch.setattr(chat_completions, "_check_rate_limit", reject_once)
+    assert client.post("/v1/chat/completions", headers=headers, json=BODY).status_code == 429
+
+    retry = client.post("/v1/chat/completions", headers=headers, json=BODY)
+    assert retry.status_code == 200
+    assert "Hel" in retry.text
+    assert adapter.stream_calls == 1
+
+
+def test_reused_request_id_does_not_replay_another_stream() -> None:
+    adapter = CountingStreamAdapter()
+    client = _client(adapter)
+    headers = {"Authorization": "Bearer agk_test", "X-Request-ID": "same"}
+
+    r1 = client.post("/v1/chat/completions", headers=headers, json=BODY)
+    r2 = client.post("/v1/chat/completions", headers=headers, json=BODY)
+    other = {**BODY, "messages": [{"role": "user", "content": "Other"}]}
+    r3 = client.post("/v1/chat/completions", headers=headers, json=other)
+    assert r1.status_code == r2.status_code == r3.status_code == 200
+    assert adapter.stream_calls == 3
+    assert "id: same:" not in r1.text
+
+
+class FailingOnceStreamAdapter(CountingStreamAdapter):
+    async def stream_chat_completions(
+        self, req: ChatRequest, timeout_seconds: float | None = None
+    ) -> AsyncIterator[bytes]:
+        if self.stream_calls == 0:
+            self.stream_calls += 1
+            yield b'data: {"choices":[{"index":0,"delta":{"content":"Hel"}}]}\n'
+            raise HTTPException(status_code=502, detail="Upstream error")
+        async for chunk in super().stream_chat_completions(req, timeout_seconds):
+            yield chunk
+
+
+def test_failed_stream_is_regenerated_on_retry() -> None:
+    adapter = FailingOnceStreamAdapter()
+    client = _client(adapter)
+    headers = {"Authorization": "Bearer agk_test", "Idempotency-Key": "stream-502"}
+
+    with pytest.raises(Exception):  # the stream breaks after its first event
+        client.post("/v1/chat/completions", headers=headers, json=BODY)
+
+    retry = client.post("/v1/chat/completions", headers=headers, json=BODY)
+    assert retry.status_code == 200
+    assert "lo" in retry.text and "[DONE]" in retry.text
+    assert adapter.stream_calls == 2
+
+
+@pytest.mark.asyncio
+async def test_unbuffered_stream_frees_its_id() -> None:
+    redis = FakeRedis()
+
+    def broken_pipeline(transaction: bool = True):
+        raise ConnectionError("redis down")
+
+    buf = StreamBuffer(redis, max_chunks=100, ttl_seconds=60, block_ms=10)
+    assert await buf.claim("org-1", "s1", "h") == "owner"
+    redis.pipeline = broken_pipeline
+    assert len([c async for c in buf.start("org-1", "s1", _chunks(3))]) == 3
+    assert await buf.claim("org-1", "s1", "h") == "owner"
@@ -0,0 +1,89 @@
+"""Tests for upstream HTTP connection pools: keep-alive reuse, telemetry, DNS cache, prewarm."""
+
+from __future__ import annotations
+
+import asyncio
+import socket
+
+import httpcore
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+
+from aigate.providers.clients.http import CachingResolverBackend, PoolConfig, build_client, prewarm
+
+RESPONSE = [b"HTTP/1.1 200 OK\r\n", b"Content-Type: application/json\r\n", b"Content-Length: 2\r\n", b"\r\n", b"{}"]
+
+
+class RecordingBackend(httpcore.AsyncMockBackend):
+    def __init__(self) -> None:
+        super().__init__(RESPONSE * 3)  # each connection replays this buffer: room for 3 responses
+        self.hosts: list[str] = []
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        self.hosts.append(host)
+        return await super().connect_tcp(host, port, timeout, local_address, socket_options)
+
+
+def _value(name: str, **labels: str) -> float | None:
+    return REGISTRY.get_sample_value(name, labels)
+
+
+@pytest.mark.asyncio
+async def test_keep_alive_connection_is_reused_and_measured() -> None:
+    backend = RecordingBackend()
+    url = "http://pool-reuse.example"
+    client = build_client(
+        "test", base_url=url, headers={}, timeout=httpx.Timeout(5.0), config=PoolConfig(), network_backend=backend
+    )
+    waits = _value("aigate_upstream_pool_wait_seconds_count", provider="test") or 0
+    for _ in range(3):
+        assert (await client.get("/models")).json() == {}
+
+    assert backend.hosts == ["pool-reuse.example"]  # one TCP connection for three requests
+    assert _value("aigate_upstream_connections_opened_total", provider="test", endpoint=url) == 1
+    assert _value("aigate_upstream_pool_wait_seconds_count", provider="test") == waits + 3
+    pool = {"provider": "test", "endpoint": url}
+    assert _value("aigate_upstream_pool_connections", state="idle", **pool) == 1
+    assert _value("aigate_upstream_pool_connections", state="active", **pool) == 0
+    assert _value("aigate_upstream_pool_connections", state="limit", **pool) == 100
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_prewarm_opens_the_requested_number_of_connections() -> None:
+    backend = RecordingBackend()
+    client = build_client(
+        "test",
+        base_url="http://pool-warm.example",
+        headers={},
+        timeout=httpx.Timeout(5.0),
+        config=PoolConfig(),
+        network_backend=backend,
+    )
+    resp = await prewarm(client, "/models", 3)
+    assert resp.status_code == 200
+    assert len(backend.hosts) == 3
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_resolver_caches_addresses_until_ttl(monkeypatch) -> None:
+    now = 0.0
+    lookups: list[str] = []
+
+    async def getaddrinfo(host, port, **kwargs):
+        lookups.append(host)
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("10.0.0.1", port))]
+
+    monkeypatch.setattr(asyncio.get_running_loop(), "getaddrinfo", getaddrinfo)
+    inner = RecordingBackend()
+    backend = CachingResolverBackend(60.0, backend=inner, clock=lambda: now)
+    for _ in range(2):
+        await backend.connect_tcp("api.example", 443)
+    now = 61.0
+    await backend.connect_tcp("api.example", 443)
+    await backend.connect_tcp("10.0.0.2", 443)  # IP literals skip resolution
+
+    assert lookups == ["api.example", "api.example"]
+    assert inner.hosts == ["10.0.0.1", "10.0.0.1", "10.0.0.1", "10.0.0.2"]
@@ -0,0 +1,54 @@
+"""Revoke an API key and invalidate it in every gateway replica's API key cache."""
+
+from __future__ import annotations
+
+import argparse
+import os
+
+from aigate.core.auth_cache import publish_api_key_invalidation
+from aigate.storage.db import create_engine, create_sessionmaker
+from aigate.storage.repos import hash_api_key, revoke_api_key
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Revoke API key")
+    parser.add_argument("api_key", help="Plain API key (agk_...)")
+    parser.add_argument(
+        "--database-url",
+        default=os.getenv("DATABASE_URL"),
+        help="PostgreSQL URL (default: DATABASE_URL env)",
+    )
+    parser.add_argument(
+        "--redis-url",
+        default=os.getenv("REDIS_URL"),
+        help="Redis URL for cache invalidation (default: REDIS_URL env)",
+    )
+    args = parser.parse_args()
+
+    if not args.database_url:
+        raise SystemExit("DATABASE_URL is not set or pass --database-url")
+
+    key_hash = hash_api_key(args.api_key)
+    engine = create_engine(database_url=args.database_url)
+    sessionmaker = create_sessionmaker(engine)
+    async with sessionmaker() as session:
+        revoked = await revoke_api_key(session, key_hash=key_hash)
+        await session.commit()
+    await engine.dispose()
+
+    if args.redis_url:
+        from redis.asyncio import Redis
+
+        redis = Redis.from_url(args.redis_url, decode_responses=True)
+        await publish_api_key_invalidation(redis, key_hash)
+        await redis.aclose()
+    else:
+        print("REDIS_URL is not set: replicas will drop the key after api_key_cache_ttl_seconds")
+
+    print("revoked" if revoked else "key not found or already inactive")
+
+
+if __name__ == "__main__":
+    import asyncio
+
+    asyncio.run(main())
@@ -11,6 +11,7 @@ from sqlalchemy import select
 from aigate.core.config import get_settings
 from aigate.storage.db import create_engine, create_sessionmaker
 from aigate.storage.models import Organization, PriceRule
+from aigate.storage.pricing import bump_price_rules_version
 
 
 def utcnow() -> datetime:
@@ -77,6 +78,14 @@ async def main() -> None:
         await session.commit()
 
     await engine.dispose()
+
+    if inserted and settings.redis_url:
+        from redis.asyncio import Redis
+
+        redis = Redis.from_url(settings.redis_url, decode_responses=True)
+        await bump_price_rules_version(redis)
+        await redis.aclose()
+
     print(f"Seeded {inserted} price_rules for org '{args.org_name}'.")
 
 